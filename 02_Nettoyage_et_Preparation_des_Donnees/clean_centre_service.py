@@ -1,5 +1,7 @@
 import pandas as pd
 
+from text_normalizer import normalize_categorical
+
 def clean_centre_service(df):
     """
     Nettoie et enrichit le DataFrame des centres de services.
@@ -20,22 +22,15 @@ def clean_centre_service(df):
     df_clean['mois_ouverture'] = df_clean['date_ouverture'].dt.month
 
     # --- 3. Harmonisation des colonnes textuelles ---
-    def fix_encoding(text):
-        if not isinstance(text, str): return text
-        text = text.replace(chr(0x01F8), 'é')
-        text = text.replace('\ufffd', 'é')
-        return text
-
+    # Encodage, espaces et casse normalisés sur les valeurs distinctes (cf. text_normalizer)
     cols_loc = ['region', 'prefecture', 'commune', 'quartier', 'nom_centre']
     for col in cols_loc:
         if col in df_clean.columns:
-            df_clean[col] = df_clean[col].apply(fix_encoding)
-            df_clean[col] = df_clean[col].astype(str).str.strip().str.replace(r'\s+', ' ', regex=True).str.title()
+            df_clean[col] = normalize_categorical(df_clean[col], case='title')
 
     # --- 4. Nettoyage des colonnes catégorielles ---
     for col in ['type_centre', 'statut_centre', 'equipement_numerique']:
         if col in df_clean.columns:
-            df_clean[col] = df_clean[col].apply(fix_encoding)
-            df_clean[col] = df_clean[col].astype(str).str.strip().str.capitalize()
+            df_clean[col] = normalize_categorical(df_clean[col], case='capitalize')
 
     return df_clean
\ No newline at end of file
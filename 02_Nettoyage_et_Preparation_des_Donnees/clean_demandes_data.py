@@ -1,10 +1,39 @@
 # clean_demandes_data.py
+import os
+
 import pandas as pd
 import numpy as np
 
-def clean_demandes_data(input_path='d:/public_services_optimization_togo/data_raw/demandes_service_public.csv', 
-                         output_path = 'd:/public_services_optimization_togo/02_Nettoyage_et_Preparation_des_Donnees/data_cleaned/demande_services_public_cleaned.csv',
-                         documentation_path='d:/public_services_optimization_togo/02_Nettoyage_et_Preparation_des_Donnees/data_cleaned/documentation_demandes_cleaning.txt'):
+from columnar_cache import write_columnar, ColumnarWriter
+from text_normalizer import normalize_categorical
+
+# Chemins par défaut, relatifs au dépôt
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT_PATH = os.path.join(os.path.dirname(PACKAGE_DIR), 'data_raw', 'demandes_service_public.csv')
+DEFAULT_OUTPUT_PATH = os.path.join(PACKAGE_DIR, 'data_cleaned', 'demande_services_public_cleaned.csv')
+DEFAULT_DOCUMENTATION_PATH = os.path.join(PACKAGE_DIR, 'data_cleaned', 'documentation_demandes_cleaning.txt')
+
+# Taille de bloc par défaut du mode streaming (lignes)
+DEFAULT_CHUNKSIZE = 200_000
+
+# Harmonisation des statuts (Spec: Validée, Rejetée, En Attente)
+status_mapping = {
+    'Traitee': 'Validée',
+    'Traitée': 'Validée',
+    'Rejetée': 'Rejetée',
+    'Rejetée': 'Rejetée',
+    'En Cours': 'En Attente',
+    'En cours': 'En Attente',
+    'Acceptée': 'Validée'
+}
+
+cols_category = ['region', 'prefecture', 'commune', 'quartier', 'type_document', 
+            'categorie_document', 'motif_demande', 'statut_demande', 'canal_demande', 'sexe_demandeur']
+
+def clean_demandes_data(input_path=DEFAULT_INPUT_PATH,
+                         output_path=DEFAULT_OUTPUT_PATH,
+                         documentation_path=DEFAULT_DOCUMENTATION_PATH,
+                         chunksize=None):
     """
     Nettoie et prépare le jeu de données des demandes de services publics.
 
@@ -20,7 +49,13 @@ def clean_demandes_data(input_path='d:/public_services_optimization_togo/data_ra
     5. Correction des incohérences et harmonisation des formats (si nécessaire, ajoutable ici).
     6. Ajout de colonnes de temps (année, mois, jour de la semaine).
     7. Sauvegarde du dataset nettoyé et de la documentation des choix.
+
+    Avec chunksize (nombre de lignes), le fichier est traité en flux à mémoire
+    bornée (cf. clean_demandes_data_chunked) ; la fonction retourne alors un
+    résumé (dict) au lieu du DataFrame.
     """
+    if chunksize:
+        return clean_demandes_data_chunked(input_path, output_path, documentation_path, chunksize)
     
     # --- 1. Chargement des données ---
     try:
@@ -61,20 +96,20 @@ def clean_demandes_data(input_path='d:/public_services_optimization_togo/data_ra
     # Sinon, si 'Rejetée', le motif devrait être présent. Pour les manquants sur 'Rejetée', nous pouvons imputer par 'Non Spécifié'.
     missing_motif_before = df['motif_demande'].isnull().sum()
     df.loc[df['statut_demande'].isin(['Acceptée', 'En cours']) & df['motif_demande'].isnull(), 'motif_demande'] = 'Non Applicable'
-    df['motif_demande'].fillna('Non Spécifié (Rejet)', inplace=True) # Pour les rejets sans motif
+    df['motif_demande'] = df['motif_demande'].fillna('Non Spécifié (Rejet)') # Pour les rejets sans motif
     documentation.append(f"Traitement de 'motif_demande': {missing_motif_before} manquants avant. Imputés par 'Non Applicable' si statut est Acceptée/En cours, ou par 'Non Spécifié (Rejet)' si statut est Rejetée et motif manquant.\n")
     print(f"Traitement de 'motif_demande': {missing_motif_before} manquants avant. Imputés par 'Non Applicable' ou 'Non Spécifié (Rejet)'.")
 
     # 4.2. 'quartier'
     missing_quartier_before = df['quartier'].isnull().sum()
-    df['quartier'].fillna('Inconnu', inplace=True)
+    df['quartier'] = df['quartier'].fillna('Inconnu')
     documentation.append(f"Traitement de 'quartier': {missing_quartier_before} manquants avant. Imputés par 'Inconnu'.\n")
     print(f"Traitement de 'quartier': {missing_quartier_before} manquants avant. Imputés par 'Inconnu'.")
 
     # 4.3. 'age_demandeur'
     missing_age_before = df['age_demandeur'].isnull().sum()
     median_age = df['age_demandeur'].median()
-    df['age_demandeur'].fillna(median_age, inplace=True)
+    df['age_demandeur'] = df['age_demandeur'].fillna(median_age)
     df['age_demandeur'] = df['age_demandeur'].astype(int) # Convertir en entier après imputation
     documentation.append(f"Traitement de 'age_demandeur': {missing_age_before} manquants avant. Imputés par la médiane ({median_age}). Converti en entier.\n")
     print(f"Traitement de 'age_demandeur': {missing_age_before} manquants avant. Imputés par la médiane ({median_age}). Converti en entier.")
@@ -82,51 +117,14 @@ def clean_demandes_data(input_path='d:/public_services_optimization_togo/data_ra
     # 4.4. 'sexe_demandeur'
     missing_sexe_before = df['sexe_demandeur'].isnull().sum()
     mode_sexe = df['sexe_demandeur'].mode()[0] # mode() peut retourner plusieurs valeurs, on prend la première
-    df['sexe_demandeur'].fillna(mode_sexe, inplace=True)
+    df['sexe_demandeur'] = df['sexe_demandeur'].fillna(mode_sexe)
     documentation.append(f"Traitement de 'sexe_demandeur': {missing_sexe_before} manquants avant. Imputés par le mode ({mode_sexe}).\n")
     print(f"Traitement de 'sexe_demandeur': {missing_sexe_before} manquants avant. Imputés par le mode ({mode_sexe}).")
 
     # --- 5. Correction des incohérences et harmonisation des formats ---
-    # --- 5. Correction des incohérences et harmonisation des formats ---
-    def fix_encoding(text):
-        if not isinstance(text, str): return text
-        # Mapping of mangled characters
-        # 0x01F8 is 'Ǹ' which replaces 'é'
-        text = text.replace(chr(0x01F8), 'é')
-        # Common mangled 'é' in other encodings
-        text = text.replace('\ufffd', 'é') 
-        return text
-
-    # Harmonisation des statuts (Spec: Validée, Rejetée, En Attente)
-    status_mapping = {
-        'Traitee': 'Validée',
-        'Traitée': 'Validée',
-        'Rejetée': 'Rejetée',
-        'Rejetée': 'Rejetée',
-        'En Cours': 'En Attente',
-        'En cours': 'En Attente',
-        'Acceptée': 'Validée'
-    }
-
-    cols_category = ['region', 'prefecture', 'commune', 'quartier', 'type_document', 
-                'categorie_document', 'motif_demande', 'statut_demande', 'canal_demande', 'sexe_demandeur']
-    
-    for col in cols_category:
-        if col in df.columns:
-            # 1. Strip and fix mangled chars
-            df[col] = df[col].astype(str).str.strip().apply(fix_encoding)
-            
-            # 2. Normalize spaces
-            df[col] = df[col].str.replace(r'\s+', ' ', regex=True)
-            
-            # 3. Handle special status mapping
-            if col == 'statut_demande':
-                # Exact match first, then partial if needed
-                df[col] = df[col].replace(status_mapping)
-                # Ensure no weird characters left
-                df[col] = df[col].replace('Rejetée', 'Rejetée').replace('Validée', 'Validée')
-            else:
-                df[col] = df[col].str.title()
+    # (status_mapping et cols_category : définis au niveau du module ; normalisation
+    # sur les valeurs distinctes de chaque colonne, cf. text_normalizer)
+    df = _harmonize_text(df)
 
     documentation.append("Harmonisation des statuts et correction des erreurs d'encodage (Ǹ -> é, etc.).\n")
     print("Harmonisation des statuts et correction des erreurs d'encodage.")
@@ -146,27 +144,201 @@ def clean_demandes_data(input_path='d:/public_services_optimization_togo/data_ra
     print(f"Dimensions finales du DataFrame nettoyé: {df.shape}")
 
     # --- 7. Sauvegarde du dataset nettoyé et de la documentation ---
-    output_dir = output_path.rsplit('/', 1)[0]
-    import os
-    os.makedirs(output_dir, exist_ok=True)
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
     
     df.to_csv(output_path, index=False)
     documentation.append(f"Dataset nettoyé sauvegardé à: {output_path}\n")
     print(f"Dataset nettoyé sauvegardé à: {output_path}")
 
+    # Copie colonnaire typée (dates, catégories) lue en priorité par les chargeurs
+    df_columnar = df.copy()
+    for col in cols_category:
+        if col in df_columnar.columns:
+            df_columnar[col] = df_columnar[col].astype('category')
+    columnar_path = write_columnar(df_columnar, output_path)
+    if columnar_path is not None:
+        documentation.append(f"Copie Parquet typée sauvegardée à: {columnar_path}\n")
+        print(f"Copie Parquet typée sauvegardée à: {columnar_path}")
+
     with open(documentation_path, 'w', encoding='utf-8') as f:
         f.writelines(documentation)
     print(f"Documentation des choix de nettoyage sauvegardée à: {documentation_path}")
 
     return df
 
+def _harmonize_text(df):
+    """Étape 5 sur un bloc : encodage, espaces, statuts (même règles que le mode complet)"""
+    for col in cols_category:
+        if col in df.columns:
+            if col == 'statut_demande':
+                df[col] = normalize_categorical(df[col], mapping=status_mapping)
+            else:
+                df[col] = normalize_categorical(df[col], case='title')
+    return df
+
+def _first_occurrences(ids, seen):
+    """
+    Masque des premières occurrences de demande_id, à travers les blocs.
+
+    seen : tableau trié d'empreintes uint64 des identifiants déjà rencontrés
+    (8 octets par identifiant au lieu des chaînes). Retourne (masque, seen mis à jour).
+    """
+    hashes = pd.util.hash_pandas_object(ids, index=False).to_numpy()
+    keep = ~pd.Series(hashes).duplicated().to_numpy()
+    if len(seen):
+        pos = np.searchsorted(seen, hashes)
+        pos[pos == len(seen)] = 0
+        keep &= seen[pos] != hashes
+    return keep, np.union1d(seen, hashes[keep])
+
+def _median_from_counts(counts):
+    """Médiane exacte à partir d'un histogramme {valeur: effectif} (même règle que Series.median)"""
+    counts = counts.sort_index()
+    total = int(counts.sum())
+    if total == 0:
+        return np.nan
+    cumulative = counts.cumsum().to_numpy()
+    values = counts.index.to_numpy()
+    low = values[np.searchsorted(cumulative, (total - 1) // 2 + 1)]
+    high = values[np.searchsorted(cumulative, total // 2 + 1)]
+    return float((low + high) / 2)
+
+def clean_demandes_data_chunked(input_path, output_path, documentation_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Mode streaming de clean_demandes_data pour les extractions volumineuses.
+
+    Passe 1 (légère, 3 colonnes) : détection des doublons de 'demande_id' à
+    travers tous les blocs, histogramme de 'age_demandeur' (médiane exacte)
+    et effectifs de 'sexe_demandeur' (mode), calculés après dédoublonnage
+    comme en mode complet.
+    Passe 2 : nettoyage bloc par bloc avec ces statistiques globales, écriture
+    incrémentale du CSV (et du Parquet si pyarrow est disponible).
+    La mémoire dépend de chunksize, plus 9 octets par ligne pour les doublons.
+    """
+
+    documentation = []
+    documentation.append("--- Documentation du Nettoyage de 'demande_services_public.csv' (mode streaming) ---\n")
+    documentation.append(f"Date du nettoyage: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    documentation.append(f"Taille des blocs: {chunksize} lignes\n")
+
+    # --- Passe 1: doublons et statistiques globales ---
+    try:
+        reader = pd.read_csv(input_path, usecols=['demande_id', 'age_demandeur', 'sexe_demandeur'],
+                             chunksize=chunksize)
+        seen = np.empty(0, dtype=np.uint64)
+        keep_masks = []
+        age_counts = pd.Series(dtype='int64')
+        sexe_counts = pd.Series(dtype='int64')
+        n_rows = 0
+        for chunk in reader:
+            keep, seen = _first_occurrences(chunk['demande_id'], seen)
+            keep_masks.append(keep)
+            n_rows += len(chunk)
+            chunk = chunk[keep]
+            age_counts = age_counts.add(chunk['age_demandeur'].value_counts(), fill_value=0)
+            sexe_counts = sexe_counts.add(chunk['sexe_demandeur'].value_counts(), fill_value=0)
+        keep_mask = np.concatenate(keep_masks) if keep_masks else np.empty(0, dtype=bool)
+        del seen, keep_masks
+    except FileNotFoundError:
+        print(f"Erreur: Le fichier {input_path} n'a pas été trouvé. Veuillez vérifier le chemin.")
+        return None
+    except Exception as e:
+        print(f"Une erreur est survenue lors du chargement: {e}")
+        return None
+
+    n_duplicates = int(n_rows - keep_mask.sum())
+    median_age = _median_from_counts(age_counts)
+    # mode() trie les valeurs ex aequo : on retient la plus petite
+    mode_sexe = sexe_counts.sort_index().idxmax() if len(sexe_counts) else None
+    print(f"Passe 1: {n_rows} lignes, {n_duplicates} doublons sur 'demande_id', "
+          f"médiane âge = {median_age}, mode sexe = {mode_sexe}")
+    documentation.append(f"Lignes initiales: {n_rows}\n")
+    if n_duplicates > 0:
+        documentation.append(f"Supprimé {n_duplicates} doublons basés sur 'demande_id' (détection inter-blocs).\n")
+    else:
+        documentation.append("Aucun doublon trouvé sur 'demande_id'.\n")
+
+    # --- Passe 2: nettoyage bloc par bloc ---
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    missing = {'motif_demande': 0, 'quartier': 0, 'age_demandeur': 0, 'sexe_demandeur': 0}
+    n_out = 0
+    offset = 0
+    columnar = ColumnarWriter(output_path)
+    try:
+        for i, df in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+            n_chunk = len(df)
+            df = df[keep_mask[offset:offset + n_chunk]].copy()
+            offset += n_chunk
+            df['date_demande'] = pd.to_datetime(df['date_demande'])
+
+            for col in missing:
+                missing[col] += int(df[col].isnull().sum())
+            df.loc[df['statut_demande'].isin(['Acceptée', 'En cours']) & df['motif_demande'].isnull(), 'motif_demande'] = 'Non Applicable'
+            df['motif_demande'] = df['motif_demande'].fillna('Non Spécifié (Rejet)')
+            df['quartier'] = df['quartier'].fillna('Inconnu')
+            df['age_demandeur'] = df['age_demandeur'].fillna(median_age).astype(int)
+            df['sexe_demandeur'] = df['sexe_demandeur'].fillna(mode_sexe)
+
+            df = _harmonize_text(df)
+            df['taux_rejet'] = pd.to_numeric(df['taux_rejet'], errors='coerce').fillna(0).clip(0, 1)
+
+            df['annee_demande'] = df['date_demande'].dt.year
+            df['mois_demande'] = df['date_demande'].dt.month
+            df['jour_semaine_demande'] = df['date_demande'].dt.day_name()
+
+            df.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            columnar.write(df)
+            n_out += len(df)
+            print(f"Bloc {i + 1}: {len(df)} lignes écrites ({n_out} au total)")
+    finally:
+        columnar_path = columnar.close()
+
+    documentation.append(f"Traitement de 'motif_demande': {missing['motif_demande']} manquants avant. Imputés par 'Non Applicable' si statut est Acceptée/En cours, ou par 'Non Spécifié (Rejet)' si statut est Rejetée et motif manquant.\n")
+    documentation.append(f"Traitement de 'quartier': {missing['quartier']} manquants avant. Imputés par 'Inconnu'.\n")
+    documentation.append(f"Traitement de 'age_demandeur': {missing['age_demandeur']} manquants avant. Imputés par la médiane globale ({median_age}). Converti en entier.\n")
+    documentation.append(f"Traitement de 'sexe_demandeur': {missing['sexe_demandeur']} manquants avant. Imputés par le mode global ({mode_sexe}).\n")
+    documentation.append("Harmonisation des statuts et correction des erreurs d'encodage (Ǹ -> é, etc.).\n")
+    documentation.append("Clipé 'taux_rejet' pour s'assurer qu'il est entre 0 et 1.\n")
+    documentation.append("Ajout des colonnes 'annee_demande', 'mois_demande', 'jour_semaine_demande' à partir de 'date_demande'.\n")
+    documentation.append(f"\nLignes finales: {n_out}\n")
+    documentation.append(f"Dataset nettoyé sauvegardé à: {output_path}\n")
+    if columnar_path is not None:
+        documentation.append(f"Copie Parquet typée sauvegardée à: {columnar_path}\n")
+
+    with open(documentation_path, 'w', encoding='utf-8') as f:
+        f.writelines(documentation)
+    print(f"Documentation des choix de nettoyage sauvegardée à: {documentation_path}")
+
+    return {
+        'rows_in': n_rows,
+        'rows_out': n_out,
+        'duplicates': n_duplicates,
+        'median_age': median_age,
+        'mode_sexe': mode_sexe,
+        'missing': missing,
+    }
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Nettoyage de demande_services_public.csv")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"Mode streaming par blocs de N lignes (ex. {DEFAULT_CHUNKSIZE})")
+    args = parser.parse_args()
+
     print("Démarrage du script de nettoyage pour demande_services_public.csv...")
-    cleaned_df = clean_demandes_data()
-    if cleaned_df is not None:
+    cleaned_df = clean_demandes_data(chunksize=args.chunksize)
+    if isinstance(cleaned_df, dict):
+        print("\nNettoyage en flux terminé:", cleaned_df)
+    elif cleaned_df is not None:
         print("\nNettoyage terminé. Aperçu du DataFrame nettoyé:")
-        display(cleaned_df.head())
+        print(cleaned_df.head())
         print("\nInformations finales du DataFrame nettoyé:")
         cleaned_df.info()
         print("\nRésumé des valeurs manquantes dans le DataFrame nettoyé:")
-        print(cleaned_df.isnull().sum()[cleaned_df.isnull().sum() > 0]) # Devrait être vide
\ No newline at end of file
+        print(cleaned_df.isnull().sum()[cleaned_df.isnull().sum() > 0]) # Devrait être vide
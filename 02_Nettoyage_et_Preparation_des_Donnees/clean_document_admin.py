@@ -3,6 +3,8 @@ import pandas as pd
 def clean_demandes_data(df):
     """
     Transforme les numéros de mois en noms et optimise les types de données.
+    Sauvegarder le résultat avec columnar_cache.export_cleaned pour conserver
+    les colonnes 'category' (le CSV seul les perd).
     """
     # 1. Création du dictionnaire de correspondance
     mois_map = {
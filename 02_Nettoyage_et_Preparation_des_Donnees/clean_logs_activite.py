@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from text_normalizer import normalize_categorical
+
 def clean_logs_activite(df):
     """
     Nettoie le DataFrame des logs d'activité.
@@ -28,9 +30,10 @@ def clean_logs_activite(df):
             df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce').fillna(0)
 
     # --- 3. Nettoyage textuel ---
+    # Encodage et espaces normalisés sur les valeurs distinctes (cf. text_normalizer)
     cols_str = ['type_operation', 'raison_rejet', 'incident_technique']
     for col in cols_str:
         if col in df_clean.columns:
-            df_clean[col] = df_clean[col].astype(str).str.strip()
+            df_clean[col] = normalize_categorical(df_clean[col])
 
     return df_clean
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+Cache colonnaire (Parquet) des jeux de données nettoyés.
+
+Chaque CSV de data_cleaned/ peut être accompagné d'un fichier .parquet de même
+nom, écrit à la fin du nettoyage. Les types survivent au passage disque
+(datetime, category, entiers) et les chargeurs lisent uniquement les colonnes
+dont ils ont besoin, sans re-parser le texte ni rappeler pd.to_datetime.
+
+Le CSV reste la référence lisible : si pyarrow est absent, ou si le Parquet est
+plus ancien que le CSV (CSV régénéré depuis un notebook), on relit le CSV.
+pyarrow est une dépendance déclarée (04_Dashboard/requirements_dashboard.txt) ;
+son absence est signalée par un avertissement à l'écriture et par
+parquet_status à la lecture.
+"""
+
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+PARQUET_COMPRESSION = 'zstd'
+DEFAULT_BATCH_ROWS = 50_000
+
+
+def parquet_path(csv_path):
+    """Chemin du Parquet associé à un CSV nettoyé (même nom, extension .parquet)"""
+    return Path(csv_path).with_suffix('.parquet')
+
+
+def parquet_status(csv_path):
+    """
+    Le Parquet associé au CSV est-il exploitable ?
+
+    Retourne (True, None), ou (False, raison) : pyarrow absent, Parquet
+    absent, ou Parquet plus ancien que le CSV.
+    """
+    if not HAS_PYARROW:
+        return False, "pyarrow non installé"
+    pq_path = parquet_path(csv_path)
+    if not pq_path.exists():
+        return False, f"{pq_path.name} absent"
+    csv_path = Path(csv_path)
+    if csv_path.exists() and pq_path.stat().st_mtime < csv_path.stat().st_mtime:
+        return False, f"{pq_path.name} plus ancien que {csv_path.name}"
+    return True, None
+
+
+def has_fresh_parquet(csv_path):
+    """Vrai si un Parquet exploitable existe et n'est pas plus ancien que le CSV"""
+    return parquet_status(csv_path)[0]
+
+
+def _warn_no_pyarrow(csv_path):
+    warnings.warn(f"pyarrow non installé : Parquet de {Path(csv_path).name} non écrit "
+                  f"(les chargeurs reliront le CSV)", RuntimeWarning, stacklevel=3)
+
+
+def write_columnar(df, csv_path):
+    """
+    Écrit le Parquet compressé associé à csv_path.
+
+    Retourne le chemin écrit, ou None si pyarrow n'est pas installé
+    (avec un RuntimeWarning).
+    """
+    if not HAS_PYARROW:
+        _warn_no_pyarrow(csv_path)
+        return None
+    pq_path = parquet_path(csv_path)
+    pq_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(pq_path, engine='pyarrow', compression=PARQUET_COMPRESSION, index=False)
+    return pq_path
+
+
+class ColumnarWriter:
+    """
+    Écriture incrémentale du Parquet associé à csv_path (mode streaming).
+
+    Le schéma est fixé par le premier bloc ; les blocs suivants y sont convertis.
+    Sans pyarrow, write() et close() ne font rien (un RuntimeWarning au 1er bloc).
+    """
+
+    def __init__(self, csv_path):
+        self.path = parquet_path(csv_path)
+        self._writer = None
+        self._schema = None
+        self._warned = False
+
+    def write(self, df):
+        if not HAS_PYARROW:
+            if not self._warned:
+                _warn_no_pyarrow(self.path.with_suffix(".csv"))
+                self._warned = True
+            return
+        if self._writer is None:
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            # Une colonne entièrement vide dans le 1er bloc serait typée null
+            for i, field in enumerate(schema):
+                if pa.types.is_null(field.type):
+                    schema = schema.set(i, pa.field(field.name, pa.string()))
+            self._schema = schema
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, schema, compression=PARQUET_COMPRESSION)
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Ferme le fichier ; retourne son chemin, ou None si rien n'a été écrit"""
+        if self._writer is None:
+            return None
+        self._writer.close()
+        self._writer = None
+        return self.path
+
+
+def export_cleaned(df, csv_path):
+    """Sauvegarde un jeu nettoyé : CSV (référence) puis Parquet (typé)"""
+    csv_path = Path(csv_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(csv_path, index=False)
+    return write_columnar(df, csv_path)
+
+
+def parquet_columns(csv_path):
+    """Noms des colonnes du Parquet (lecture du schéma seulement)"""
+    return pq.read_schema(parquet_path(csv_path)).names
+
+
+def read_cleaned(csv_path, columns=None):
+    """
+    Lit un jeu nettoyé, de préférence depuis son Parquet.
+
+    columns : projection optionnelle ; les colonnes absentes du fichier sont
+    ignorées. Depuis le CSV, les types ne sont pas restaurés.
+    """
+    if has_fresh_parquet(csv_path):
+        if columns is not None:
+            available = set(parquet_columns(csv_path))
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(parquet_path(csv_path), columns=columns)
+    if columns is not None:
+        wanted = set(columns)
+        return pd.read_csv(csv_path, usecols=lambda c: c in wanted)
+    return pd.read_csv(csv_path)
+
+
+def _decode_dictionaries(batch):
+    """Les colonnes 'category' (dictionnaires Arrow) sont ramenées à leur type de valeurs"""
+    arrays = []
+    for col in batch.columns:
+        if pa.types.is_dictionary(col.type):
+            col = pc.cast(col, col.type.value_type)
+        arrays.append(col)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+
+def iter_parquet_batches(csv_path, columns=None, batch_rows=DEFAULT_BATCH_ROWS):
+    """Parcourt le Parquet associé par lots Arrow (mémoire bornée)"""
+    parquet_file = pq.ParquetFile(parquet_path(csv_path))
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+        yield _decode_dictionaries(batch)
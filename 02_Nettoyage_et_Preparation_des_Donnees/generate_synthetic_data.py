@@ -0,0 +1,307 @@
+# generate_synthetic_data.py
+"""
+Générateur de données synthétiques à grande échelle (tests de performance).
+
+Produit, à partir des fichiers réels de data_raw/, des jeux de même schéma
+multipliés par un facteur d'échelle :
+    demandes_service_public.csv, logs_activite.csv, centres_service.csv
+    + details_communes.csv, donnees_socioeconomiques.csv, developpement.csv (copiés)
+
+Principe : rééchantillonnage des lignes réelles (bootstrap) puis régénération
+des identifiants, des dates et des mesures numériques. Les combinaisons
+réelles sont donc conservées : hiérarchie région / préfecture / commune /
+quartier, couples type / catégorie de document, distributions des statuts,
+canaux et motifs. Les défauts traités par les scripts de nettoyage sont
+réinjectés à taux contrôlés (DIRTY_RATES) : 'é' corrompus, espaces parasites,
+motifs / quartiers / âges / sexes manquants, variantes de statuts, doublons
+de demande_id.
+
+Tout est vectorisé (numpy, codes catégoriels) et produit par blocs de taille
+fixe : la sortie ne dépend que de (seed, scale), pas de la machine. Les blocs
+sont écrits par le writer CSV de pyarrow (formatage natif en C++), ou
+par DataFrame.to_csv si pyarrow n'est pas installé.
+
+Usage:
+    python generate_synthetic_data.py --scale 1000 --seed 42 --output ../data_synth/x1000
+"""
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+DATA_RAW_DIR = PROJECT_DIR / "data_raw"
+
+# Taille des blocs générés puis écrits (fixe pour garantir le déterminisme)
+CHUNK_ROWS = 1_000_000
+
+# Fichiers de référentiel recopiés tels quels (hiérarchie territoriale réelle)
+REFERENCE_FILES = ['details_communes.csv', 'donnees_socioeconomiques.csv', 'developpement.csv']
+
+# Taux de défauts injectés (proportion des lignes concernées)
+DIRTY_RATES = {
+    'encodage': 0.02,          # 'é' -> 'Ǹ' ou '�'
+    'espaces': 0.02,           # espaces parasites autour / dans le texte
+    'motif_manquant': 0.05,
+    'quartier_manquant': 0.02,
+    'age_manquant': 0.01,
+    'sexe_manquant': 0.01,
+    'statut_variante': 0.05,   # 'Traitée', 'En Cours', 'Acceptée'...
+    'doublon_id': 0.001,
+}
+
+DEMANDES_TEXT_COLS = ['region', 'prefecture', 'commune', 'quartier', 'type_document',
+                      'categorie_document', 'motif_demande', 'statut_demande', 'canal_demande']
+STATUS_VARIANTS = {'Traitee': ['Traitée', 'Acceptée'], 'En cours': ['En Cours'], 'Rejetée': ['Rejetée']}
+
+MANGLED_E = [chr(0x01F8), '�']
+
+
+# ============================================================================
+# OUTILS VECTORISÉS
+# ============================================================================
+
+def _to_categorical(df, columns):
+    """Colonnes texte -> category (rééchantillonnage et écriture par codes)"""
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+def _apply_variants(series, mask, variant_fn):
+    """
+    Remplace les valeurs des lignes `mask` par variant_fn(valeur), par codes.
+
+    Les variantes de chaque catégorie sont calculées une seule fois ; seules
+    les lignes masquées voient leur code décalé vers la catégorie variante.
+    """
+    cat = series.cat
+    categories = list(cat.categories)
+    variants = [variant_fn(v) if isinstance(v, str) else v for v in categories]
+    index = {v: i for i, v in enumerate(categories)}
+    for v in variants:
+        index.setdefault(v, len(index))
+    remap = np.array([index[v] for v in variants], dtype=np.int64)
+
+    codes = cat.codes.to_numpy().astype(np.int64)
+    target = mask & (codes >= 0)
+    codes[target] = remap[codes[target]]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=list(index)), index=series.index)
+
+def _mangle_e(rng):
+    replacement = MANGLED_E[int(rng.integers(len(MANGLED_E)))]
+    return lambda text: text.replace('é', replacement)
+
+def _pad_spaces(text):
+    return f" {text.replace(' ', '  ')} "
+
+def _random_dates(rng, n, start, end):
+    days = (end - start).days + 1
+    return start + pd.to_timedelta(rng.integers(0, days, n), unit='D')
+
+def _format_ids(prefix, numbers, width):
+    return prefix + pd.Series(numbers).astype(str).str.zfill(width)
+
+def _ids(prefix, start, n, width):
+    return _format_ids(prefix, np.arange(start, start + n), width)
+
+def _to_arrow(df):
+    """DataFrame -> table Arrow (catégories décodées : le writer CSV attend du texte)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    columns = [col.cast(col.type.value_type) if pa.types.is_dictionary(col.type) else col
+               for col in table.columns]
+    return pa.Table.from_arrays(columns, names=table.column_names)
+
+def _write_chunk(df, path, first):
+    """Écrit (ou ajoute) un bloc au CSV ; en-tête au premier bloc seulement"""
+    if not HAS_PYARROW:
+        df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+        return
+    with open(path, 'wb' if first else 'ab') as f:
+        pa_csv.write_csv(_to_arrow(df), f, write_options=pa_csv.WriteOptions(include_header=first))
+
+
+# ============================================================================
+# GÉNÉRATEURS PAR FICHIER
+# ============================================================================
+
+def generate_centres(seed_df, rng, factor):
+    """Centres réels répliqués `factor` fois (coordonnées et capacités perturbées)"""
+    n = len(seed_df) * factor
+    out = seed_df.iloc[np.tile(np.arange(len(seed_df)), factor)].reset_index(drop=True)
+    replica = np.repeat(np.arange(factor), len(seed_df))
+
+    out['centre_id'] = _ids('CT', 1, n, max(3, len(str(n))))
+    suffix = np.where(replica > 0, ' ' + (replica + 1).astype(str), '')
+    out['nom_centre'] = out['nom_centre'].astype(str) + suffix
+    jitter = np.where(replica > 0, 1.0, 0.0)
+    out['latitude'] = (out['latitude'] + rng.normal(0, 0.05, n) * jitter).round(4)
+    out['longitude'] = (out['longitude'] + rng.normal(0, 0.05, n) * jitter).round(4)
+    scale = np.where(replica > 0, rng.uniform(0.7, 1.3, n), 1.0)
+    out['personnel_capacite_jour'] = np.maximum(10, (out['personnel_capacite_jour'] * scale).round()).astype(int)
+    out['nombre_guichets'] = np.maximum(1, (out['nombre_guichets'] * scale).round()).astype(int)
+    return out
+
+def generate_demandes_chunk(seed_df, rng, start_id, n, start_date, end_date, id_width):
+    """Bloc de n demandes rééchantillonnées à partir des demandes réelles"""
+    idx = rng.integers(0, len(seed_df), n)
+    df = seed_df.iloc[idx].reset_index(drop=True)
+
+    df['demande_id'] = _ids('D', start_id, n, id_width)
+    df['date_demande'] = _random_dates(rng, n, start_date, end_date).strftime('%Y-%m-%d')
+    df['nombre_demandes'] = rng.integers(10, 201, n)
+    df['delai_traitement_jours'] = rng.integers(1, 46, n)
+    df['taux_rejet'] = (rng.integers(0, 16, n) / 100).round(2)
+    df['age_demandeur'] = rng.integers(18, 91, n).astype(float)
+
+    # --- Défauts réinjectés ---
+    rates = DIRTY_RATES
+    dup = rng.random(n) < rates['doublon_id']
+    if dup.any():
+        # Réutilise un identifiant déjà émis, dans ce bloc ou un précédent (doublon intra ou inter-blocs)
+        df.loc[dup, 'demande_id'] = _format_ids('D', rng.integers(1, start_id + n, int(dup.sum())),
+                                                id_width).to_numpy()
+
+    for col in DEMANDES_TEXT_COLS:
+        mask = rng.random(n) < rates['encodage']
+        df[col] = _apply_variants(df[col], mask, _mangle_e(rng))
+        mask = rng.random(n) < rates['espaces']
+        df[col] = _apply_variants(df[col], mask, _pad_spaces)
+
+    draw = rng.random(n)
+    variant_pick = rng.integers(0, 2, n)
+    for pick in (0, 1):
+        mask = (draw < rates['statut_variante']) & (variant_pick == pick)
+        df['statut_demande'] = _apply_variants(
+            df['statut_demande'], mask,
+            lambda v, pick=pick: STATUS_VARIANTS.get(v, [v])[min(pick, len(STATUS_VARIANTS.get(v, [v])) - 1)]
+        )
+
+    for col, key in [('motif_demande', 'motif_manquant'), ('quartier', 'quartier_manquant'),
+                     ('age_demandeur', 'age_manquant'), ('sexe_demandeur', 'sexe_manquant')]:
+        mask = rng.random(n) < rates[key]
+        df.loc[mask, col] = np.nan
+    df['age_demandeur'] = df['age_demandeur'].astype('Int64')
+    return df
+
+def generate_logs_chunk(seed_df, centre_ids, rng, start_id, n, start_date, end_date, id_width):
+    """Bloc de n journaux d'activité rééchantillonnés, rattachés aux centres générés"""
+    idx = rng.integers(0, len(seed_df), n)
+    df = seed_df.iloc[idx].reset_index(drop=True)
+
+    df['log_id'] = _ids('LOG', start_id, n, id_width)
+    df['centre_id'] = centre_ids[rng.integers(0, len(centre_ids), n)]
+    df['date_operation'] = _random_dates(rng, n, start_date, end_date).strftime('%Y-%m-%d')
+
+    # Les opérations hors traitement restent à 0 (comme dans les données réelles)
+    traitement = (df['type_operation'] == 'Traitement').to_numpy()
+    nombre_traite = np.where(traitement, rng.integers(1, 300, n), 0)
+    df['nombre_traite'] = nombre_traite
+    df['delai_effectif'] = np.where(traitement, rng.integers(0, 46, n), 0)
+    df['nombre_rejete'] = (nombre_traite * rng.uniform(0, 0.15, n)).astype(int)
+    df['personnel_present'] = rng.integers(2, 16, n)
+    df['temps_attente_moyen_minutes'] = np.where(traitement, rng.integers(0, 121, n), 0)
+
+    mask = rng.random(n) < DIRTY_RATES['encodage']
+    df['type_document'] = _apply_variants(df['type_document'], mask, _mangle_e(rng))
+    return df
+
+
+# ============================================================================
+# ORCHESTRATION
+# ============================================================================
+
+def _chunk_sizes(total, chunk_rows=CHUNK_ROWS):
+    full, rest = divmod(total, chunk_rows)
+    return [chunk_rows] * full + ([rest] if rest else [])
+
+def generate(scale, seed=42, output_dir=None, start_date='2023-01-01', end_date='2023-12-31',
+             raw_dir=DATA_RAW_DIR):
+    """
+    Génère l'ensemble des fichiers à l'échelle `scale` (1 = volume réel).
+
+    Retourne {fichier: nombre de lignes}.
+    """
+    raw_dir = Path(raw_dir)
+    output_dir = Path(output_dir or PROJECT_DIR / "data_synth" / f"x{scale:g}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    # Un flux aléatoire indépendant par fichier et par bloc
+    streams = np.random.SeedSequence(seed).spawn(3)
+    summary = {}
+
+    # --- Centres (croissance en racine de l'échelle) ---
+    centres_seed = pd.read_csv(raw_dir / 'centres_service.csv')
+    factor = max(1, int(round(np.sqrt(scale))))
+    centres = generate_centres(centres_seed, np.random.default_rng(streams[0]), factor)
+    centres.to_csv(output_dir / 'centres_service.csv', index=False)
+    summary['centres_service.csv'] = len(centres)
+
+    # --- Demandes ---
+    demandes_seed = _to_categorical(
+        pd.read_csv(raw_dir / 'demandes_service_public.csv'),
+        DEMANDES_TEXT_COLS + ['sexe_demandeur']
+    )
+    total = int(round(len(demandes_seed) * scale))
+    id_width = max(3, len(str(total)))
+    path = output_dir / 'demandes_service_public.csv'
+    written = 0
+    for i, (n, stream) in enumerate(zip(_chunk_sizes(total), streams[1].spawn(len(_chunk_sizes(total))))):
+        chunk = generate_demandes_chunk(demandes_seed, np.random.default_rng(stream), written + 1, n,
+                                        start_date, end_date, id_width)
+        _write_chunk(chunk, path, first=(i == 0))
+        written += n
+    summary['demandes_service_public.csv'] = written
+
+    # --- Logs d'activité ('N/A' conservé tel quel, comme dans le fichier réel) ---
+    logs_seed = _to_categorical(
+        pd.read_csv(raw_dir / 'logs_activite.csv', keep_default_na=False),
+        ['type_operation', 'type_document', 'raison_rejet', 'incident_technique', 'heure_debut', 'heure_fin']
+    )
+    total = int(round(len(logs_seed) * scale))
+    id_width = max(3, len(str(total)))
+    centre_ids = centres['centre_id'].to_numpy()
+    path = output_dir / 'logs_activite.csv'
+    written = 0
+    for i, (n, stream) in enumerate(zip(_chunk_sizes(total), streams[2].spawn(len(_chunk_sizes(total))))):
+        chunk = generate_logs_chunk(logs_seed, centre_ids, np.random.default_rng(stream), written + 1, n,
+                                    start_date, end_date, id_width)
+        _write_chunk(chunk, path, first=(i == 0))
+        written += n
+    summary['logs_activite.csv'] = written
+
+    # --- Référentiels ---
+    for name in REFERENCE_FILES:
+        if (raw_dir / name).exists():
+            shutil.copyfile(raw_dir / name, output_dir / name)
+            summary[name] = sum(1 for _ in open(raw_dir / name, encoding='utf-8')) - 1
+
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génération de données synthétiques à l'échelle")
+    parser.add_argument('--scale', type=float, default=10, help="Facteur d'échelle (1 = volume de data_raw)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine (sortie identique à graine égale)")
+    parser.add_argument('--output', default=None, help="Répertoire de sortie (défaut: data_synth/x<scale>)")
+    parser.add_argument('--start-date', default='2023-01-01')
+    parser.add_argument('--end-date', default='2023-12-31')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = generate(args.scale, args.seed, args.output, args.start_date, args.end_date)
+    elapsed = time.perf_counter() - start
+    for name, rows in summary.items():
+        print(f" {name:35} {rows:>12,} lignes")
+    print(f"Généré en {elapsed:.1f}s")
@@ -0,0 +1,242 @@
+"""
+Orchestration du Nettoyage
+==========================
+
+Point d'entrée unique du nettoyage : découvre les fichiers de data_raw/,
+exécute le nettoyeur de chaque jeu de données dans un pool de processus et
+écrit les résultats dans data_cleaned/ (CSV + Parquet, cf. columnar_cache).
+
+Un jeu de données est ignoré si rien n'a changé depuis le dernier passage :
+- empreinte SHA-256 du fichier brut (recalculée seulement si sa taille ou sa
+  date de modification a changé) ;
+- version du nettoyeur = empreinte de ses fichiers sources (module du
+  nettoyeur, text_normalizer, columnar_cache) ;
+- fichier nettoyé toujours présent.
+Ces informations sont conservées dans data_cleaned/cleaning_manifest.json.
+
+Un rafraîchissement complet dure autant que le jeu le plus lent ; sans
+changement, il se limite à quelques stat().
+
+Usage:
+    python run_cleaning.py                  # jeux modifiés seulement
+    python run_cleaning.py --force          # tout renettoyer
+    python run_cleaning.py --only logs_activite.csv --jobs 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from columnar_cache import export_cleaned
+from clean_centre_service import clean_centre_service
+from clean_demandes_data import clean_demandes_data
+from clean_document_admin import clean_demandes_data as clean_document_admin
+from clean_logs_activite import clean_logs_activite
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+RAW_DIR = PACKAGE_DIR.parent / "data_raw"
+CLEANED_DIR = PACKAGE_DIR / "data_cleaned"
+MANIFEST_NAME = "cleaning_manifest.json"
+
+# Sources communes à tous les nettoyeurs (normalisation, écriture)
+SHARED_SOURCES = ('text_normalizer.py', 'columnar_cache.py')
+
+# Fichier brut -> nettoyeur, fichier nettoyé, source du nettoyeur
+# (les fichiers bruts absents de ce registre sont nettoyés dans les notebooks)
+CLEANERS = {
+    'centres_service.csv': {
+        'cleaner': 'centres',
+        'output': 'centres_service_cleaned.csv',
+        'source': 'clean_centre_service.py',
+    },
+    'demandes_service_public.csv': {
+        'cleaner': 'demandes',
+        'output': 'demande_services_public_cleaned.csv',
+        'source': 'clean_demandes_data.py',
+    },
+    'logs_activite.csv': {
+        'cleaner': 'logs',
+        'output': 'logs_activite_cleaned.csv',
+        'source': 'clean_logs_activite.py',
+    },
+    'documents_administratifs_ext.csv': {
+        'cleaner': 'documents',
+        'output': 'document_administratif_ext_cleaned.csv',
+        'source': 'clean_document_admin.py',
+    },
+}
+
+# Nettoyeurs prenant et retournant un DataFrame
+DATAFRAME_CLEANERS = {
+    'centres': clean_centre_service,
+    'logs': clean_logs_activite,
+    'documents': clean_document_admin,
+}
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cleaner_version(raw_name):
+    """Version d'un nettoyeur : empreinte de ses fichiers sources"""
+    digest = hashlib.sha256()
+    for source in (CLEANERS[raw_name]['source'],) + SHARED_SOURCES:
+        digest.update(source.encode())
+        digest.update((PACKAGE_DIR / source).read_bytes())
+    return digest.hexdigest()[:16]
+
+def load_manifest(cleaned_dir):
+    path = Path(cleaned_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, cleaned_dir):
+    """Écriture atomique (un arrêt en cours de passage ne corrompt pas le manifeste)"""
+    path = Path(cleaned_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def raw_state(raw_path, previous):
+    """
+    Taille, date de modification et empreinte du fichier brut.
+
+    L'empreinte du manifeste est reprise telle quelle si taille et date
+    n'ont pas bougé : un passage sans changement ne relit aucun fichier.
+    """
+    stat = raw_path.stat()
+    state = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and all(previous.get(k) == v for k, v in state.items()) and previous.get('sha256'):
+        state['sha256'] = previous['sha256']
+    else:
+        state['sha256'] = file_digest(raw_path)
+    return state
+
+def plan(raw_dir=RAW_DIR, cleaned_dir=CLEANED_DIR, manifest=None, force=False, only=None):
+    """
+    Jeux de données à nettoyer.
+
+    Retourne (tâches, à_jour, sans_nettoyeur) : chaque tâche est un dict
+    raw_name, raw_path, output_path, state (fichier brut), version. Pour les
+    jeux à jour, la taille et la date du manifeste sont rafraîchies (un
+    fichier simplement touché n'est relu qu'une fois).
+    """
+    manifest = manifest or {}
+    tasks, up_to_date, unmanaged = [], [], []
+    for raw_path in sorted(Path(raw_dir).glob('*.csv')):
+        raw_name = raw_path.name
+        if only and raw_name not in only:
+            continue
+        if raw_name not in CLEANERS:
+            unmanaged.append(raw_name)
+            continue
+        previous = manifest.get(raw_name, {})
+        state = raw_state(raw_path, previous)
+        version = cleaner_version(raw_name)
+        output_path = Path(cleaned_dir) / CLEANERS[raw_name]['output']
+        unchanged = (previous.get('sha256') == state['sha256'] and previous.get('version') == version
+                     and output_path.exists())
+        if unchanged and not force:
+            previous.update(state)
+            up_to_date.append(raw_name)
+            continue
+        tasks.append({'raw_name': raw_name, 'raw_path': str(raw_path), 'output_path': str(output_path),
+                      'state': state, 'version': version})
+    return tasks, up_to_date, unmanaged
+
+def clean_dataset(raw_name, raw_path, output_path, chunksize=None):
+    """Nettoie un jeu de données (exécuté dans un processus du pool) ; retourne le nombre de lignes"""
+    cleaner = CLEANERS[raw_name]['cleaner']
+    if cleaner == 'demandes':
+        documentation_path = os.path.join(os.path.dirname(output_path), 'documentation_demandes_cleaning.txt')
+        result = clean_demandes_data(raw_path, output_path, documentation_path, chunksize=chunksize)
+        if result is None:
+            raise RuntimeError(f"échec du nettoyage de {raw_name}")
+        return result['rows_out'] if isinstance(result, dict) else len(result)
+    df = DATAFRAME_CLEANERS[cleaner](pd.read_csv(raw_path))
+    export_cleaned(df, output_path)
+    return len(df)
+
+def _run_task(task, chunksize):
+    start = time.perf_counter()
+    rows = clean_dataset(task['raw_name'], task['raw_path'], task['output_path'], chunksize=chunksize)
+    return rows, time.perf_counter() - start
+
+def run_cleaning(raw_dir=RAW_DIR, cleaned_dir=CLEANED_DIR, force=False, only=None, jobs=None, chunksize=None):
+    """
+    Nettoie les jeux de données modifiés en parallèle et met à jour le manifeste.
+
+    Le manifeste est enregistré après chaque jeu terminé ; un jeu en échec
+    garde son ancienne entrée et sera retenté au prochain passage.
+    Retourne {fichier brut: 'nettoyé' | 'à jour' | 'sans nettoyeur' | 'échec: ...'}.
+    """
+    Path(cleaned_dir).mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(cleaned_dir)
+    tasks, up_to_date, unmanaged = plan(raw_dir, cleaned_dir, manifest, force=force, only=only)
+
+    if up_to_date:
+        save_manifest(manifest, cleaned_dir)
+
+    status = {name: 'à jour' for name in up_to_date}
+    status.update({name: 'sans nettoyeur' for name in unmanaged})
+    if not tasks:
+        return status
+
+    workers = min(jobs or os.cpu_count() or 1, len(tasks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_task, task, chunksize): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            raw_name = task['raw_name']
+            try:
+                rows, seconds = future.result()
+            except Exception as e:
+                status[raw_name] = f"échec: {e}"
+                print(f"[ÉCHEC] {raw_name}: {e}")
+                continue
+            manifest[raw_name] = dict(task['state'], version=task['version'], output=CLEANERS[raw_name]['output'],
+                                      rows=int(rows), seconds=round(seconds, 3),
+                                      cleaned_at=pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'))
+            save_manifest(manifest, cleaned_dir)
+            status[raw_name] = 'nettoyé'
+            print(f"[OK] {raw_name} -> {CLEANERS[raw_name]['output']} ({rows} lignes, {seconds:.2f}s)")
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Nettoyage parallèle et incrémental de data_raw/")
+    parser.add_argument('--raw-dir', default=str(RAW_DIR), help="Répertoire des fichiers bruts")
+    parser.add_argument('--cleaned-dir', default=str(CLEANED_DIR), help="Répertoire de sortie")
+    parser.add_argument('--force', action='store_true', help="Renettoyer même les jeux inchangés")
+    parser.add_argument('--only', nargs='+', metavar='FICHIER', help="Limiter à ces fichiers bruts")
+    parser.add_argument('--jobs', type=int, default=None, help="Nombre de processus (défaut: nb de CPU)")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Mode streaming des demandes par blocs de N lignes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    status = run_cleaning(args.raw_dir, args.cleaned_dir, force=args.force, only=args.only,
+                          jobs=args.jobs, chunksize=args.chunksize)
+    print(f"\nRésumé ({time.perf_counter() - start:.2f}s):")
+    for raw_name in sorted(status):
+        print(f"  {raw_name:<40} {status[raw_name]}")
+    if any(s.startswith('échec') for s in status.values()):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
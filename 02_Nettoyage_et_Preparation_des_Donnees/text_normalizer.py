@@ -0,0 +1,84 @@
+"""
+Normalisation textuelle des colonnes catégorielles, partagée par les nettoyeurs.
+
+Une colonne comme region, commune ou statut_demande compte quelques centaines
+de valeurs distinctes pour des millions de lignes : la colonne est factorisée
+(pd.factorize), seules ses valeurs uniques sont normalisées en Python, puis
+les codes sont ramenés sur les catégories normalisées. Le coût dépend de la
+cardinalité, pas du nombre de lignes.
+
+Règles appliquées à chaque valeur unique (mêmes résultats que l'ancienne
+chaîne astype(str) / strip / fix_encoding / espaces / casse) :
+- valeurs manquantes -> 'nan' (comme astype(str)), puis règles ci-dessous ;
+- caractères mal encodés (U+01F8 'Ǹ', U+FFFD) -> 'é', en une table de traduction ;
+- espaces en bordure supprimés, espaces internes réduits à un seul ;
+- correspondance optionnelle (ex. harmonisation des statuts), sinon casse.
+
+Usage:
+    df['region'] = normalize_categorical(df['region'], case='title')
+    df['statut_demande'] = normalize_categorical(df['statut_demande'], mapping=status_mapping)
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Caractères mal encodés -> caractère attendu
+MANGLED_CHARS = str.maketrans({
+    chr(0x01F8): 'é',   # 'Ǹ' à la place de 'é'
+    '\ufffd': 'é',     # caractère de remplacement Unicode
+})
+
+# Valeur produite par astype(str) pour une valeur manquante
+NA_TEXT = 'nan'
+
+_WHITESPACE = re.compile(r'\s+')
+
+_CASES = {
+    None: lambda text: text,
+    'title': str.title,
+    'capitalize': str.capitalize,
+}
+
+def normalize_text(value, case=None, mapping=None):
+    """
+    Normalise une valeur : texte, encodage, espaces, puis correspondance ou casse.
+
+    case    : None, 'title' ou 'capitalize'
+    mapping : dict optionnel appliqué après nettoyage ; une valeur trouvée
+              dans mapping n'est pas remise en casse
+    """
+    text = _WHITESPACE.sub(' ', str(value).strip().translate(MANGLED_CHARS))
+    if mapping is not None and text in mapping:
+        return mapping[text]
+    return _CASES[case](text)
+
+def normalize_categorical(series, case=None, mapping=None):
+    """
+    Normalise une colonne au niveau de son dictionnaire de valeurs.
+
+    Retourne une Series 'category' (même index) dont les catégories sont les
+    valeurs normalisées distinctes ; deux variantes d'une même valeur
+    (ex. 'Lomé' et ' lomǸ ') partagent une seule catégorie.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    codes = np.asarray(codes, dtype=np.intp)
+
+    # Les manquants (code -1) deviennent une valeur unique de plus
+    values = list(uniques)
+    if (codes < 0).any():
+        values.append(NA_TEXT)
+    normalized = [normalize_text(v, case=case, mapping=mapping) for v in values]
+
+    # Dédoublonnage des catégories normalisées, puis remappage des codes
+    categories = list(dict.fromkeys(normalized))
+    position = {value: i for i, value in enumerate(categories)}
+    remap = np.array([position[value] for value in normalized], dtype=np.intp)
+    new_codes = remap[codes]  # le code -1 pointe sur la dernière entrée (NA_TEXT)
+
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=categories),
+                     index=series.index, name=series.name)
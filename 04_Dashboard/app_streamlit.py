@@ -11,10 +11,21 @@ Date: 2026-01-19
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import psycopg2
+import hmac
+import os
+import threading
 import warnings
 from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from db_pool import ConnectionPool, DB_CONFIG
+from kpi_queries import explain_kpi, fetch_kpis, normalize_params, run_kpi
+from query_monitor import DEFAULT_LOG_PATH, QueryMonitor, read_log, regressions, summarize
+from result_cache import ResultCache, fetch_load_version
+from spatial_index import DEFAULT_RADIUS_KM, SpatialIndex, accessibility_by_region
+from routing import ROAD_NETWORK_PATH, load_travel_times
 
 warnings.filterwarnings('ignore')
 
@@ -33,254 +44,166 @@ st.set_page_config(
 # CONNEXION À LA BASE DE DONNÉES
 # ============================================================================
 
+# Bornes du pool partagé par toutes les sessions Streamlit
+POOL_MIN_CONN = 4
+POOL_MAX_CONN = 10
+POOL_CHECKOUT_TIMEOUT = 10.0
+# Requêtes simultanées par page (laisse des connexions aux autres sessions)
+KPI_FETCH_WORKERS = 6
+# Budget mémoire du cache de résultats (toutes sessions confondues)
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Backend des requêtes KPI :
+#   postgres : datawarehouse PostgreSQL (Docker, port 5434), par défaut
+#   duckdb   : base DuckDB embarquée construite depuis data_cleaned/ (cf. duckdb_backend.py)
+DASHBOARD_BACKEND = os.environ.get('DASHBOARD_BACKEND', 'postgres').lower()
+DUCKDB_PATH = os.environ.get('DASHBOARD_DUCKDB_PATH')
+# Instrumentation des requêtes (cf. query_monitor.py) : journal JSON-lines,
+# part des exécutions suivies d'un EXPLAIN (ANALYZE, BUFFERS), et jeton
+# d'accès à la page Performance (page masquée si non défini)
+QUERY_LOG_PATH = os.environ.get('DASHBOARD_QUERY_LOG') or DEFAULT_LOG_PATH
+EXPLAIN_SAMPLE_RATE = float(os.environ.get('DASHBOARD_EXPLAIN_SAMPLE', '0.02'))
+ADMIN_TOKEN = os.environ.get('DASHBOARD_ADMIN_TOKEN')
+
 @st.cache_resource
-def get_db_connection():
-    """Établit une connexion PostgreSQL persistante"""
-    return psycopg2.connect(
-        host="localhost",
-        port=5434,
-        user="postgres",
-        password="postgres",
-        dbname="service_public_db"
+def get_db_pool():
+    """Pool de connexions PostgreSQL partagé (santé vérifiée, reconnexion automatique)"""
+    return ConnectionPool(
+        minconn=POOL_MIN_CONN,
+        maxconn=POOL_MAX_CONN,
+        checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+        **DB_CONFIG
     )
 
-@st.cache_data(ttl=3600)
-def execute_query(query):
-    """Exécute une requête SQL et retourne les résultats en DataFrame"""
+@st.cache_resource
+def get_duckdb_backend():
+    """Base DuckDB embarquée (reconstruite si un fichier nettoyé est plus récent)"""
+    from duckdb_backend import DEFAULT_DB_PATH, DuckDBBackend
+    return DuckDBBackend(DUCKDB_PATH or DEFAULT_DB_PATH)
+
+@st.cache_resource
+def get_result_cache():
+    """Cache LRU borné en octets, invalidé à chaque chargement ETL (dw.etl_load_version)"""
+    if DASHBOARD_BACKEND == 'duckdb':
+        version_fn = lambda: get_duckdb_backend().load_version()
+    else:
+        version_fn = lambda: get_db_pool().run(fetch_load_version)
+    return ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES, version_fn=version_fn)
+
+@st.cache_resource
+def get_query_monitor():
+    """Mesures des requêtes partagées par les sessions (temps, lignes, cache, EXPLAIN échantillonné)"""
+    return QueryMonitor(QUERY_LOG_PATH, explain_sample_rate=EXPLAIN_SAMPLE_RATE,
+                        source='app_streamlit', backend=DASHBOARD_BACKEND)
+
+def run_query(kpi_id, params=()):
+    """Exécute un KPI sur le backend configuré (DASHBOARD_BACKEND), sans cache"""
+    if DASHBOARD_BACKEND == 'duckdb':
+        return get_duckdb_backend().run(kpi_id, params)
+    # La connexion est empruntée au pool le temps de la requête seulement
+    return get_db_pool().run(run_kpi, kpi_id, params)
+
+def explain_query(kpi_id, params=()):
+    """Plan EXPLAIN (ANALYZE, BUFFERS) d'un KPI (PostgreSQL seulement)"""
+    return get_db_pool().run(explain_kpi, kpi_id, params)
+
+def execute_query(kpi_id, params=()):
+    """
+    Exécute un KPI (cf. kpi_queries.py) ; cache indexé par (version, kpi_id, params).
+
+    Chaque appel est mesuré par get_query_monitor (erreurs comprises).
+    """
+    explain = None if DASHBOARD_BACKEND == 'duckdb' else (lambda: explain_query(kpi_id, params))
     try:
-        conn = get_db_connection()
-        # On ne ferme pas la connexion ici car elle est gérée par @st.cache_resource
-        df = pd.read_sql(query, conn)
-        return df
+        return get_query_monitor().execute(kpi_id, params, lambda: run_query(kpi_id, params),
+                                           cache=get_result_cache(), explain=explain)
     except Exception as e:
         st.error(f"Erreur SQL: {str(e)}")
         return pd.DataFrame()
 
+def query_kpi(kpi_id, **filters):
+    """Normalise les filtres ("Toutes"/"Tous" -> None) puis exécute le KPI"""
+    return execute_query(kpi_id, normalize_params(kpi_id, **filters))
+
+def query_kpis(**jobs):
+    """
+    Exécute plusieurs KPI indépendants en parallèle (un thread et une connexion par KPI).
+
+    jobs : nom=(kpi_id, {filtres}) ; retourne {nom: DataFrame}.
+    Chaque appel passe par execute_query, donc par le cache de résultats.
+    """
+    ctx = get_script_run_ctx()
+
+    def execute(kpi_id, params):
+        # Rattache le thread à la session (st.error)
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return execute_query(kpi_id, params)
+
+    normalized = {
+        name: (kpi_id, normalize_params(kpi_id, **filters))
+        for name, (kpi_id, filters) in jobs.items()
+    }
+    return fetch_kpis(execute, normalized, max_workers=KPI_FETCH_WORKERS)
+
 # ============================================================================
 # REQUÊTES KPI (Alignées sur KPI_Definition.md)
 # ============================================================================
+# Le SQL des KPI est centralisé dans kpi_queries.py (requêtes préparées).
+# Les KPI sur les demandes lisent dw.mv_kpi_demandes_mensuel (agrégat par
+# région / préfecture / type de document / mois, cf. script_sql/09_kpi_aggregates.sql)
+# plutôt que dw.fact_demandes : le coût d'affichage ne dépend plus du volume de faits.
 
-def get_kpi_001_dmt_global(region=None, prefecture=None, type_doc=None):
+def get_kpi_001_dmt_global(region=None, prefecture=None, type_doc=None, annee=None):
     """KPI-001: Délai Moyen de Traitement (DMT)"""
-    where_clause = "WHERE f.delai_traitement_jours IS NOT NULL"
-    if region and region != "Toutes":
-        where_clause += f" AND t.region = '{region}'"
-    if prefecture and prefecture != "Toutes":
-        where_clause += f" AND t.prefecture = '{prefecture}'"
-    if type_doc and type_doc != "Tous":
-        where_clause += f" AND td.type_document = '{type_doc}'"
-    
-    query = f"""
-    SELECT 
-        ROUND(AVG(f.delai_traitement_jours)::NUMERIC, 2) as delai_moyen_jours,
-        COUNT(*) as nombre_demandes
-    FROM dw.fact_demandes f
-    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
-    JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
-    {where_clause};
-    """
-    return execute_query(query)
+    return query_kpi('kpi_001_dmt_global', region=region, prefecture=prefecture, type_document=type_doc, annee=annee)
 
 def get_kpi_001_dmt_par_region():
     """KPI-001: Délai par Région"""
-    query = """
-    SELECT t.region, ROUND(AVG(f.delai_traitement_jours)::NUMERIC, 2) as delai_moyen_jours,
-        COUNT(*) as nombre_demandes
-    FROM dw.fact_demandes f
-    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
-    WHERE f.delai_traitement_jours IS NOT NULL
-    GROUP BY t.region ORDER BY delai_moyen_jours DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_001_dmt_par_region')
 
-def get_kpi_002_absorption_global(region=None, prefecture=None):
+def get_kpi_002_absorption_global(region=None, prefecture=None, annee=None):
     """KPI-002: Taux d'Absorption (Spec: Validée, Rejetée / Total)"""
-    where_clause = "WHERE 1=1"
-    if region and region != "Toutes":
-        where_clause += f" AND t.region = '{region}'"
-    if prefecture and prefecture != "Toutes":
-        where_clause += f" AND t.prefecture = '{prefecture}'"
-
-    query = f"""
-    SELECT 
-        COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END)::INTEGER as demandes_traitees,
-        COUNT(*)::INTEGER as total_demandes,
-        ROUND((COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END)::NUMERIC / NULLIF(COUNT(*), 0)) * 100, 2) as taux_absorption_pct
-    FROM dw.fact_demandes f
-    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
-    {where_clause};
-    """
-    return execute_query(query)
+    return query_kpi('kpi_002_absorption_global', region=region, prefecture=prefecture, annee=annee)
 
 def get_kpi_002_absorption_par_region():
     """KPI-002: Absorption par Région"""
-    query = """
-    SELECT t.region,
-        COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END)::INTEGER as demandes_traitees,
-        COUNT(*)::INTEGER as total_demandes,
-        ROUND((COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END)::NUMERIC / NULLIF(COUNT(*), 0)) * 100, 2) as taux_absorption_pct
-    FROM dw.fact_demandes f
-    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
-    GROUP BY t.region ORDER BY taux_absorption_pct ASC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_002_absorption_par_region')
 
 def get_kpi_003_couverture():
     """KPI-003: Taux de Couverture Territoriale (Communes avec Centres / Communes Totales)"""
-    query = """
-    WITH communes_totales AS (
-        SELECT region, COUNT(DISTINCT commune) as total_communes
-        FROM dw.dim_territoire
-        GROUP BY region
-    ),
-    communes_avec_centre AS (
-        SELECT t.region, COUNT(DISTINCT t.commune) as communes_centres
-        FROM dw.dim_territoire t
-        JOIN dw.dim_centres_service cs ON t.id_territoire = cs.id_territoire
-        GROUP BY t.region
-    )
-    SELECT 
-        ct.region,
-        ct.total_communes as communes_totales,
-        COALESCE(cac.communes_centres, 0) as communes_actives,
-        ROUND((COALESCE(cac.communes_centres, 0)::NUMERIC / NULLIF(ct.total_communes, 0)) * 100, 2) as taux_couverture_pct
-    FROM communes_totales ct
-    LEFT JOIN communes_avec_centre cac ON ct.region = cac.region
-    ORDER BY taux_couverture_pct DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_003_couverture')
 
 def get_kpi_004_equite():
     """KPI-004: Ratio Équité d'Accès (Spec: Ratio Population/Centre)"""
-    query = """
-    WITH region_stats AS (
-        SELECT 
-            t.region,
-            COUNT(DISTINCT cs.id_centre)::INTEGER as nombre_centres,
-            SUM(DISTINCT COALESCE(s.population, 0))::BIGINT as population_totale
-        FROM dw.dim_territoire t
-        LEFT JOIN dw.dim_centres_service cs ON t.id_territoire = cs.id_territoire
-        LEFT JOIN dw.dim_socioeconomique s ON t.id_territoire = s.id_territoire
-        GROUP BY t.region
-    ),
-    ratios AS (
-        SELECT 
-            region, nombre_centres, population_totale,
-            CASE WHEN nombre_centres > 0 THEN population_totale::FLOAT / nombre_centres ELSE 0 END as pop_par_centre
-        FROM region_stats
-    )
-    SELECT 
-        region, nombre_centres, population_totale,
-        ROUND(pop_par_centre::NUMERIC, 0) as hab_par_centre,
-        ROUND((pop_par_centre / NULLIF(MIN(CASE WHEN pop_par_centre > 0 THEN pop_par_centre END) OVER (), 0))::NUMERIC, 2) as ratio_inegalite
-    FROM ratios
-    ORDER BY pop_par_centre DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_004_equite')
 
-def get_kpi_005_rejet_global(region=None, prefecture=None, type_doc=None):
+def get_kpi_005_rejet_global(region=None, prefecture=None, type_doc=None, annee=None):
     """KPI-005: Taux de Rejet (Spec: Rejetées / (Validées + Rejetées))"""
-    where_clause = "WHERE 1=1"
-    if region and region != "Toutes":
-        where_clause += f" AND t.region = '{region}'"
-    if prefecture and prefecture != "Toutes":
-        where_clause += f" AND t.prefecture = '{prefecture}'"
-    if type_doc and type_doc != "Tous":
-        where_clause += f" AND td.type_document = '{type_doc}'"
-
-    query = f"""
-    SELECT 
-        COUNT(CASE WHEN f.statut_demande = 'Rejetée' THEN 1 END)::INTEGER as demandes_rejetees,
-        COUNT(CASE WHEN f.statut_demande = 'Validée' THEN 1 END)::INTEGER as demandes_validees,
-        ROUND((COUNT(CASE WHEN f.statut_demande = 'Rejetée' THEN 1 END)::NUMERIC / 
-               NULLIF(COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END), 0)) * 100, 2) as taux_rejet_global_pct
-    FROM dw.fact_demandes f
-    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
-    JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
-    {where_clause};
-    """
-    return execute_query(query)
+    return query_kpi('kpi_005_rejet_global', region=region, prefecture=prefecture, type_document=type_doc, annee=annee)
 
 def get_kpi_005_rejet_par_type():
     """KPI-005: Taux de Rejet (Par Type de Document)"""
-    query = """
-    SELECT td.type_document,
-        COUNT(CASE WHEN f.statut_demande = 'Rejetée' THEN 1 END)::INTEGER as demandes_rejetees,
-        COUNT(CASE WHEN f.statut_demande = 'Validée' THEN 1 END)::INTEGER as demandes_validees,
-        ROUND((COUNT(CASE WHEN f.statut_demande = 'Rejetée' THEN 1 END)::NUMERIC / 
-               NULLIF(COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END), 0)) * 100, 2) as taux_rejet_pct
-    FROM dw.fact_demandes f
-    JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
-    GROUP BY td.type_document ORDER BY taux_rejet_pct DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_005_rejet_par_type')
 
 def get_kpi_006_charge_par_region():
     """KPI-006: Charge de Travail par Agent (Demandes Traitées / Agents)"""
-    query = """
-    SELECT t.region, 
-        COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END)::INTEGER as total_traite,
-        SUM(DISTINCT cs.personnel_capacite_jour)::INTEGER as total_agents,
-        ROUND(COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END)::NUMERIC / 
-              NULLIF(SUM(DISTINCT cs.personnel_capacite_jour), 0), 2) as charge_par_agent
-    FROM dw.dim_territoire t
-    JOIN dw.fact_demandes f ON t.id_territoire = f.id_territoire
-    JOIN dw.dim_centres_service cs ON t.id_territoire = cs.id_territoire
-    GROUP BY t.region ORDER BY charge_par_agent DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_006_charge_par_region')
 
 def get_kpi_007_perf_type_document():
     """KPI-007: Performance par Type de Document"""
-    query = """
-    SELECT td.type_document,
-        COUNT(f.id_fact)::INTEGER as nombre_demandes,
-        ROUND(AVG(f.delai_traitement_jours)::NUMERIC, 2) as delai_moyen_jours,
-        ROUND((COUNT(CASE WHEN f.statut_demande = 'Rejetée' THEN 1 END)::NUMERIC / 
-               NULLIF(COUNT(CASE WHEN f.statut_demande IN ('Validée', 'Rejetée') THEN 1 END), 0)) * 100, 2) as taux_rejet_pct
-    FROM dw.fact_demandes f
-    JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
-    GROUP BY td.type_document ORDER BY delai_moyen_jours DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_007_perf_type_document')
 
 def get_kpi_008_saturation_region():
     """KPI-008: Taux de Saturation (En Attente / Capacité Quotidienne)"""
-    query = """
-    SELECT t.region, 
-        COUNT(CASE WHEN f.statut_demande = 'En Attente' THEN 1 END)::INTEGER as en_attente,
-        SUM(DISTINCT cs.personnel_capacite_jour)::INTEGER as capacite_jour,
-        ROUND((COUNT(CASE WHEN f.statut_demande = 'En Attente' THEN 1 END)::NUMERIC / 
-              NULLIF(SUM(DISTINCT cs.personnel_capacite_jour), 0)) * 100, 2) as taux_saturation_pct
-    FROM dw.dim_territoire t
-    JOIN dw.fact_demandes f ON t.id_territoire = f.id_territoire
-    JOIN dw.dim_centres_service cs ON t.id_territoire = cs.id_territoire
-    GROUP BY t.region ORDER BY taux_saturation_pct DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_008_saturation_region')
 
 def get_document_types():
     """Récupère les types de documents"""
-    query = "SELECT DISTINCT type_document FROM dw.dim_type_document ORDER BY type_document;"
-    df = execute_query(query)
+    df = query_kpi('liste_types_document')
     return df['type_document'].tolist() if not df.empty else []
 
 def get_centres_carto():
     """Récupère les coordonnées des centres pour la carte"""
-    query = """
-    SELECT 
-        cs.nom_centre, 
-        cs.type_centre,
-        t.region,
-        t.prefecture,
-        t.commune,
-        t.latitude::FLOAT as lat, 
-        t.longitude::FLOAT as lon
-    FROM dw.dim_centres_service cs
-    JOIN dw.dim_territoire t ON cs.id_territoire = t.id_territoire
-    WHERE t.latitude IS NOT NULL AND t.longitude IS NOT NULL;
-    """
-    df = execute_query(query)
+    df = query_kpi('centres_carto')
     # Si pas de coordonnées dans la DB, on utilise un mapping par défaut pour la démo
     if df.empty or df['lat'].isnull().all():
         mapping_coords = {
@@ -290,108 +213,103 @@ def get_centres_carto():
             'Kara': (9.5, 1.2),
             'Savanes': (10.5, 0.5)
         }
-        query_centres = "SELECT cs.nom_centre, cs.type_centre, t.region, t.prefecture FROM dw.dim_centres_service cs JOIN dw.dim_territoire t ON cs.id_territoire = t.id_territoire"
-        df = execute_query(query_centres)
+        df = query_kpi('centres_sans_coordonnees')
         if not df.empty:
             df['lat'] = df['region'].map(lambda x: mapping_coords.get(x, (6.1, 1.1))[0])
             df['lon'] = df['region'].map(lambda x: mapping_coords.get(x, (6.1, 1.1))[1])
     return df
 
-def get_kpi_tendence_temporelle(region=None, type_doc=None):
+@st.cache_resource(max_entries=2)
+def _build_spatial_index(load_version):
+    """KD-tree des centres géolocalisés, construit une fois par version de chargement"""
+    df = query_kpi('centres_carto')
+    if df.empty:
+        return SpatialIndex([], [])
+    return SpatialIndex(df['lat'], df['lon'], ids=df['nom_centre'])
+
+def get_spatial_index():
+    """Index spatial des centres pour la version courante du DW"""
+    return _build_spatial_index(get_result_cache().load_version())
+
+def get_accessibilite(radius_km=DEFAULT_RADIUS_KM):
+    """Accessibilité par région : distance commune -> centre le plus proche (KD-tree)"""
+    communes = query_kpi('communes_coordonnees')
+    if communes.empty:
+        return pd.DataFrame()
+    return accessibility_by_region(get_spatial_index(), communes, radius_km)
+
+def show_accessibilite(key):
+    """Bloc 'Accessibilité géographique' (complément de KPI-003 / KPI-004)"""
+    st.markdown("### Accessibilité géographique (distance au centre le plus proche)")
+    radius = st.slider("Rayon d'accessibilité (km)", 2, 50, int(DEFAULT_RADIUS_KM), key=key)
+    df = get_accessibilite(float(radius))
+    if not df.empty:
+        fig = px.bar(df, x='region', y='distance_moyenne_km', color='pct_communes_dans_rayon',
+                     labels={'distance_moyenne_km': 'Distance moyenne (km)',
+                             'pct_communes_dans_rayon': f'% communes à moins de {radius} km'})
+        st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(df)
+
+@st.cache_resource(max_entries=2)
+def _load_road_network(road_mtime):
+    """Réseau routier + matrice des temps (cache disque recalculé si le fichier change)"""
+    return load_travel_times(ROAD_NETWORK_PATH)
+
+def get_road_network():
+    """Réseau routier des préfectures, None si le fichier nettoyé est absent"""
+    if not ROAD_NETWORK_PATH.exists():
+        return None
+    return _load_road_network(ROAD_NETWORK_PATH.stat().st_mtime)
+
+def get_temps_acces_centres():
+    """Temps de parcours (h) de chaque préfecture vers la préfecture dotée d'un centre la plus proche"""
+    network = get_road_network()
+    centres = query_kpi('centres_sans_coordonnees')
+    if network is None or centres.empty:
+        return pd.DataFrame()
+    return network.nearest_centre_times(centres['prefecture'].dropna().unique())
+
+def get_kpi_tendence_temporelle(region=None, type_doc=None, annee=None):
     """Tendance mensuelle des demandes"""
-    where_clause = "WHERE 1=1"
-    if region and region != "Toutes":
-        where_clause += f" AND t.region = '{region}'"
-    if type_doc and type_doc != "Tous":
-        where_clause += f" AND td.type_document = '{type_doc}'"
-        
-    query = f"""
-    SELECT 
-        f.annee_demande,
-        f.mois_demande,
-        TO_CHAR(MIN(f.date_demande), 'Month') as mois_nom,
-        COUNT(*) as nb_demandes,
-        ROUND(AVG(f.delai_traitement_jours)::NUMERIC, 2) as delai_moyen
-    FROM dw.fact_demandes f
-    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
-    JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
-    {where_clause}
-    GROUP BY f.annee_demande, f.mois_demande
-    ORDER BY f.annee_demande, f.mois_demande;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_tendance_temporelle', region=region, type_document=type_doc, annee=annee)
 
 def get_kpi_centres_capacite_demande():
     """Capacité vs Demande par Centre (KPI-008 extended)"""
-    query = """
-    WITH demande_par_centre AS (
-        SELECT 
-            cs.nom_centre,
-            COUNT(f.id_fact)::NUMERIC / NULLIF(COUNT(DISTINCT f.date_demande), 0) as demande_quotidienne_moyenne
-        FROM dw.fact_demandes f
-        JOIN dw.dim_centres_service cs ON f.id_territoire = cs.id_territoire
-        GROUP BY cs.nom_centre
-    )
-    SELECT 
-        cs.nom_centre,
-        cs.personnel_capacite_jour as capacite_quotidienne,
-        ROUND(COALESCE(d.demande_quotidienne_moyenne, 0), 2) as demande_quotidienne_estimee
-    FROM dw.dim_centres_service cs
-    LEFT JOIN demande_par_centre d ON cs.nom_centre = d.nom_centre
-    ORDER BY demande_quotidienne_estimee DESC;
-    """
-    return execute_query(query)
+    return query_kpi('kpi_centres_capacite_demande')
 
 def get_zones_prioritaires():
     """Identifie les zones sous-desservies (Forte population, faible couverture)"""
-    query = """
-    WITH stats_territoire AS (
-        SELECT 
-            t.region, t.prefecture,
-            SUM(s.population) as population_totale,
-            COUNT(DISTINCT cs.id_centre) as nb_centres
-        FROM dw.dim_territoire t
-        JOIN dw.dim_socioeconomique s ON t.id_territoire = s.id_territoire
-        LEFT JOIN dw.dim_centres_service cs ON t.id_territoire = cs.id_territoire
-        GROUP BY t.region, t.prefecture
-    )
-    SELECT 
-        region, prefecture, population_totale, nb_centres,
-        ROUND(population_totale::NUMERIC / NULLIF(nb_centres, 0), 0) as hab_par_centre
-    FROM stats_territoire
-    ORDER BY hab_par_centre DESC NULLS FIRST
-    LIMIT 10;
-    """
-    return execute_query(query)
+    return query_kpi('zones_prioritaires')
 
 def get_centres_list():
     """Liste de tous les centres"""
-    query = "SELECT DISTINCT nom_centre FROM dw.dim_centres_service WHERE nom_centre IS NOT NULL ORDER BY nom_centre;"
-    df = execute_query(query)
+    df = query_kpi('liste_centres')
     return df['nom_centre'].tolist() if not df.empty else []
 
 def get_centre_details(nom_centre):
     """Fiche détaillée d'un centre"""
-    query = f"""
-    SELECT cs.*, t.region, t.prefecture, t.commune
-    FROM dw.dim_centres_service cs
-    JOIN dw.dim_territoire t ON cs.id_territoire = t.id_territoire
-    WHERE cs.nom_centre = '{nom_centre}';
-    """
-    return execute_query(query)
+    return query_kpi('centre_details', nom_centre=nom_centre)
+
+def get_annees():
+    """Récupère les années disponibles (plus récente en premier)"""
+    df = query_kpi('liste_annees')
+    return [int(a) for a in df['annee']] if not df.empty else []
 
 def get_regions():
     """Récupère la liste des régions"""
-    query = "SELECT DISTINCT region FROM dw.dim_territoire WHERE region IS NOT NULL ORDER BY region;"
-    df = execute_query(query)
+    df = query_kpi('liste_regions')
     return df['region'].tolist() if not df.empty else []
 
 def get_prefectures_by_region(region):
     """Récupère les préfectures d'une région"""
-    query = f"SELECT DISTINCT prefecture FROM dw.dim_territoire WHERE region = '{region}' AND prefecture IS NOT NULL ORDER BY prefecture;"
-    df = execute_query(query)
+    df = query_kpi('liste_prefectures', region=region)
     return df['prefecture'].tolist() if not df.empty else []
 
+def get_snapshot_accueil():
+    """Indicateurs de la page d'accueil (un enregistrement unique, dict vide si erreur)"""
+    df = query_kpi('snapshot_accueil')
+    return df.iloc[0].to_dict() if not df.empty else {}
+
 def get_status_badge(value, metric_type):
     """Retourne le badge de statut"""
     if metric_type == "DMT":
@@ -423,28 +341,27 @@ def page_accueil():
     
     col1, col2, col3, col4 = st.columns(4)
     
-    kpi_001 = get_kpi_001_dmt_global()
-    kpi_002 = get_kpi_002_absorption_global()
-    kpi_005 = get_kpi_005_rejet_global()
+    # Un seul aller-retour pour toute la page (cf. snapshot_accueil)
+    snapshot = get_snapshot_accueil()
     
     with col1:
-        if not kpi_001.empty:
-            dmt = kpi_001['delai_moyen_jours'].values[0]
+        dmt = snapshot.get('delai_moyen_jours')
+        if dmt is not None:
             st.metric("DMT (jours)", f"{dmt:.1f}", delta=get_status_badge(dmt, "DMT"))
     
     with col2:
-        if not kpi_002.empty:
-            absorption = kpi_002['taux_absorption_pct'].values[0]
+        absorption = snapshot.get('taux_absorption_pct')
+        if absorption is not None:
             st.metric("Absorption (%)", f"{absorption:.1f}%", delta=get_status_badge(absorption, "Absorption"))
     
     with col3:
-        if not kpi_005.empty:
-            rejet = kpi_005['taux_rejet_global_pct'].values[0]
+        rejet = snapshot.get('taux_rejet_global_pct')
+        if rejet is not None:
             st.metric("Rejet (%)", f"{rejet:.1f}%", delta=get_status_badge(rejet, "Rejet"))
     
     with col4:
-        if not kpi_002.empty:
-            total = kpi_002['total_demandes'].values[0]
+        total = snapshot.get('total_demandes')
+        if total is not None:
             st.metric("Total Demandes", f"{total:,}")
     
     st.markdown("---")
@@ -453,7 +370,7 @@ def page_accueil():
     
     with col1:
         st.subheader(" Délai Moyen par Région")
-        df = get_kpi_001_dmt_par_region()
+        df = pd.DataFrame(snapshot.get('dmt_par_region') or [])
         if not df.empty:
             fig = px.bar(df, x='region', y='delai_moyen_jours', color='delai_moyen_jours',
                         color_continuous_scale="RdYlGn_r", title="DMT par Région")
@@ -461,7 +378,7 @@ def page_accueil():
     
     with col2:
         st.subheader("Taux de Rejet par Type")
-        df = get_kpi_005_rejet_par_type()
+        df = pd.DataFrame(snapshot.get('rejet_par_type') or [])
         if not df.empty:
             fig = px.bar(df.head(10), x='type_document', y='taux_rejet_pct',
                         color='taux_rejet_pct', color_continuous_scale="Reds")
@@ -480,26 +397,36 @@ def page_executive():
         with col2:
             type_doc = st.selectbox("Type de Document", ["Tous"] + get_document_types())
         with col3:
-            st.selectbox("Année", ["2023"])
+            annee = st.selectbox("Année", ["Toutes"] + get_annees())
 
     st.markdown("---")
     
+    # Toutes les requêtes de la page partent en parallèle
+    data = query_kpis(
+        dmt=('kpi_001_dmt_global', {'region': region, 'type_document': type_doc, 'annee': annee}),
+        absorption=('kpi_002_absorption_global', {'region': region, 'annee': annee}),
+        rejet=('kpi_005_rejet_global', {'region': region, 'type_document': type_doc, 'annee': annee}),
+        tendance=('kpi_tendance_temporelle', {'region': region, 'type_document': type_doc, 'annee': annee}),
+        par_region=('kpi_002_absorption_par_region', {}),
+        par_type=('kpi_007_perf_type_document', {}),
+    )
+    
     # KPI Cards
     col1, col2, col3, col4 = st.columns(4)
     
-    kpi_dmt = get_kpi_001_dmt_global(region, type_doc=type_doc)
+    kpi_dmt = data['dmt']
     with col1:
         if not kpi_dmt.empty and kpi_dmt['delai_moyen_jours'].values[0] is not None:
             val = kpi_dmt['delai_moyen_jours'].values[0]
             st.metric("DMT Moyen", f"{val:.1f} j", delta=get_status_badge(val, "DMT"))
             
-    kpi_abs = get_kpi_002_absorption_global(region)
+    kpi_abs = data['absorption']
     with col2:
         if not kpi_abs.empty:
             val = kpi_abs['taux_absorption_pct'].values[0]
             st.metric("Absorption", f"{val:.1f}%", delta=get_status_badge(val, "Absorption"))
             
-    kpi_rej = get_kpi_005_rejet_global(region, type_doc=type_doc)
+    kpi_rej = data['rejet']
     with col3:
         if not kpi_rej.empty:
             val = kpi_rej['taux_rejet_global_pct'].values[0]
@@ -513,7 +440,7 @@ def page_executive():
     
     # Analyse Temporelle
     st.subheader(" Tendance Temporelle (Volume & Performance)")
-    df_trend = get_kpi_tendence_temporelle(region, type_doc)
+    df_trend = data['tendance']
     if not df_trend.empty:
         fig_trend = px.line(df_trend, x='mois_nom', y='nb_demandes', 
                            title="Evolution du nombre de demandes par mois",
@@ -524,14 +451,14 @@ def page_executive():
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Performance par Région")
-        df_reg = get_kpi_002_absorption_par_region()
+        df_reg = data['par_region']
         fig_reg = px.bar(df_reg, x='region', y='taux_absorption_pct', color='taux_absorption_pct',
                         color_continuous_scale="RdYlGn")
         st.plotly_chart(fig_reg, use_container_width=True)
     
     with col2:
         st.subheader("Performance par Type de Document")
-        df_type = get_kpi_007_perf_type_document()
+        df_type = data['par_type']
         fig_type = px.bar(df_type, x='type_document', y='delai_moyen_jours', color='taux_rejet_pct',
                          color_continuous_scale="YlOrRd")
         st.plotly_chart(fig_type, use_container_width=True)
@@ -541,6 +468,15 @@ def page_operationnelle():
     st.title("Vue Opérationnelle")
     st.markdown("---")
     
+    # Les indicateurs des deux onglets sont chargés en parallèle : changer
+    # d'indicateur ne déclenche plus de requête
+    data = query_kpis(
+        saturation=('kpi_008_saturation_region', {}),
+        charge=('kpi_006_charge_par_region', {}),
+        capacite=('kpi_centres_capacite_demande', {}),
+        centres=('liste_centres', {}),
+    )
+    
     # Système d'onglets pour une meilleure organisation
     tab_perf, tab_centre = st.tabs([" Performance Globale", " Zoom par Centre"])
     
@@ -550,7 +486,7 @@ def page_operationnelle():
         
         if metric == "Saturation":
             st.subheader("Saturation par Région (Demandes en Attente / Capacité)")
-            df = get_kpi_008_saturation_region()
+            df = data['saturation']
             if not df.empty:
                 fig = px.bar(df, x='region', y='taux_saturation_pct',
                             color='taux_saturation_pct', color_continuous_scale="Reds")
@@ -559,7 +495,7 @@ def page_operationnelle():
     
         elif metric == "Charge":
             st.subheader("Charge de Travail par Région (Demandes Traitées / Agent)")
-            df = get_kpi_006_charge_par_region()
+            df = data['charge']
             if not df.empty:
                 fig = px.bar(df, x='region', y='charge_par_agent',
                             color='charge_par_agent', color_continuous_scale="Oranges")
@@ -569,7 +505,7 @@ def page_operationnelle():
         elif metric == "Capacité des Centres":
             st.subheader("Analyse Capacité vs Demande Quotidienne")
             st.info("Comparaison entre la capacité théorique (agents) et la demande moyenne réelle observée par jour.")
-            df = get_kpi_centres_capacite_demande()
+            df = data['capacite']
             if not df.empty:
                 # Création d'un graphique comparatif
                 fig = px.bar(df.head(20), x='nom_centre', y=['capacite_quotidienne', 'demande_quotidienne_estimee'],
@@ -579,7 +515,9 @@ def page_operationnelle():
 
     with tab_centre:
         st.subheader("🔎 Fiche d'Identité du Centre")
-        centre_sel = st.selectbox("Sélectionnez un centre :", get_centres_list())
+        centres = data['centres']
+        centre_sel = st.selectbox("Sélectionnez un centre :",
+                                  centres['nom_centre'].tolist() if not centres.empty else [])
         if centre_sel:
             det = get_centre_details(centre_sel)
             if not det.empty:
@@ -602,7 +540,7 @@ def page_territoriale():
     st.title("Vue Territoriale")
     st.markdown("---")
     
-    metric = st.selectbox("Analyse", ["Couverture", "Équité", "Zones Sous-desservies", "Performance Document", "Rejet"])
+    metric = st.selectbox("Analyse", ["Couverture", "Équité", "Temps de Parcours", "Zones Sous-desservies", "Performance Document", "Rejet"])
     
     st.markdown("---")
     
@@ -628,6 +566,8 @@ def page_territoriale():
             fig = px.bar(df, x='region', y='taux_couverture_pct', color='taux_couverture_pct')
             st.plotly_chart(fig, use_container_width=True)
 
+        show_accessibilite('rayon_couverture')
+
     elif metric == "Zones Sous-desservies":
         st.subheader("🚀 Top 10 des Zones Prioritaires")
         df_prior = get_zones_prioritaires()
@@ -645,7 +585,31 @@ def page_territoriale():
                         labels={'hab_par_centre': 'Habitants pour 1 centre', 'ratio_inegalite': 'Ratio Inégalité'})
             st.plotly_chart(fig, use_container_width=True)
             st.dataframe(df)
+
+        show_accessibilite('rayon_equite')
             
+    elif metric == "Temps de Parcours":
+        st.subheader("Accessibilité par la Route (temps vers le centre le plus proche)")
+        df = get_temps_acces_centres()
+        if not df.empty:
+            reachable = df[np.isfinite(df['temps_heures'])].sort_values('temps_heures', ascending=False)
+            fig = px.bar(reachable, x='prefecture', y='temps_heures', color='prefecture_centre',
+                        labels={'temps_heures': 'Temps de parcours (h)', 'prefecture_centre': 'Préfecture du centre'})
+            st.plotly_chart(fig, use_container_width=True)
+            isolated = df.loc[np.isinf(df['temps_heures']), 'prefecture'].tolist()
+            if isolated:
+                st.warning(f"Préfectures sans accès routier à un centre: {', '.join(isolated)}")
+            absent = df.loc[df['temps_heures'].isna(), 'prefecture'].tolist()
+            if absent:
+                st.warning(f"Préfectures à centre absentes du réseau routier (temps inconnu): "
+                           f"{', '.join(absent)}")
+
+            network = get_road_network()
+            st.markdown("### Matrice des temps de parcours entre préfectures (h)")
+            matrix = network.time_matrix().replace(np.inf, np.nan).round(1)
+            st.plotly_chart(px.imshow(matrix, aspect='auto', color_continuous_scale='RdYlGn_r'),
+                            use_container_width=True)
+
     elif metric == "Performance Document":
         st.subheader("Performance par Type de Document")
         df = get_kpi_007_perf_type_document()
@@ -660,6 +624,64 @@ def page_territoriale():
             fig = px.bar(df.head(15), x='type_document', y='taux_rejet_pct', color='taux_rejet_pct')
             st.plotly_chart(fig, use_container_width=True)
 
+def is_admin():
+    """Vrai si la session a saisi le jeton DASHBOARD_ADMIN_TOKEN (page Performance)"""
+    if not ADMIN_TOKEN:
+        return False
+    with st.sidebar.expander("Administration"):
+        token = st.text_input("Jeton administrateur", type="password", key="admin_token")
+    return hmac.compare_digest(token or '', ADMIN_TOKEN)
+
+def page_performance():
+    """Performance des requêtes (administrateurs) : mesures, régressions, plans échantillonnés"""
+    st.title("Performance des Requêtes")
+    st.markdown("---")
+
+    monitor = get_query_monitor()
+    cache = get_result_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Version de chargement", cache['version'])
+    col2.metric("Cache (hits / misses)", f"{cache['hits']} / {cache['misses']}")
+    col3.metric("Cache (Mo)", f"{cache['bytes'] / 1024 / 1024:.1f} / {cache['max_bytes'] / 1024 / 1024:.0f}")
+    col4.metric("EXPLAIN échantillonnés", f"{monitor.explain_sample_rate:.0%}")
+
+    st.subheader("Requêtes depuis le démarrage du serveur")
+    records = monitor.records()
+    st.dataframe(summarize(records), use_container_width=True)
+
+    st.subheader(f"Journal ({QUERY_LOG_PATH})")
+    log = read_log(QUERY_LOG_PATH)
+    if log.empty:
+        st.info("Journal vide.")
+    else:
+        threshold = st.slider("Seuil de régression (ratio p50)", 1.05, 3.0, 1.25, 0.05)
+        slower = regressions(log, threshold)
+        if slower.empty:
+            st.success("Aucune régression entre les deux dernières versions de chargement.")
+        else:
+            st.warning(f"{len(slower)} requête(s) ralentie(s) depuis le dernier chargement")
+            st.dataframe(slower, use_container_width=True)
+        st.dataframe(summarize(log, by=('query_id', 'load_version')), use_container_width=True)
+        errors = log[log['error'].notna()]
+        if not errors.empty:
+            st.markdown("### Dernières erreurs")
+            st.dataframe(errors[['ts', 'source', 'query_id', 'params', 'error']].tail(50), use_container_width=True)
+
+    st.subheader("Plans EXPLAIN (ANALYZE, BUFFERS) échantillonnés")
+    plans = monitor.latest_plans()
+    if not plans:
+        st.info("Aucun plan capturé (DASHBOARD_EXPLAIN_SAMPLE, backend PostgreSQL seulement).")
+    else:
+        query_id = st.selectbox("Requête", sorted(plans))
+        event = plans[query_id]
+        if event['error']:
+            st.error(event['error'])
+        else:
+            st.caption(f"{event['ts']} - paramètres {event['params']}")
+            st.json(event['summary'])
+            with st.expander("Plan complet"):
+                st.json(event['plan'])
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -667,8 +689,10 @@ def page_territoriale():
 def main():
     """Fonction principale"""
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Sélectionnez une vue:",
-        ["Accueil", "Executive", "Opérationnelle", "Territoriale"])
+    pages = ["Accueil", "Executive", "Opérationnelle", "Territoriale"]
+    if is_admin():
+        pages.append("Performance")
+    page = st.sidebar.radio("Sélectionnez une vue:", pages)
     
     st.sidebar.markdown("---")
     st.sidebar.caption(f"Actualisation: {datetime.now().strftime('%H:%M:%S')}")
@@ -681,6 +705,8 @@ def main():
         page_operationnelle()
     elif page == "Territoriale":
         page_territoriale()
+    elif page == "Performance":
+        page_performance()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,192 @@
+"""
+Pool de Connexions PostgreSQL
+=============================
+
+Fournisseur de connexions partagé par les deux dashboards (04_Dashboard/app_streamlit.py
+et app.py). Remplace la connexion unique mise en cache par @st.cache_resource :
+
+- taille min / max configurable (sessions Streamlit concurrentes en parallèle),
+- délai maximal d'attente d'une connexion libre (PoolTimeout),
+- sonde de vivacité (SELECT 1) sur les connexions restées inactives,
+- reconnexion automatique : une connexion morte est jetée et remplacée.
+
+Usage:
+    pool = ConnectionPool(**DB_CONFIG)
+    with pool.connection() as conn:
+        ...
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool as pg_pool
+
+# Configuration par défaut (PostgreSQL Docker)
+DB_CONFIG = {
+    'host': 'localhost',
+    'port': 5434,
+    'user': 'postgres',
+    'password': 'postgres',
+    'dbname': 'service_public_db'
+}
+
+# Keepalives TCP : détecte plus vite les connexions coupées côté serveur
+KEEPALIVE_OPTIONS = {
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    'keepalives_interval': 10,
+    'keepalives_count': 3,
+}
+
+class PoolTimeout(Exception):
+    """Aucune connexion libre n'a pu être obtenue dans le délai imparti"""
+
+def is_connection_error(exc, conn=None):
+    """
+    Vrai si l'erreur signale une connexion perdue (à jeter, appel à rejouer).
+
+    OperationalError couvre aussi des erreurs survenues sur une connexion
+    saine (QueryCanceled / statement_timeout, LockNotAvailable, DiskFull,
+    TooManyConnections...) : seules comptent une connexion fermée, une
+    InterfaceError, ou une erreur sans SQLSTATE (coupure côté client) ou de
+    classe 08 (connection exception).
+    """
+    if conn is not None and conn.closed:
+        return True
+    if isinstance(exc, psycopg2.InterfaceError):
+        return True
+    if isinstance(exc, psycopg2.OperationalError):
+        return exc.pgcode is None or exc.pgcode.startswith('08')
+    return False
+
+class ConnectionPool:
+    """Pool thread-safe de connexions psycopg2 avec contrôles de santé"""
+
+    def __init__(self, minconn=1, maxconn=8, checkout_timeout=10.0,
+                 health_check_after=30.0, autocommit=True, **conn_kwargs):
+        """
+        minconn / maxconn   : bornes du pool
+        checkout_timeout    : attente maximale (s) d'une connexion libre
+        health_check_after  : au-delà de cette inactivité (s), SELECT 1 avant remise
+        autocommit          : lectures seules, pas de transaction laissée ouverte
+        conn_kwargs         : paramètres psycopg2.connect (cf. DB_CONFIG)
+        """
+        params = {**KEEPALIVE_OPTIONS, **conn_kwargs}
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **params)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.autocommit = autocommit
+        self.reconnects = 0
+
+    # ------------------------------------------------------------------
+    # Contrôles de santé
+    # ------------------------------------------------------------------
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn), 0.0)
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    # ------------------------------------------------------------------
+    # Emprunt / restitution
+    # ------------------------------------------------------------------
+
+    def getconn(self, timeout=None):
+        """Emprunte une connexion vivante (bloque au plus `timeout` secondes)"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"Aucune connexion libre après {timeout:.1f}s (max={self.maxconn})")
+        try:
+            # Une connexion morte est jetée puis remplacée par une neuve
+            for _ in range(self.maxconn + 1):
+                conn = self._pool.getconn()
+                if self._is_alive(conn):
+                    if conn.autocommit != self.autocommit:
+                        conn.autocommit = self.autocommit
+                    return conn
+                self._discard(conn)
+                self.reconnects += 1
+            raise psycopg2.OperationalError("Impossible d'obtenir une connexion PostgreSQL vivante")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, discard=False):
+        """Restitue une connexion ; discard=True la ferme (elle sera recréée)"""
+        try:
+            if not discard and not conn.closed and not conn.autocommit:
+                status = conn.info.transaction_status
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            if discard or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        except psycopg2.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Contexte d'emprunt : la connexion est restituée, ou jetée si elle est
+        perdue (cf. is_connection_error) ; après une erreur SQL ordinaire elle
+        retourne au pool avec ses requêtes préparées.
+        """
+        conn = self.getconn(timeout)
+        broken = False
+        try:
+            yield conn
+        except psycopg2.Error as e:
+            broken = is_connection_error(e, conn)
+            raise
+        finally:
+            self.putconn(conn, discard=broken or conn.closed)
+
+    def run(self, fn, *args, retries=1, timeout=None, **kwargs):
+        """
+        Exécute fn(conn, *args, **kwargs) sur une connexion du pool.
+
+        En cas de coupure réseau / serveur redémarré, la connexion est jetée
+        et l'appel est rejoué (au plus `retries` fois) sur une connexion neuve.
+        Les autres erreurs (délai dépassé, verrou, disque plein...) sont
+        propagées sans rejouer la requête.
+        """
+        for attempt in range(retries + 1):
+            conn = None
+            try:
+                with self.connection(timeout) as conn:
+                    return fn(conn, *args, **kwargs)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if attempt == retries or not is_connection_error(e, conn):
+                    raise
+                self.reconnects += 1
+
+    def closeall(self):
+        self._pool.closeall()
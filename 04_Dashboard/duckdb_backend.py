@@ -0,0 +1,466 @@
+"""
+Backend DuckDB Embarqué
+=======================
+
+Alternative sans infrastructure au PostgreSQL Docker pour le tableau de bord :
+le schéma en étoile (dim_territoire, dim_type_document, dim_centres_service,
+dim_communes, dim_socioeconomique, fact_demandes, fact_activite_centre) et les
+agrégats mv_kpi_demandes_mensuel / mv_territoire_capacite sont matérialisés en tables colonnaires dans un
+fichier DuckDB construit directement depuis data_cleaned/.
+
+Les KPI du registre (kpi_queries.py) sont exécutés tels quels ($1, $2, ...
+sont aussi la syntaxe des paramètres DuckDB) ; une entrée peut fournir une
+variante 'duckdb_sql' lorsque le SQL PostgreSQL n'est pas portable
+(TO_CHAR, json_agg...).
+
+La base est reconstruite automatiquement dès qu'un fichier nettoyé est plus
+récent qu'elle. Sélection dans le dashboard : DASHBOARD_BACKEND=duckdb.
+
+Usage:
+    python duckdb_backend.py --build          # (re)construit la base
+    python duckdb_backend.py --check          # exécute tous les KPI (CI)
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from kpi_queries import KPI_QUERIES
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+DATA_CLEANED_DIR = PROJECT_DIR / "02_Nettoyage_et_Preparation_des_Donnees" / "data_cleaned"
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "dashboard.duckdb"
+
+# Cache Parquet des jeux nettoyés (préféré au CSV lorsqu'il est à jour)
+sys.path.insert(0, str(DATA_CLEANED_DIR.parent))
+from columnar_cache import has_fresh_parquet, parquet_path  # noqa: E402
+
+# Fichiers nettoyés -> tables RAW (mêmes noms que load_clean_data_full.RAW_MAPPING)
+RAW_MAPPING = {
+    'details_communes_cleaned.csv': 'communes',
+    'centres_service_cleaned.csv': 'centres_service',
+    'demande_services_public_cleaned.csv': 'demandes_services_public',
+    'donnees_socioeconomiques_cleaned.csv': 'donnees_socioeconomiques',
+    'logs_activite_cleaned.csv': 'logs_activite'
+}
+
+# ============================================================================
+# CONSTRUCTION DU SCHÉMA EN ÉTOILE
+# ============================================================================
+# Transposition de 04_transform_to_dw.sql et 09_kpi_aggregates.sql : les clés
+# de substitution (SERIAL) sont attribuées par ROW_NUMBER(), les vues
+# matérialisées deviennent des tables.
+
+DW_BUILD_SQL = [
+    "CREATE SCHEMA IF NOT EXISTS dw",
+
+    # Territoires : comme la contrainte uq_territoire côté PostgreSQL, un
+    # quartier non nul n'apparaît qu'une fois (de préférence avec coordonnées)
+    """
+    CREATE OR REPLACE TABLE dw.dim_territoire AS
+    WITH sources AS (
+        SELECT DISTINCT region, prefecture, commune, quartier,
+            latitude::DECIMAL(10, 4) AS latitude, longitude::DECIMAL(10, 4) AS longitude,
+            NULL::VARCHAR AS code_postal, 1 AS source
+        FROM raw.centres_service
+        WHERE region IS NOT NULL AND prefecture IS NOT NULL AND commune IS NOT NULL
+        UNION
+        SELECT DISTINCT region, prefecture, commune, quartier, NULL, NULL, NULL, 2
+        FROM raw.demandes_services_public
+        WHERE region IS NOT NULL AND prefecture IS NOT NULL AND commune IS NOT NULL
+        UNION
+        SELECT DISTINCT region, prefecture, commune, NULL, latitude, longitude, code_postal::VARCHAR, 3
+        FROM raw.communes
+        WHERE region IS NOT NULL AND prefecture IS NOT NULL AND commune IS NOT NULL
+        UNION
+        SELECT DISTINCT region, prefecture, commune, NULL, NULL, NULL, NULL, 4
+        FROM raw.donnees_socioeconomiques
+        WHERE region IS NOT NULL AND prefecture IS NOT NULL AND commune IS NOT NULL
+    ),
+    dedup AS (
+        SELECT * EXCLUDE (source, rang) FROM (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY region, prefecture, commune, quartier ORDER BY source) AS rang
+            FROM sources
+        )
+        WHERE quartier IS NULL OR rang = 1
+    )
+    SELECT ROW_NUMBER() OVER (ORDER BY region, prefecture, commune, quartier NULLS FIRST,
+                                       latitude, longitude)::INTEGER AS id_territoire, *
+    FROM dedup
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.dim_type_document AS
+    SELECT ROW_NUMBER() OVER (ORDER BY type_document, categorie_document)::INTEGER AS id_type_document, *
+    FROM (
+        SELECT DISTINCT type_document, categorie_document
+        FROM raw.demandes_services_public
+        WHERE type_document IS NOT NULL
+    )
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.dim_communes AS
+    SELECT ROW_NUMBER() OVER (ORDER BY id_territoire, commune_code)::INTEGER AS id_commune, *
+    FROM (
+        SELECT DISTINCT
+            t.id_territoire,
+            c.commune_id AS commune_code,
+            c.type_commune,
+            c.altitude_m::INTEGER AS altitude_m,
+            c.superficie_km2::DECIMAL(10, 2) AS superficie_km2,
+            c.population_densite::INTEGER AS population_densite,
+            c.distance_capitale_km::INTEGER AS distance_capitale_km,
+            c.zone_climatique
+        FROM raw.communes c
+        JOIN dw.dim_territoire t ON c.region = t.region
+                                 AND c.prefecture = t.prefecture
+                                 AND c.commune = t.commune
+        WHERE c.commune IS NOT NULL
+    )
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.dim_centres_service AS
+    SELECT ROW_NUMBER() OVER (ORDER BY centre_code, id_territoire)::INTEGER AS id_centre, *
+    FROM (
+        SELECT DISTINCT
+            c.centre_id AS centre_code,
+            t.id_territoire,
+            c.nom_centre,
+            c.type_centre,
+            c.personnel_capacite_jour::INTEGER AS personnel_capacite_jour,
+            c.nombre_guichets::INTEGER AS nombre_guichets,
+            c.heures_ouverture,
+            c.horaire_nuit,
+            c.equipement_numerique,
+            c.date_ouverture::DATE AS date_ouverture,
+            c.statut_centre
+        FROM raw.centres_service c
+        JOIN dw.dim_territoire t ON c.region = t.region
+                                 AND c.prefecture = t.prefecture
+                                 AND c.commune = t.commune
+                                 AND COALESCE(c.quartier, '') = COALESCE(t.quartier, '')
+        WHERE c.centre_id IS NOT NULL
+    )
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.dim_socioeconomique AS
+    SELECT ROW_NUMBER() OVER (ORDER BY id_territoire)::INTEGER AS id_socio, *
+    FROM (
+        SELECT DISTINCT
+            t.id_territoire,
+            s.population::INTEGER AS population,
+            s.densite::INTEGER AS densite,
+            s.taux_urbanisation::DECIMAL(5, 3) AS taux_urbanisation,
+            s.taux_alphabetisation::DECIMAL(5, 3) AS taux_alphabetisation,
+            s.age_median::INTEGER AS age_median,
+            s.nombre_menages::INTEGER AS nombre_menages,
+            s.revenu_moyen_fcfa::DECIMAL(12, 2) AS revenu_moyen_fcfa
+        FROM raw.donnees_socioeconomiques s
+        JOIN dw.dim_territoire t ON s.region = t.region
+                                 AND s.prefecture = t.prefecture
+                                 AND s.commune = t.commune
+        WHERE s.commune IS NOT NULL
+    )
+    """,
+
+    # Faits triés par date : les zone maps DuckDB élaguent les filtres de période
+    """
+    CREATE OR REPLACE TABLE dw.fact_demandes AS
+    SELECT ROW_NUMBER() OVER (ORDER BY d.date_demande, d.demande_id)::INTEGER AS id_fact,
+        t.id_territoire,
+        td.id_type_document,
+        d.demande_id AS demande_code,
+        d.nombre_demandes::INTEGER AS nombre_demandes,
+        d.delai_traitement_jours::INTEGER AS delai_traitement_jours,
+        d.taux_rejet::DECIMAL(5, 2) AS taux_rejet,
+        d.date_demande::DATE AS date_demande,
+        d.motif_demande,
+        d.statut_demande,
+        d.canal_demande,
+        d.age_demandeur::INTEGER AS age_demandeur,
+        d.sexe_demandeur,
+        d.annee_demande::INTEGER AS annee_demande,
+        d.mois_demande::INTEGER AS mois_demande,
+        d.jour_semaine_demande
+    FROM raw.demandes_services_public d
+    JOIN dw.dim_territoire t ON d.region = t.region
+                             AND d.prefecture = t.prefecture
+                             AND d.commune = t.commune
+                             AND COALESCE(d.quartier, '') = COALESCE(t.quartier, '')
+    JOIN dw.dim_type_document td ON d.type_document = td.type_document
+                                 AND COALESCE(d.categorie_document, '') = COALESCE(td.categorie_document, '')
+    WHERE d.demande_id IS NOT NULL
+    ORDER BY d.date_demande, d.demande_id
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.fact_activite_centre AS
+    SELECT ROW_NUMBER() OVER (ORDER BY date_operation, log_code)::INTEGER AS id_activite, *
+    FROM (
+        SELECT DISTINCT ON (l.log_id)
+            cs.id_centre,
+            l.log_id AS log_code,
+            l.date_operation::DATE AS date_operation,
+            l.type_operation,
+            NULLIF(l.type_document, 'Non_Renseigné') AS type_document,
+            COALESCE(l.nombre_traite, 0)::INTEGER AS nombre_traite,
+            l.delai_effectif::INTEGER AS delai_effectif,
+            COALESCE(l.nombre_rejete, 0)::INTEGER AS nombre_rejete,
+            NULLIF(l.raison_rejet, 'nan') AS raison_rejet,
+            l.personnel_present::INTEGER AS personnel_present,
+            l.temps_attente_moyen_minutes::INTEGER AS temps_attente_moyen_minutes,
+            l.incident_technique = 'Oui' AS incident_technique
+        FROM raw.logs_activite l
+        JOIN dw.dim_centres_service cs ON cs.centre_code = l.centre_id
+        WHERE l.log_id IS NOT NULL AND l.date_operation IS NOT NULL
+        ORDER BY l.log_id, cs.id_centre
+    )
+    ORDER BY date_operation, log_code
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.mv_kpi_demandes_mensuel AS
+    SELECT
+        t.region,
+        t.prefecture,
+        td.type_document,
+        COALESCE(f.annee_demande, 0) AS annee,
+        COALESCE(f.mois_demande, 0) AS mois,
+        COUNT(*)::BIGINT AS nb_demandes,
+        COUNT(*) FILTER (WHERE f.statut_demande IN ('Validée', 'Rejetée'))::BIGINT AS nb_traitees,
+        COUNT(*) FILTER (WHERE f.statut_demande = 'Validée')::BIGINT AS nb_validees,
+        COUNT(*) FILTER (WHERE f.statut_demande = 'Rejetée')::BIGINT AS nb_rejetees,
+        COUNT(*) FILTER (WHERE f.statut_demande = 'En Attente')::BIGINT AS nb_en_attente,
+        COUNT(f.delai_traitement_jours)::BIGINT AS nb_avec_delai,
+        COALESCE(SUM(f.delai_traitement_jours), 0)::BIGINT AS somme_delai,
+        MIN(f.date_demande) AS premiere_date
+    FROM dw.fact_demandes f
+    JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
+    JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
+    GROUP BY t.region, t.prefecture, td.type_document, COALESCE(f.annee_demande, 0), COALESCE(f.mois_demande, 0)
+    ORDER BY annee, mois
+    """,
+
+    """
+    CREATE OR REPLACE TABLE dw.mv_territoire_capacite AS
+    WITH communes AS (
+        SELECT DISTINCT region, prefecture, commune
+        FROM dw.dim_territoire
+    ),
+    centres AS (
+        SELECT t.region, t.prefecture, t.commune,
+            COUNT(cs.id_centre) AS nb_centres,
+            COALESCE(SUM(cs.personnel_capacite_jour), 0) AS capacite_jour,
+            COALESCE(SUM(cs.nombre_guichets), 0) AS nb_guichets
+        FROM dw.dim_centres_service cs
+        JOIN dw.dim_territoire t ON t.id_territoire = cs.id_territoire
+        GROUP BY t.region, t.prefecture, t.commune
+    ),
+    population AS (
+        SELECT region, prefecture, commune, SUM(population) AS population
+        FROM (
+            SELECT DISTINCT t.region, t.prefecture, t.commune, s.population, s.densite,
+                s.taux_urbanisation, s.taux_alphabetisation, s.age_median, s.nombre_menages, s.revenu_moyen_fcfa
+            FROM dw.dim_socioeconomique s
+            JOIN dw.dim_territoire t ON t.id_territoire = s.id_territoire
+        )
+        GROUP BY region, prefecture, commune
+    )
+    SELECT
+        c.region,
+        c.prefecture,
+        c.commune,
+        COALESCE(ce.nb_centres, 0)::INTEGER AS nb_centres,
+        COALESCE(ce.capacite_jour, 0)::BIGINT AS capacite_jour,
+        COALESCE(ce.nb_guichets, 0)::BIGINT AS nb_guichets,
+        p.population::BIGINT AS population
+    FROM communes c
+    LEFT JOIN centres ce ON ce.region = c.region AND ce.prefecture = c.prefecture AND ce.commune = c.commune
+    LEFT JOIN population p ON p.region = c.region AND p.prefecture = c.prefecture AND p.commune = c.commune
+    """,
+]
+
+
+def _normalize_column_name(name):
+    """Même normalisation que le chargement PostgreSQL (é -> e, espaces -> _)"""
+    return name.replace('é', 'e').replace(' ', '_').lower()
+
+
+def _source_relation(csv_path):
+    """Expression DuckDB de lecture d'un jeu nettoyé (Parquet à jour, sinon CSV)"""
+    if has_fresh_parquet(csv_path):
+        return f"read_parquet('{parquet_path(csv_path).as_posix()}')"
+    return f"read_csv_auto('{Path(csv_path).as_posix()}', header=true)"
+
+
+def source_files(cleaned_dir=DATA_CLEANED_DIR):
+    """Fichiers nettoyés dont dépend la base (CSV et Parquet associés existants)"""
+    files = []
+    for csv_name in RAW_MAPPING:
+        csv_path = Path(cleaned_dir) / csv_name
+        files += [p for p in (csv_path, parquet_path(csv_path)) if p.exists()]
+    return files
+
+
+def is_stale(db_path=DEFAULT_DB_PATH, cleaned_dir=DATA_CLEANED_DIR):
+    """Vrai si la base n'existe pas ou si un fichier nettoyé est plus récent"""
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return True
+    built_at = db_path.stat().st_mtime
+    return any(p.stat().st_mtime > built_at for p in source_files(cleaned_dir))
+
+
+def build_warehouse(db_path=DEFAULT_DB_PATH, cleaned_dir=DATA_CLEANED_DIR):
+    """
+    Construit le fichier DuckDB (zone raw + schéma en étoile + agrégat mensuel).
+
+    La base est écrite dans un fichier temporaire puis renommée : un dashboard
+    déjà ouvert sur l'ancienne version n'est jamais exposé à une base partielle.
+    Retourne {table: nombre de lignes}.
+    """
+    db_path = Path(db_path)
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    con = duckdb.connect(str(tmp_path))
+    try:
+        con.execute("CREATE SCHEMA IF NOT EXISTS raw")
+        for csv_name, table in RAW_MAPPING.items():
+            csv_path = Path(cleaned_dir) / csv_name
+            relation = _source_relation(csv_path)
+            columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()]
+            select = ', '.join(f'"{c}" AS {_normalize_column_name(c)}' for c in columns)
+            con.execute(f"CREATE TABLE raw.{table} AS SELECT {select} FROM {relation}")
+        for statement in DW_BUILD_SQL:
+            con.execute(statement)
+        counts = {
+            table: con.execute(f"SELECT COUNT(*) FROM dw.{table}").fetchone()[0]
+            for table in ('dim_territoire', 'dim_type_document', 'dim_communes', 'dim_centres_service',
+                          'dim_socioeconomique', 'fact_demandes', 'fact_activite_centre',
+                          'mv_kpi_demandes_mensuel', 'mv_territoire_capacite')
+        }
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+    os.replace(tmp_path, db_path)
+    return counts
+
+
+# ============================================================================
+# EXÉCUTION DES KPI
+# ============================================================================
+
+def kpi_sql(kpi_id):
+    """SQL DuckDB d'un KPI : variante 'duckdb_sql' si présente, sinon SQL commun"""
+    spec = KPI_QUERIES[kpi_id]
+    return spec.get('duckdb_sql', spec['sql']).strip().rstrip(';')
+
+
+class DuckDBBackend:
+    """
+    Exécute les KPI du registre sur la base DuckDB (lecture seule).
+
+    Une connexion racine est ouverte par base ; chaque requête utilise son
+    propre curseur (connexion dupliquée), ce qui rend run() utilisable depuis
+    les threads de fetch_kpis.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, cleaned_dir=DATA_CLEANED_DIR, auto_build=True):
+        self.db_path = Path(db_path)
+        self.cleaned_dir = Path(cleaned_dir)
+        self.auto_build = auto_build
+        self._con = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """Connexion courante ; reconstruit et rouvre la base si les sources ont changé"""
+        with self._lock:
+            if self.auto_build and is_stale(self.db_path, self.cleaned_dir):
+                if self._con is not None:
+                    self._con.close()
+                    self._con = None
+                build_warehouse(self.db_path, self.cleaned_dir)
+            if self._con is None:
+                self._con = duckdb.connect(str(self.db_path), read_only=True)
+                self._version = int(self.db_path.stat().st_mtime * 1000)
+            return self._con
+
+    def load_version(self):
+        """Version de chargement (date de construction de la base, en ms)"""
+        self._connection()
+        return self._version
+
+    def run(self, kpi_id, params=()):
+        """Exécute un KPI et retourne un DataFrame (colonnes JSON décodées)"""
+        cursor = self._connection().cursor()
+        try:
+            cursor.execute(kpi_sql(kpi_id), list(params))
+            columns = [d[0] for d in cursor.description]
+            json_columns = [d[0] for d in cursor.description if str(d[1]) == 'JSON']
+            df = pd.DataFrame(cursor.fetchall(), columns=columns)
+        finally:
+            cursor.close()
+        # Même forme que psycopg2, qui décode json/jsonb en objets Python
+        for col in json_columns:
+            df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+        return df
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+
+def check_kpi(backend, kpi_id):
+    """Exécute un KPI sans filtre ; retourne (lignes, durée en ms)"""
+    params = tuple(None for _ in KPI_QUERIES[kpi_id]['params'])
+    start = time.perf_counter()
+    df = backend.run(kpi_id, params)
+    return len(df), (time.perf_counter() - start) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Base DuckDB embarquée du tableau de bord")
+    parser.add_argument('--db', default=str(DEFAULT_DB_PATH), help="Fichier DuckDB")
+    parser.add_argument('--cleaned-dir', default=str(DATA_CLEANED_DIR), help="Répertoire data_cleaned")
+    parser.add_argument('--build', action='store_true', help="Reconstruire la base")
+    parser.add_argument('--check', action='store_true', help="Exécuter tous les KPI")
+    args = parser.parse_args(argv)
+
+    if args.build or is_stale(args.db, args.cleaned_dir):
+        start = time.perf_counter()
+        counts = build_warehouse(args.db, args.cleaned_dir)
+        for table, rows in counts.items():
+            print(f" dw.{table:30} {rows:>10,} lignes")
+        print(f"Base construite en {time.perf_counter() - start:.2f}s: {args.db}")
+
+    if args.check:
+        backend = DuckDBBackend(args.db, args.cleaned_dir, auto_build=False)
+        failures = 0
+        for kpi_id in KPI_QUERIES:
+            try:
+                rows, ms = check_kpi(backend, kpi_id)
+                print(f" OK   {kpi_id:35} {rows:>6} lignes {ms:8.1f} ms")
+            except duckdb.Error as e:
+                failures += 1
+                print(f" FAIL {kpi_id:35} {e}")
+        backend.close()
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,604 @@
+"""
+Couche de Requêtes KPI Paramétrées
+==================================
+
+Registre unique des requêtes du tableau de bord. Chaque KPI est une requête
+à paramètres positionnels ($1, $2, ...) préparée côté serveur (PREPARE) une
+seule fois par connexion, puis exécutée avec EXECUTE : le texte SQL ne varie
+plus avec les filtres, PostgreSQL réutilise le plan et le cache Streamlit est
+indexé par (kpi_id, paramètres).
+
+Un filtre à None (ou "Toutes" / "Tous") désactive le critère correspondant.
+"""
+
+import json
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+
+# Valeurs des listes déroulantes signifiant "pas de filtre"
+ALL_VALUES = {None, '', 'Toutes', 'Tous'}
+
+# ============================================================================
+# REGISTRE DES KPI
+# ============================================================================
+# params : liste ordonnée de (nom, type PostgreSQL) -> $1, $2, ...
+# duckdb_sql : variante optionnelle pour le backend DuckDB (cf. duckdb_backend.py)
+
+KPI_QUERIES = {
+    'kpi_001_dmt_global': {
+        'description': "KPI-001: Délai Moyen de Traitement (DMT)",
+        'params': [('region', 'text'), ('prefecture', 'text'), ('type_document', 'text'), ('annee', 'int')],
+        'sql': """
+            SELECT
+                ROUND(SUM(m.somme_delai)::NUMERIC / NULLIF(SUM(m.nb_avec_delai), 0), 2) as delai_moyen_jours,
+                COALESCE(SUM(m.nb_avec_delai), 0)::BIGINT as nombre_demandes
+            FROM dw.mv_kpi_demandes_mensuel m
+            WHERE ($1 IS NULL OR m.region = $1)
+              AND ($2 IS NULL OR m.prefecture = $2)
+              AND ($3 IS NULL OR m.type_document = $3)
+              AND ($4 IS NULL OR m.annee = $4)
+        """,
+    },
+    'kpi_001_dmt_par_region': {
+        'description': "KPI-001: Délai par Région",
+        'params': [],
+        'sql': """
+            SELECT m.region, ROUND(SUM(m.somme_delai)::NUMERIC / NULLIF(SUM(m.nb_avec_delai), 0), 2) as delai_moyen_jours,
+                SUM(m.nb_avec_delai)::BIGINT as nombre_demandes
+            FROM dw.mv_kpi_demandes_mensuel m
+            GROUP BY m.region
+            HAVING SUM(m.nb_avec_delai) > 0
+            ORDER BY delai_moyen_jours DESC
+        """,
+    },
+    'kpi_002_absorption_global': {
+        'description': "KPI-002: Taux d'Absorption (Spec: Validée, Rejetée / Total)",
+        'params': [('region', 'text'), ('prefecture', 'text'), ('annee', 'int')],
+        'sql': """
+            SELECT
+                COALESCE(SUM(m.nb_traitees), 0)::INTEGER as demandes_traitees,
+                COALESCE(SUM(m.nb_demandes), 0)::INTEGER as total_demandes,
+                ROUND((SUM(m.nb_traitees)::NUMERIC / NULLIF(SUM(m.nb_demandes), 0)) * 100, 2) as taux_absorption_pct
+            FROM dw.mv_kpi_demandes_mensuel m
+            WHERE ($1 IS NULL OR m.region = $1)
+              AND ($2 IS NULL OR m.prefecture = $2)
+              AND ($3 IS NULL OR m.annee = $3)
+        """,
+    },
+    'kpi_002_absorption_par_region': {
+        'description': "KPI-002: Absorption par Région",
+        'params': [],
+        'sql': """
+            SELECT m.region,
+                SUM(m.nb_traitees)::INTEGER as demandes_traitees,
+                SUM(m.nb_demandes)::INTEGER as total_demandes,
+                ROUND((SUM(m.nb_traitees)::NUMERIC / NULLIF(SUM(m.nb_demandes), 0)) * 100, 2) as taux_absorption_pct
+            FROM dw.mv_kpi_demandes_mensuel m
+            GROUP BY m.region ORDER BY taux_absorption_pct ASC
+        """,
+    },
+    'kpi_003_couverture': {
+        'description': "KPI-003: Taux de Couverture Territoriale (Communes avec Centres / Communes Totales)",
+        'params': [],
+        # Pont territorial : une ligne par commune (cf. 09_kpi_aggregates.sql)
+        'sql': """
+            SELECT
+                b.region,
+                COUNT(*) as communes_totales,
+                COUNT(*) FILTER (WHERE b.nb_centres > 0) as communes_actives,
+                ROUND((COUNT(*) FILTER (WHERE b.nb_centres > 0)::NUMERIC / NULLIF(COUNT(*), 0)) * 100, 2) as taux_couverture_pct
+            FROM dw.mv_territoire_capacite b
+            GROUP BY b.region
+            ORDER BY taux_couverture_pct DESC
+        """,
+    },
+    'kpi_004_equite': {
+        'description': "KPI-004: Ratio Équité d'Accès (Spec: Ratio Population/Centre)",
+        'params': [],
+        'sql': """
+            WITH region_stats AS (
+                SELECT
+                    b.region,
+                    SUM(b.nb_centres)::INTEGER as nombre_centres,
+                    COALESCE(SUM(b.population), 0)::BIGINT as population_totale
+                FROM dw.mv_territoire_capacite b
+                GROUP BY b.region
+            ),
+            ratios AS (
+                SELECT
+                    region, nombre_centres, population_totale,
+                    CASE WHEN nombre_centres > 0 THEN population_totale::FLOAT / nombre_centres ELSE 0 END as pop_par_centre
+                FROM region_stats
+            )
+            SELECT
+                region, nombre_centres, population_totale,
+                ROUND(pop_par_centre::NUMERIC, 0) as hab_par_centre,
+                ROUND((pop_par_centre / NULLIF(MIN(CASE WHEN pop_par_centre > 0 THEN pop_par_centre END) OVER (), 0))::NUMERIC, 2) as ratio_inegalite
+            FROM ratios
+            ORDER BY pop_par_centre DESC
+        """,
+    },
+    'kpi_005_rejet_global': {
+        'description': "KPI-005: Taux de Rejet (Spec: Rejetées / (Validées + Rejetées))",
+        'params': [('region', 'text'), ('prefecture', 'text'), ('type_document', 'text'), ('annee', 'int')],
+        'sql': """
+            SELECT
+                COALESCE(SUM(m.nb_rejetees), 0)::INTEGER as demandes_rejetees,
+                COALESCE(SUM(m.nb_validees), 0)::INTEGER as demandes_validees,
+                ROUND((SUM(m.nb_rejetees)::NUMERIC / NULLIF(SUM(m.nb_validees + m.nb_rejetees), 0)) * 100, 2) as taux_rejet_global_pct
+            FROM dw.mv_kpi_demandes_mensuel m
+            WHERE ($1 IS NULL OR m.region = $1)
+              AND ($2 IS NULL OR m.prefecture = $2)
+              AND ($3 IS NULL OR m.type_document = $3)
+              AND ($4 IS NULL OR m.annee = $4)
+        """,
+    },
+    'kpi_005_rejet_par_type': {
+        'description': "KPI-005: Taux de Rejet (Par Type de Document)",
+        'params': [],
+        'sql': """
+            SELECT m.type_document,
+                SUM(m.nb_rejetees)::INTEGER as demandes_rejetees,
+                SUM(m.nb_validees)::INTEGER as demandes_validees,
+                ROUND((SUM(m.nb_rejetees)::NUMERIC / NULLIF(SUM(m.nb_validees + m.nb_rejetees), 0)) * 100, 2) as taux_rejet_pct
+            FROM dw.mv_kpi_demandes_mensuel m
+            GROUP BY m.type_document ORDER BY taux_rejet_pct DESC
+        """,
+    },
+    'kpi_006_charge_par_region': {
+        'description': "KPI-006: Charge de Travail par Agent (Demandes Traitées / Agents)",
+        'params': [],
+        # Grain centre x jour (dw.fact_activite_centre) : volumes traités et
+        # agents réellement présents, sans jointure faits x centres du territoire.
+        # total_agents = agents-jours présents sur les journées de traitement.
+        'sql': """
+            SELECT t.region,
+                SUM(a.nombre_traite)::INTEGER as total_traite,
+                SUM(a.personnel_present)::INTEGER as total_agents,
+                ROUND(SUM(a.nombre_traite)::NUMERIC / NULLIF(SUM(a.personnel_present), 0), 2) as charge_par_agent
+            FROM dw.fact_activite_centre a
+            JOIN dw.dim_centres_service cs ON cs.id_centre = a.id_centre
+            JOIN dw.dim_territoire t ON t.id_territoire = cs.id_territoire
+            WHERE a.type_operation = 'Traitement'
+            GROUP BY t.region
+            ORDER BY charge_par_agent DESC
+        """,
+    },
+    'kpi_007_perf_type_document': {
+        'description': "KPI-007: Performance par Type de Document",
+        'params': [],
+        'sql': """
+            SELECT m.type_document,
+                SUM(m.nb_demandes)::INTEGER as nombre_demandes,
+                ROUND(SUM(m.somme_delai)::NUMERIC / NULLIF(SUM(m.nb_avec_delai), 0), 2) as delai_moyen_jours,
+                ROUND((SUM(m.nb_rejetees)::NUMERIC / NULLIF(SUM(m.nb_validees + m.nb_rejetees), 0)) * 100, 2) as taux_rejet_pct
+            FROM dw.mv_kpi_demandes_mensuel m
+            GROUP BY m.type_document ORDER BY delai_moyen_jours DESC
+        """,
+    },
+    'kpi_008_saturation_region': {
+        'description': "KPI-008: Taux de Saturation (En Attente / Capacité Quotidienne)",
+        'params': [],
+        'sql': """
+            WITH attente AS (
+                SELECT region, SUM(nb_en_attente) as en_attente
+                FROM dw.mv_kpi_demandes_mensuel
+                GROUP BY region
+            ),
+            capacite AS (
+                SELECT region, SUM(capacite_jour) as capacite_jour
+                FROM dw.mv_territoire_capacite
+                GROUP BY region
+            )
+            SELECT a.region,
+                a.en_attente::INTEGER as en_attente,
+                c.capacite_jour::INTEGER as capacite_jour,
+                ROUND((a.en_attente::NUMERIC / NULLIF(c.capacite_jour, 0)) * 100, 2) as taux_saturation_pct
+            FROM attente a
+            JOIN capacite c ON c.region = a.region
+            ORDER BY taux_saturation_pct DESC
+        """,
+    },
+    'kpi_tendance_temporelle': {
+        'description': "Tendance mensuelle des demandes",
+        'params': [('region', 'text'), ('type_document', 'text'), ('annee', 'int')],
+        'sql': """
+            SELECT
+                m.annee as annee_demande,
+                m.mois as mois_demande,
+                TO_CHAR(MIN(m.premiere_date), 'Month') as mois_nom,
+                SUM(m.nb_demandes)::BIGINT as nb_demandes,
+                ROUND(SUM(m.somme_delai)::NUMERIC / NULLIF(SUM(m.nb_avec_delai), 0), 2) as delai_moyen
+            FROM dw.mv_kpi_demandes_mensuel m
+            WHERE m.annee > 0
+              AND ($1 IS NULL OR m.region = $1)
+              AND ($2 IS NULL OR m.type_document = $2)
+              AND ($3 IS NULL OR m.annee = $3)
+            GROUP BY m.annee, m.mois
+            ORDER BY m.annee, m.mois
+        """,
+        # DuckDB : pas de TO_CHAR ('Month' = nom anglais complété à 9 caractères)
+        'duckdb_sql': """
+            SELECT
+                m.annee as annee_demande,
+                m.mois as mois_demande,
+                RPAD(STRFTIME(MIN(m.premiere_date), '%B'), 9, ' ') as mois_nom,
+                SUM(m.nb_demandes)::BIGINT as nb_demandes,
+                ROUND(SUM(m.somme_delai)::NUMERIC / NULLIF(SUM(m.nb_avec_delai), 0), 2) as delai_moyen
+            FROM dw.mv_kpi_demandes_mensuel m
+            WHERE m.annee > 0
+              AND ($1 IS NULL OR m.region = $1)
+              AND ($2 IS NULL OR m.type_document = $2)
+              AND ($3 IS NULL OR m.annee = $3)
+            GROUP BY m.annee, m.mois
+            ORDER BY m.annee, m.mois
+        """,
+    },
+    'snapshot_accueil': {
+        'description': "Instantané de la page d'accueil (indicateurs clés en un aller-retour)",
+        'params': [],
+        # Un seul parcours de l'agrégat mensuel (GROUPING SETS global / région / type)
+        # + comptages des dimensions ; une ligne unique, détails en JSON.
+        'sql': """
+            WITH agg AS (
+                SELECT
+                    GROUPING(region) as g_region,
+                    GROUPING(type_document) as g_type,
+                    region,
+                    type_document,
+                    SUM(nb_demandes) as nb_demandes,
+                    SUM(nb_traitees) as nb_traitees,
+                    SUM(nb_validees) as nb_validees,
+                    SUM(nb_rejetees) as nb_rejetees,
+                    SUM(nb_avec_delai) as nb_avec_delai,
+                    SUM(somme_delai) as somme_delai
+                FROM dw.mv_kpi_demandes_mensuel
+                GROUP BY GROUPING SETS ((), (region), (type_document))
+            )
+            SELECT
+                ROUND(g.somme_delai::NUMERIC / NULLIF(g.nb_avec_delai, 0), 2) as delai_moyen_jours,
+                ROUND((g.nb_traitees::NUMERIC / NULLIF(g.nb_demandes, 0)) * 100, 2) as taux_absorption_pct,
+                ROUND((g.nb_rejetees::NUMERIC / NULLIF(g.nb_validees + g.nb_rejetees, 0)) * 100, 2) as taux_rejet_global_pct,
+                COALESCE(g.nb_demandes, 0)::BIGINT as total_demandes,
+                COALESCE(g.nb_traitees, 0)::BIGINT as demandes_traitees,
+                (SELECT COUNT(*) FROM dw.dim_centres_service)::INTEGER as nb_centres,
+                (SELECT COUNT(*) FROM dw.dim_communes)::INTEGER as nb_communes,
+                (SELECT COUNT(DISTINCT region) FROM dw.dim_territoire)::INTEGER as nb_regions,
+                (SELECT COUNT(*) FROM dw.dim_type_document)::INTEGER as nb_types_document,
+                (SELECT json_agg(json_build_object(
+                            'region', a.region,
+                            'delai_moyen_jours', ROUND(a.somme_delai::NUMERIC / a.nb_avec_delai, 2))
+                        ORDER BY a.somme_delai::NUMERIC / a.nb_avec_delai DESC)
+                 FROM agg a
+                 WHERE a.g_region = 0 AND a.g_type = 1 AND a.nb_avec_delai > 0) as dmt_par_region,
+                (SELECT json_agg(json_build_object(
+                            'type_document', a.type_document,
+                            'taux_rejet_pct', ROUND((a.nb_rejetees::NUMERIC / NULLIF(a.nb_validees + a.nb_rejetees, 0)) * 100, 2))
+                        ORDER BY (a.nb_rejetees::NUMERIC / NULLIF(a.nb_validees + a.nb_rejetees, 0)) DESC NULLS LAST)
+                 FROM agg a
+                 WHERE a.g_type = 0 AND a.g_region = 1) as rejet_par_type
+            FROM agg g
+            WHERE g.g_region = 1 AND g.g_type = 1
+        """,
+        # DuckDB : to_json(list(json_object(...))) au lieu de json_agg(json_build_object(...))
+        'duckdb_sql': """
+            WITH agg AS (
+                SELECT
+                    GROUPING(region) as g_region,
+                    GROUPING(type_document) as g_type,
+                    region,
+                    type_document,
+                    SUM(nb_demandes) as nb_demandes,
+                    SUM(nb_traitees) as nb_traitees,
+                    SUM(nb_validees) as nb_validees,
+                    SUM(nb_rejetees) as nb_rejetees,
+                    SUM(nb_avec_delai) as nb_avec_delai,
+                    SUM(somme_delai) as somme_delai
+                FROM dw.mv_kpi_demandes_mensuel
+                GROUP BY GROUPING SETS ((), (region), (type_document))
+            )
+            SELECT
+                ROUND(g.somme_delai::NUMERIC / NULLIF(g.nb_avec_delai, 0), 2) as delai_moyen_jours,
+                ROUND((g.nb_traitees::NUMERIC / NULLIF(g.nb_demandes, 0)) * 100, 2) as taux_absorption_pct,
+                ROUND((g.nb_rejetees::NUMERIC / NULLIF(g.nb_validees + g.nb_rejetees, 0)) * 100, 2) as taux_rejet_global_pct,
+                COALESCE(g.nb_demandes, 0)::BIGINT as total_demandes,
+                COALESCE(g.nb_traitees, 0)::BIGINT as demandes_traitees,
+                (SELECT COUNT(*) FROM dw.dim_centres_service)::INTEGER as nb_centres,
+                (SELECT COUNT(*) FROM dw.dim_communes)::INTEGER as nb_communes,
+                (SELECT COUNT(DISTINCT region) FROM dw.dim_territoire)::INTEGER as nb_regions,
+                (SELECT COUNT(*) FROM dw.dim_type_document)::INTEGER as nb_types_document,
+                (SELECT to_json(list(json_object(
+                            'region', a.region,
+                            'delai_moyen_jours', ROUND(a.somme_delai::NUMERIC / a.nb_avec_delai, 2))
+                        ORDER BY a.somme_delai::NUMERIC / a.nb_avec_delai DESC))
+                 FROM agg a
+                 WHERE a.g_region = 0 AND a.g_type = 1 AND a.nb_avec_delai > 0) as dmt_par_region,
+                (SELECT to_json(list(json_object(
+                            'type_document', a.type_document,
+                            'taux_rejet_pct', ROUND((a.nb_rejetees::NUMERIC / NULLIF(a.nb_validees + a.nb_rejetees, 0)) * 100, 2))
+                        ORDER BY (a.nb_rejetees::NUMERIC / NULLIF(a.nb_validees + a.nb_rejetees, 0)) DESC NULLS LAST))
+                 FROM agg a
+                 WHERE a.g_type = 0 AND a.g_region = 1) as rejet_par_type
+            FROM agg g
+            WHERE g.g_region = 1 AND g.g_type = 1
+        """,
+    },
+    'kpi_centres_capacite_demande': {
+        'description': "Capacité vs Demande par Centre (KPI-008 extended)",
+        'params': [],
+        # Volume réellement traité par centre et par jour d'activité
+        # (dw.fact_activite_centre, index (id_centre, date_operation)).
+        'sql': """
+            WITH activite_par_centre AS (
+                SELECT
+                    a.id_centre,
+                    SUM(a.nombre_traite)::NUMERIC / NULLIF(COUNT(DISTINCT a.date_operation), 0) as demande_quotidienne_moyenne
+                FROM dw.fact_activite_centre a
+                WHERE a.type_operation = 'Traitement'
+                GROUP BY a.id_centre
+            )
+            SELECT
+                cs.nom_centre,
+                cs.personnel_capacite_jour as capacite_quotidienne,
+                ROUND(COALESCE(a.demande_quotidienne_moyenne, 0), 2) as demande_quotidienne_estimee
+            FROM dw.dim_centres_service cs
+            LEFT JOIN activite_par_centre a ON a.id_centre = cs.id_centre
+            ORDER BY demande_quotidienne_estimee DESC
+        """,
+    },
+    'zones_prioritaires': {
+        'description': "Zones sous-desservies (Forte population, faible couverture)",
+        'params': [],
+        'sql': """
+            WITH stats_territoire AS (
+                SELECT
+                    b.region, b.prefecture,
+                    SUM(b.population) as population_totale,
+                    SUM(b.nb_centres) as nb_centres
+                FROM dw.mv_territoire_capacite b
+                WHERE b.population IS NOT NULL
+                GROUP BY b.region, b.prefecture
+            )
+            SELECT
+                region, prefecture, population_totale, nb_centres,
+                ROUND(population_totale::NUMERIC / NULLIF(nb_centres, 0), 0) as hab_par_centre
+            FROM stats_territoire
+            ORDER BY hab_par_centre DESC NULLS FIRST
+            LIMIT 10
+        """,
+    },
+    'centres_carto': {
+        'description': "Coordonnées des centres pour la carte",
+        'params': [],
+        'sql': """
+            SELECT
+                cs.nom_centre,
+                cs.type_centre,
+                t.region,
+                t.prefecture,
+                t.commune,
+                t.latitude::FLOAT as lat,
+                t.longitude::FLOAT as lon
+            FROM dw.dim_centres_service cs
+            JOIN dw.dim_territoire t ON cs.id_territoire = t.id_territoire
+            WHERE t.latitude IS NOT NULL AND t.longitude IS NOT NULL
+        """,
+    },
+    'communes_coordonnees': {
+        'description': "Coordonnées des communes (index spatial / accessibilité)",
+        'params': [],
+        # dim_communes est aussi reliée aux territoires de niveau quartier (ceux
+        # des centres, à 0 km d'un centre) : seuls les points de niveau commune
+        # (quartier NULL) sont gardés, un seul par commune.
+        # Même SQL pour PostgreSQL et DuckDB (pas de variante duckdb_sql).
+        'sql': """
+            SELECT DISTINCT ON (t.region, t.prefecture, t.commune)
+                t.region, t.prefecture, t.commune,
+                t.latitude::FLOAT as lat,
+                t.longitude::FLOAT as lon
+            FROM dw.dim_communes c
+            JOIN dw.dim_territoire t ON c.id_territoire = t.id_territoire
+            WHERE t.quartier IS NULL
+              AND t.latitude IS NOT NULL AND t.longitude IS NOT NULL
+            ORDER BY t.region, t.prefecture, t.commune, t.latitude, t.longitude
+        """,
+    },
+    'centres_sans_coordonnees': {
+        'description': "Centres et régions (repli carte sans coordonnées)",
+        'params': [],
+        'sql': """
+            SELECT cs.nom_centre, cs.type_centre, t.region, t.prefecture
+            FROM dw.dim_centres_service cs
+            JOIN dw.dim_territoire t ON cs.id_territoire = t.id_territoire
+        """,
+    },
+    'centre_details': {
+        'description': "Fiche détaillée d'un centre",
+        'params': [('nom_centre', 'text')],
+        'sql': """
+            SELECT cs.*, t.region, t.prefecture, t.commune
+            FROM dw.dim_centres_service cs
+            JOIN dw.dim_territoire t ON cs.id_territoire = t.id_territoire
+            WHERE cs.nom_centre = $1
+        """,
+    },
+    'liste_types_document': {
+        'description': "Types de documents",
+        'params': [],
+        'sql': "SELECT DISTINCT type_document FROM dw.dim_type_document ORDER BY type_document",
+    },
+    'liste_centres': {
+        'description': "Liste de tous les centres",
+        'params': [],
+        'sql': "SELECT DISTINCT nom_centre FROM dw.dim_centres_service WHERE nom_centre IS NOT NULL ORDER BY nom_centre",
+    },
+    'liste_annees': {
+        'description': "Années disponibles",
+        'params': [],
+        'sql': "SELECT DISTINCT annee FROM dw.mv_kpi_demandes_mensuel WHERE annee > 0 ORDER BY annee DESC",
+    },
+    'liste_regions': {
+        'description': "Liste des régions",
+        'params': [],
+        'sql': "SELECT DISTINCT region FROM dw.dim_territoire WHERE region IS NOT NULL ORDER BY region",
+    },
+    'liste_prefectures': {
+        'description': "Préfectures d'une région",
+        'params': [('region', 'text')],
+        'sql': """
+            SELECT DISTINCT prefecture FROM dw.dim_territoire
+            WHERE region = $1 AND prefecture IS NOT NULL
+            ORDER BY prefecture
+        """,
+    },
+}
+
+# ============================================================================
+# PARAMÈTRES
+# ============================================================================
+
+def normalize_params(kpi_id, **filters):
+    """
+    Construit le tuple de paramètres positionnels d'un KPI.
+
+    Les filtres inconnus lèvent une KeyError ; les valeurs "Toutes"/"Tous"
+    sont converties en None (critère désactivé). Le tuple retourné est
+    hashable et sert de clé de cache avec kpi_id.
+    """
+    spec = KPI_QUERIES[kpi_id]
+    names = [name for name, _ in spec['params']]
+    unknown = set(filters) - set(names)
+    if unknown:
+        raise KeyError(f"Paramètres inconnus pour {kpi_id}: {', '.join(sorted(unknown))}")
+    return tuple(None if filters.get(name) in ALL_VALUES else filters[name] for name in names)
+
+# ============================================================================
+# REQUÊTES PRÉPARÉES
+# ============================================================================
+
+# connexion -> noms des requêtes déjà préparées sur cette session serveur
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+def _prepare_sql(kpi_id):
+    spec = KPI_QUERIES[kpi_id]
+    sql = spec['sql'].strip().rstrip(';')
+    if spec['params']:
+        types = ', '.join(t for _, t in spec['params'])
+        return f"PREPARE {kpi_id} ({types}) AS {sql}"
+    return f"PREPARE {kpi_id} AS {sql}"
+
+def _execute_sql(kpi_id):
+    n = len(KPI_QUERIES[kpi_id]['params'])
+    if n:
+        return f"EXECUTE {kpi_id} ({', '.join(['%s'] * n)})"
+    return f"EXECUTE {kpi_id}"
+
+def prepare_kpi(conn, kpi_id):
+    """Prépare la requête du KPI sur la connexion si ce n'est pas déjà fait"""
+    with _prepared_lock:
+        names = _prepared.setdefault(conn, set())
+        if kpi_id in names:
+            return
+    with conn.cursor() as cursor:
+        cursor.execute(_prepare_sql(kpi_id))
+    with _prepared_lock:
+        _prepared[conn].add(kpi_id)
+
+def forget_prepared(conn):
+    """Oublie les requêtes préparées d'une connexion (après reconnexion / DISCARD)"""
+    with _prepared_lock:
+        _prepared.pop(conn, None)
+
+def run_kpi(conn, kpi_id, params=()):
+    """
+    Exécute un KPI préparé et retourne un DataFrame.
+
+    params est le tuple produit par normalize_params. Si la requête préparée
+    a disparu côté serveur (session réinitialisée), elle est re-préparée une fois.
+    """
+    prepare_kpi(conn, kpi_id)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(_execute_sql(kpi_id), params)
+            rows = cursor.fetchall()
+            columns = [c.name for c in cursor.description]
+    except psycopg2.errors.InvalidSqlStatementName:
+        if not conn.autocommit:
+            conn.rollback()
+        forget_prepared(conn)
+        prepare_kpi(conn, kpi_id)
+        with conn.cursor() as cursor:
+            cursor.execute(_execute_sql(kpi_id), params)
+            rows = cursor.fetchall()
+            columns = [c.name for c in cursor.description]
+    return pd.DataFrame(rows, columns=columns)
+
+def explain_kpi(conn, kpi_id, params=(), analyze=True):
+    """
+    Plan d'exécution JSON du KPI préparé (EXPLAIN [ANALYZE, BUFFERS] EXECUTE ...).
+
+    Avec analyze=True la requête est réellement exécutée. Retourne le premier
+    élément de la sortie JSON ({'Plan': ..., 'Planning Time': ..., ...}).
+    """
+    prepare_kpi(conn, kpi_id)
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN ({options}) {_execute_sql(kpi_id)}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+def summarize_plan(explain):
+    """Extrait d'un EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) : temps, lignes lues, blocs"""
+    rows_scanned = 0
+    stack = [explain['Plan']]
+    while stack:
+        node = stack.pop()
+        # Bitmap Index Scan : lignes déjà comptées par le Bitmap Heap Scan parent
+        if 'Scan' in node.get('Node Type', '') and node.get('Node Type') != 'Bitmap Index Scan':
+            rows_scanned += int(node.get('Actual Rows', 0) * node.get('Actual Loops', 1))
+            rows_scanned += int(node.get('Rows Removed by Filter', 0) * node.get('Actual Loops', 1))
+        stack.extend(node.get('Plans', []))
+    top = explain['Plan']
+    return {
+        'planning_ms': explain.get('Planning Time'),
+        'execution_ms': explain.get('Execution Time'),
+        'rows_scanned': rows_scanned,
+        'shared_hit_blocks': top.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': top.get('Shared Read Blocks', 0),
+        'temp_written_blocks': top.get('Temp Written Blocks', 0),
+        'top_node': top.get('Node Type'),
+    }
+
+# ============================================================================
+# EXÉCUTION CONCURRENTE
+# ============================================================================
+
+def fetch_kpis(execute, jobs, max_workers=None):
+    """
+    Exécute des KPI indépendants en parallèle et attend qu'ils soient tous terminés.
+
+    execute     : callable(kpi_id, params) -> DataFrame,
+                  ex. lambda k, p: pool.run(run_kpi, k, p) (une connexion par appel)
+    jobs        : {nom: (kpi_id, params)}
+    max_workers : nombre de requêtes simultanées (à borner par la taille du pool)
+
+    Retourne {nom: DataFrame} : la latence est celle de la requête la plus lente,
+    non plus la somme des latences. Une exception d'un KPI est propagée.
+    """
+    if not jobs:
+        return {}
+    workers = len(jobs) if max_workers is None else max(1, min(max_workers, len(jobs)))
+    if workers == 1:
+        return {name: execute(kpi_id, params) for name, (kpi_id, params) in jobs.items()}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='kpi') as executor:
+        futures = {name: executor.submit(execute, kpi_id, params)
+                   for name, (kpi_id, params) in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
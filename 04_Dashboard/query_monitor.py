@@ -0,0 +1,242 @@
+"""
+Instrumentation des Requêtes des Dashboards
+===========================================
+
+Couche de mesure autour de toutes les requêtes SQL des deux dashboards
+(04_Dashboard/app_streamlit.py et app.py). Pour chaque exécution :
+
+- identifiant de requête (kpi_id), paramètres, backend, version de chargement ;
+- temps total (ms), lignes retournées, octets du résultat (taille mémoire du
+  DataFrame, approximation du volume transféré) ;
+- succès du cache de résultats (hit / miss) ou erreur ;
+- pour un échantillon configurable des exécutions réelles (miss), le plan
+  EXPLAIN (ANALYZE, BUFFERS), capturé dans un thread séparé pour ne pas
+  retarder l'affichage (la requête est exécutée une seconde fois).
+
+Les mesures sont gardées en mémoire (dernières max_records) et ajoutées à un
+journal JSON-lines, une ligne par événement ('query' ou 'explain'). La
+version de chargement de chaque ligne permet de retrouver la requête qui a
+régressé après un rechargement (cf. regressions).
+
+Usage:
+    monitor = QueryMonitor(log_path, explain_sample_rate=0.02, source='app_streamlit')
+    df = monitor.execute(kpi_id, params, lambda: pool.run(run_kpi, kpi_id, params),
+                         cache=result_cache, explain=lambda: pool.run(explain_kpi, kpi_id, params))
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from kpi_queries import summarize_plan
+from result_cache import dataframe_nbytes
+
+DEFAULT_LOG_PATH = Path(__file__).resolve().parent / "query_log.jsonl"
+
+# Part des exécutions réelles dont le plan EXPLAIN ANALYZE est capturé
+DEFAULT_EXPLAIN_SAMPLE_RATE = 0.02
+
+# Mesures conservées en mémoire (page Performance)
+DEFAULT_MAX_RECORDS = 2000
+
+# Au-delà de cette taille le journal est renommé en .1 (une génération gardée)
+LOG_MAX_BYTES = 50 * 1024 * 1024
+
+# Ratio au-delà duquel une latence médiane est une régression
+DEFAULT_THRESHOLD = 1.25
+
+def _params_repr(params):
+    return [None if p is None else str(p) for p in params]
+
+class QueryMonitor:
+    """Mesures des requêtes (mémoire + journal JSON-lines), EXPLAIN échantillonné"""
+
+    def __init__(self, log_path=DEFAULT_LOG_PATH, explain_sample_rate=DEFAULT_EXPLAIN_SAMPLE_RATE,
+                 max_records=DEFAULT_MAX_RECORDS, source='dashboard', backend='postgres'):
+        """
+        log_path            : journal JSON-lines (None : mémoire seulement)
+        explain_sample_rate : part (0..1) des exécutions réelles suivies d'un EXPLAIN ANALYZE
+        max_records         : nombre de mesures gardées en mémoire
+        source / backend    : recopiés dans chaque ligne (dashboard, postgres | duckdb)
+        """
+        self.log_path = Path(log_path) if log_path else None
+        self.explain_sample_rate = max(0.0, min(1.0, float(explain_sample_rate)))
+        self.source = source
+        self.backend = backend
+        self._records = deque(maxlen=max_records)
+        self._plans = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    # ------------------------------------------------------------------
+    # Mesure
+    # ------------------------------------------------------------------
+
+    def execute(self, query_id, params, run, cache=None, explain=None):
+        """
+        Exécute run() (via cache.get_or_compute si un cache est fourni) et mesure l'appel.
+
+        explain : callable() -> plan JSON d'EXPLAIN (ANALYZE, BUFFERS), appelé
+                  pour un échantillon des exécutions réelles ; None si le
+                  backend ne le permet pas.
+        Les exceptions sont enregistrées puis propagées.
+        """
+        executed = []
+
+        def compute():
+            executed.append(True)
+            return run()
+
+        version = cache.load_version() if cache is not None else None
+        start = time.perf_counter()
+        df, error = None, None
+        try:
+            df = cache.get_or_compute(query_id, params, compute) if cache is not None else compute()
+            return df
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = {
+                'event': 'query',
+                'ts': datetime.now().isoformat(timespec='milliseconds'),
+                'source': self.source,
+                'backend': self.backend,
+                'query_id': query_id,
+                'params': _params_repr(params),
+                'load_version': version,
+                'cache_hit': cache is not None and not executed,
+                'wall_ms': round((time.perf_counter() - start) * 1000, 3),
+                'rows': None if df is None else len(df),
+                'bytes': None if df is None else dataframe_nbytes(df),
+                'error': error,
+            }
+            self._store(record)
+            if executed and error is None and explain is not None and self._sampled():
+                threading.Thread(target=self._capture_plan, args=(record, explain),
+                                 name='explain', daemon=True).start()
+
+    def _sampled(self):
+        with self._lock:
+            return self._random.random() < self.explain_sample_rate
+
+    def _capture_plan(self, record, explain):
+        """EXPLAIN ANALYZE d'une exécution échantillonnée (thread séparé)"""
+        event = {key: record[key] for key in ('source', 'backend', 'query_id', 'params', 'load_version')}
+        event.update(event='explain', ts=datetime.now().isoformat(timespec='milliseconds'))
+        try:
+            plan = explain()
+            event.update(summary=summarize_plan(plan), plan=plan, error=None)
+        except Exception as e:
+            event.update(summary=None, plan=None, error=f"{type(e).__name__}: {e}")
+        with self._lock:
+            self._plans[record['query_id']] = event
+        self._write(event)
+
+    def _store(self, record):
+        with self._lock:
+            self._records.append(record)
+        self._write(record)
+
+    def _write(self, event):
+        """Ajoute une ligne au journal ; une erreur d'écriture ne casse pas le dashboard"""
+        if self.log_path is None:
+            return
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        try:
+            with self._lock:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                if self.log_path.exists() and self.log_path.stat().st_size > LOG_MAX_BYTES:
+                    os.replace(self.log_path, self.log_path.with_name(self.log_path.name + '.1'))
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Consultation
+    # ------------------------------------------------------------------
+
+    def records(self):
+        """Mesures en mémoire (les plus récentes en dernier)"""
+        with self._lock:
+            return pd.DataFrame(list(self._records))
+
+    def latest_plans(self):
+        """Dernier plan EXPLAIN capturé par requête : {query_id: événement 'explain'}"""
+        with self._lock:
+            return dict(self._plans)
+
+def read_log(log_path=DEFAULT_LOG_PATH, event='query'):
+    """Événements d'un journal JSON-lines (lignes illisibles ignorées)"""
+    rows = []
+    path = Path(log_path)
+    if path.exists():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get('event') == event:
+                    rows.append(row)
+    return pd.DataFrame(rows)
+
+def summarize(records, by=('query_id',)):
+    """
+    Synthèse par requête : exécutions, % de hits, latences des exécutions
+    réelles (miss) p50 / p95 / max, lignes et octets moyens, erreurs.
+    """
+    columns = list(by) + ['executions', 'cache_hit_pct', 'miss_p50_ms', 'miss_p95_ms', 'miss_max_ms',
+                          'lignes_moy', 'octets_moy', 'erreurs']
+    if records is None or records.empty:
+        return pd.DataFrame(columns=columns)
+    records = records.copy()
+    records['is_error'] = records['error'].notna()
+    records['miss_ms'] = records['wall_ms'].where(~records['cache_hit'].astype(bool) & ~records['is_error'])
+    grouped = records.groupby(list(by), dropna=False)
+    result = pd.DataFrame({
+        'executions': grouped.size(),
+        'cache_hit_pct': (grouped['cache_hit'].mean() * 100).round(1),
+        'miss_p50_ms': grouped['miss_ms'].quantile(0.5).round(2),
+        'miss_p95_ms': grouped['miss_ms'].quantile(0.95).round(2),
+        'miss_max_ms': grouped['miss_ms'].max().round(2),
+        'lignes_moy': grouped['rows'].mean().round(1),
+        'octets_moy': grouped['bytes'].mean().round(0),
+        'erreurs': grouped['is_error'].sum().astype(int),
+    }).reset_index()
+    return result[columns].sort_values('miss_p50_ms', ascending=False, ignore_index=True)
+
+def regressions(records, threshold=DEFAULT_THRESHOLD):
+    """
+    Requêtes ralenties entre les deux dernières versions de chargement du journal.
+
+    Compare la latence médiane des exécutions réelles (miss) de chaque requête ;
+    retourne query_id, versions, p50 avant / après et ratio pour les ratios > threshold.
+    """
+    columns = ['query_id', 'version_avant', 'version_apres', 'p50_avant_ms', 'p50_apres_ms', 'ratio']
+    if records is None or records.empty or records['load_version'].dropna().nunique() < 2:
+        return pd.DataFrame(columns=columns)
+    versions = sorted(records['load_version'].dropna().unique())
+    before, after = versions[-2], versions[-1]
+    stats = summarize(records[records['load_version'].isin([before, after])], by=('query_id', 'load_version'))
+    p50 = stats.pivot(index='query_id', columns='load_version', values='miss_p50_ms').dropna()
+    if p50.empty:
+        return pd.DataFrame(columns=columns)
+    result = pd.DataFrame({
+        'query_id': p50.index,
+        'version_avant': before,
+        'version_apres': after,
+        'p50_avant_ms': p50[before].to_numpy(),
+        'p50_apres_ms': p50[after].to_numpy(),
+    })
+    result['ratio'] = (result['p50_apres_ms'] / result['p50_avant_ms'].where(result['p50_avant_ms'] > 0)).round(2)
+    result = result[result['ratio'] > threshold]
+    return result[columns].sort_values('ratio', ascending=False, ignore_index=True)
@@ -0,0 +1,174 @@
+"""
+Cache de Résultats des Dashboards
+=================================
+
+Remplace @st.cache_data (TTL fixe, taille non bornée) pour les résultats de
+requêtes des deux dashboards :
+
+- clé = (version de chargement, identifiant de requête, paramètres) : la
+  version est incrémentée par l'ETL à la fin de chaque chargement
+  (dw.etl_load_version), les entrées deviennent donc obsolètes exactement
+  quand les données changent, et pas avant ;
+- budget mémoire en octets avec éviction LRU, taille mesurée par DataFrame
+  (memory_usage(deep=True)) ;
+- thread-safe (sessions Streamlit et requêtes parallèles de query_kpis).
+
+Usage:
+    cache = ResultCache(max_bytes=..., version_fn=lambda: pool.run(fetch_load_version))
+    df = cache.get_or_compute('kpi_001_dmt_global', params, lambda: pool.run(run_kpi, ...))
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.errors
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Intervalle (s) entre deux lectures de la version de chargement
+VERSION_CHECK_INTERVAL = 15.0
+
+LOAD_VERSION_SQL = "SELECT version FROM dw.etl_load_version WHERE id = 1"
+
+def fetch_load_version(conn):
+    """Version courante du DW (0 si la table de suivi n'existe pas encore)"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(LOAD_VERSION_SQL)
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    except psycopg2.errors.UndefinedTable:
+        if not conn.autocommit:
+            conn.rollback()
+        return 0
+
+def dataframe_nbytes(df):
+    """Empreinte mémoire d'un DataFrame (colonnes objet comprises)"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class ResultCache:
+    """Cache LRU de DataFrames borné en octets, invalidé par version de chargement"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, version_fn=None,
+                 version_check_interval=VERSION_CHECK_INTERVAL):
+        """
+        max_bytes              : budget mémoire total des résultats
+        version_fn             : callable() -> version de chargement courante
+        version_check_interval : durée (s) pendant laquelle la version lue est réutilisée
+        """
+        self.max_bytes = max_bytes
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._version = 0
+        self._version_checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Version de chargement
+    # ------------------------------------------------------------------
+
+    def load_version(self):
+        """Version courante, relue au plus une fois par version_check_interval"""
+        if self.version_fn is None:
+            return self._version
+        now = time.monotonic()
+        with self._lock:
+            fresh = (self._version_checked_at is not None
+                     and now - self._version_checked_at < self.version_check_interval)
+            if fresh:
+                return self._version
+            self._version_checked_at = now
+        try:
+            version = self.version_fn()
+        except Exception:
+            # Base injoignable : on garde la dernière version connue
+            return self._version
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._purge_other_versions(version)
+            return self._version
+
+    def _purge_other_versions(self, version):
+        for key in [k for k in self._entries if k[0] != version]:
+            _, nbytes = self._entries.pop(key)
+            self._bytes -= nbytes
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # Accès
+    # ------------------------------------------------------------------
+
+    def get(self, query_id, params=()):
+        """DataFrame en cache (copie) ou None"""
+        key = (self.load_version(), query_id, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df = entry[0]
+        # Copie : l'appelant peut modifier le résultat sans altérer le cache
+        return df.copy()
+
+    def put(self, query_id, params, df, version=None):
+        """Ajoute un résultat ; ignoré s'il dépasse à lui seul le budget"""
+        version = self.load_version() if version is None else version
+        key = (version, query_id, params)
+        nbytes = dataframe_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._version:
+                # Chargé pendant un rechargement ETL : résultat déjà périmé
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def get_or_compute(self, query_id, params, compute):
+        """
+        Retourne le résultat en cache, sinon compute() (mis en cache).
+
+        Les exceptions de compute() sont propagées et rien n'est mis en cache.
+        """
+        version = self.load_version()
+        df = self.get(query_id, params)
+        if df is not None:
+            return df
+        df = compute()
+        self.put(query_id, params, df, version=version)
+        return df.copy()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Compteurs pour supervision (entrées, octets, hits, misses, évictions)"""
+        with self._lock:
+            return {
+                'version': self._version,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
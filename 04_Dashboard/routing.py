@@ -0,0 +1,214 @@
+"""
+Routage sur le Réseau Routier
+=============================
+
+Temps de parcours entre préfectures à partir de reseau_routier_togo_ext
+(une ligne par tronçon préfecture -> préfecture, temps_parcours_heures).
+
+- graphe compact : matrice creuse CSR (scipy.sparse), un nœud par préfecture,
+  tronçons non orientés, le plus rapide conservé en cas de doublon ;
+- matrice complète des plus courts temps (Dijkstra depuis toutes les sources) ;
+- temps jusqu'au centre de service le plus proche : un seul Dijkstra
+  multi-sources (min_only) depuis les préfectures dotées d'un centre.
+
+Les noms de préfectures sont rapprochés sur une clé normalisée (encodage et
+espaces via text_normalizer, casse, accents, variantes orthographiques de
+PREFECTURE_ALIASES) ; les préfectures introuvables dans le réseau sont
+signalées, jamais ignorées silencieusement.
+
+Le graphe et la matrice sont persistés dans un .npz, avec l'empreinte SHA-256
+du fichier routier : ils ne sont recalculés que si ce fichier change.
+
+Usage:
+    network = load_travel_times()                      # cache disque
+    network.time_matrix()                              # DataFrame préfecture x préfecture (h)
+    network.nearest_centre_times(['Golfe', 'Kozah'])   # temps vers le centre le plus proche
+"""
+
+import hashlib
+import sys
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+ROAD_NETWORK_PATH = (PROJECT_DIR / "02_Nettoyage_et_Preparation_des_Donnees" / "data_cleaned"
+                     / "reseau_routier_togo_ext_cleaned.csv")
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / "travel_times.npz"
+
+# Normalisation partagée avec le nettoyage (caractères mal décodés, espaces)
+sys.path.insert(0, str(ROAD_NETWORK_PATH.parent.parent))
+from text_normalizer import normalize_text  # noqa: E402
+
+# Variantes orthographiques connues entre sources (clé normalisée -> clé du réseau)
+PREFECTURE_ALIASES = {
+    'tandjouare': 'tandjoare',
+}
+
+ROAD_COLUMNS = ['prefecture_origine', 'prefecture_destination', 'longueur_km',
+                'temps_parcours_heures', 'vitesse_moyenne']
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier (clé du cache)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def prefecture_key(name):
+    """
+    Clé de rapprochement d'un nom de préfecture : texte normalisé, minuscules,
+    sans accents ni ponctuation, variante orthographique ramenée à celle du réseau.
+    """
+    if not isinstance(name, str):
+        return None
+    text = unicodedata.normalize('NFKD', normalize_text(name).lower())
+    key = ''.join(c for c in text if c.isalnum())
+    return PREFECTURE_ALIASES.get(key, key) or None
+
+def _edge_hours(roads):
+    """Temps de parcours (h) d'un tronçon ; à défaut longueur / vitesse moyenne"""
+    hours = pd.to_numeric(roads['temps_parcours_heures'], errors='coerce')
+    if 'longueur_km' in roads and 'vitesse_moyenne' in roads:
+        estimate = (pd.to_numeric(roads['longueur_km'], errors='coerce')
+                    / pd.to_numeric(roads['vitesse_moyenne'], errors='coerce').replace(0, np.nan))
+        hours = hours.where(hours > 0, estimate)
+    return hours
+
+def build_graph(roads):
+    """
+    Graphe non orienté des préfectures (CSR, poids = heures).
+
+    Retourne (nœuds, matrice n x n). Les tronçons sans temps exploitable et
+    les boucles sont ignorés ; entre deux préfectures seul le plus rapide compte.
+    """
+    origin = roads['prefecture_origine'].astype(str).str.strip()
+    destination = roads['prefecture_destination'].astype(str).str.strip()
+    hours = _edge_hours(roads)
+    valid = (hours > 0) & (origin != destination) & roads['prefecture_origine'].notna() \
+        & roads['prefecture_destination'].notna()
+    origin, destination, hours = origin[valid], destination[valid], hours[valid].to_numpy()
+
+    nodes = np.array(sorted(set(origin) | set(destination)), dtype=object)
+    codes = {name: i for i, name in enumerate(nodes)}
+    src = origin.map(codes).to_numpy()
+    dst = destination.map(codes).to_numpy()
+
+    # Arcs dans les deux sens, le plus court par paire (i, j)
+    edges = pd.DataFrame({'i': np.concatenate([src, dst]), 'j': np.concatenate([dst, src]),
+                          'h': np.concatenate([hours, hours])})
+    edges = edges.groupby(['i', 'j'], as_index=False)['h'].min()
+    graph = csr_matrix((edges['h'].to_numpy(), (edges['i'].to_numpy(), edges['j'].to_numpy())),
+                       shape=(len(nodes), len(nodes)))
+    return nodes, graph
+
+class RoadNetwork:
+    """Graphe routier des préfectures et matrice des plus courts temps de parcours"""
+
+    def __init__(self, nodes, graph, matrix=None, digest=None):
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.graph = graph
+        self.digest = digest
+        self._index = {prefecture_key(name): i for i, name in enumerate(self.nodes)}
+        # Dijkstra depuis chaque nœud (graphe creux : O(n (m + n log n)))
+        self.matrix = dijkstra(graph, directed=False) if matrix is None else matrix
+
+    @classmethod
+    def from_csv(cls, road_path=ROAD_NETWORK_PATH):
+        roads = pd.read_csv(road_path, usecols=lambda c: c in ROAD_COLUMNS)
+        nodes, graph = build_graph(roads)
+        return cls(nodes, graph, digest=file_digest(road_path))
+
+    def save(self, cache_path):
+        graph = self.graph.tocsr()
+        np.savez_compressed(
+            cache_path, nodes=self.nodes.astype(str), matrix=self.matrix, digest=np.array(self.digest or ''),
+            data=graph.data, indices=graph.indices, indptr=graph.indptr
+        )
+
+    @classmethod
+    def load(cls, cache_path):
+        with np.load(cache_path, allow_pickle=False) as npz:
+            nodes = npz['nodes'].astype(object)
+            graph = csr_matrix((npz['data'], npz['indices'], npz['indptr']), shape=(len(nodes), len(nodes)))
+            return cls(nodes, graph, matrix=npz['matrix'], digest=str(npz['digest']))
+
+    def position(self, prefecture):
+        """Position d'une préfecture dans le réseau (None si elle n'y figure pas)"""
+        return self._index.get(prefecture_key(prefecture))
+
+    def positions(self, prefectures):
+        """Positions des préfectures présentes dans le réseau (cf. unmatched pour les autres)"""
+        found = {self.position(p) for p in prefectures}
+        return np.array(sorted(found - {None}), dtype=np.intp)
+
+    def unmatched(self, prefectures):
+        """Noms de préfectures sans correspondance dans le réseau, triés"""
+        return sorted({p for p in prefectures if self.position(p) is None})
+
+    def time_matrix(self):
+        """Plus courts temps de parcours (h) préfecture x préfecture (inf si non reliées)"""
+        return pd.DataFrame(self.matrix, index=self.nodes, columns=self.nodes)
+
+    def travel_time(self, origin, destination):
+        """Plus court temps (h) entre deux préfectures, lu dans la matrice (KeyError si inconnue)"""
+        i, j = self.position(origin), self.position(destination)
+        for name, position in ((origin, i), (destination, j)):
+            if position is None:
+                raise KeyError(f"Préfecture absente du réseau routier: {name}")
+        return float(self.matrix[i, j])
+
+    def nearest_centre_times(self, centre_prefectures):
+        """
+        Temps de chaque préfecture du réseau vers la préfecture dotée d'un centre
+        la plus proche (0 si elle en possède un), par Dijkstra multi-sources.
+
+        Retourne un DataFrame prefecture, prefecture_centre, temps_heures :
+        temps infini et prefecture_centre vide si aucun centre n'est accessible ;
+        les préfectures à centre absentes du réseau sont ajoutées avec un temps
+        NaN et listées dans df.attrs['prefectures_hors_reseau'].
+        """
+        centre_prefectures = [p for p in centre_prefectures if isinstance(p, str) and p.strip()]
+        sources = self.positions(centre_prefectures)
+        missing = self.unmatched(centre_prefectures)
+        columns = ['prefecture', 'prefecture_centre', 'temps_heures']
+        if len(sources) == 0:
+            df = pd.DataFrame({'prefecture': self.nodes, 'prefecture_centre': None, 'temps_heures': np.inf},
+                              columns=columns)
+        else:
+            dist, _, origin = dijkstra(self.graph, directed=False, indices=sources,
+                                       min_only=True, return_predecessors=True)
+            nearest = np.where(origin >= 0, self.nodes[np.maximum(origin, 0)], None)
+            df = pd.DataFrame({'prefecture': self.nodes, 'prefecture_centre': nearest,
+                               'temps_heures': np.round(dist, 2)}, columns=columns)
+        if missing:
+            absent = pd.DataFrame({'prefecture': missing, 'prefecture_centre': missing,
+                                   'temps_heures': np.nan}, columns=columns)
+            df = pd.concat([df, absent], ignore_index=True)
+        df.attrs['prefectures_hors_reseau'] = missing
+        return df
+
+def load_travel_times(road_path=ROAD_NETWORK_PATH, cache_path=DEFAULT_CACHE_PATH):
+    """
+    Réseau routier et matrice des temps, depuis le cache s'il correspond au fichier.
+
+    Le cache est recalculé (et réécrit) uniquement si l'empreinte du fichier
+    routier a changé ou si le cache est illisible.
+    """
+    digest = file_digest(road_path)
+    cache_path = Path(cache_path)
+    if cache_path.exists():
+        try:
+            network = RoadNetwork.load(cache_path)
+            if network.digest == digest:
+                return network
+        except (OSError, KeyError, ValueError):
+            pass
+    network = RoadNetwork.from_csv(road_path)
+    network.save(cache_path)
+    return network
@@ -0,0 +1,158 @@
+"""
+Index Spatial des Centres de Service
+====================================
+
+KD-tree (scipy.spatial.cKDTree) sur les coordonnées des centres, interrogé en
+lot pour toutes les communes à la fois : centre le plus proche, k plus
+proches, centres dans un rayon.
+
+Les points (latitude, longitude) sont projetés sur la sphère unité en 3D :
+la distance euclidienne (corde) y est une fonction croissante de la distance
+du grand cercle, donc les plus proches voisins sont exacts, et chaque corde
+est reconvertie en kilomètres (formule de haversine équivalente).
+
+Construit une fois par chargement (cf. get_spatial_index dans app_streamlit.py),
+puis réutilisé par l'indicateur d'accessibilité.
+
+Usage:
+    index = SpatialIndex(centres['lat'], centres['lon'], ids=centres['nom_centre'])
+    dist_km, idx = index.nearest(communes['lat'], communes['lon'])
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Rayon terrestre moyen (km)
+EARTH_RADIUS_KM = 6371.0088
+
+# Rayon d'accessibilité par défaut (km) de l'indicateur
+DEFAULT_RADIUS_KM = 10.0
+
+def to_unit_vectors(lat, lon):
+    """(lat, lon) en degrés -> vecteurs (n, 3) sur la sphère unité"""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+def chord_to_km(chord):
+    """Corde sur la sphère unité -> distance du grand cercle (km)"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+def km_to_chord(km):
+    """Distance du grand cercle (km) -> corde sur la sphère unité"""
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=float) / (2 * EARTH_RADIUS_KM), np.pi / 2))
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance du grand cercle (km), vectorisée élément par élément"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class SpatialIndex:
+    """KD-tree de points géographiques, requêtes en lot (distances en km)"""
+
+    def __init__(self, lat, lon, ids=None):
+        """
+        lat, lon : coordonnées en degrés (les points sans coordonnées sont ignorés)
+        ids      : identifiants des points (même longueur), défaut = position
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        self.lat = lat[valid]
+        self.lon = lon[valid]
+        ids = np.arange(len(lat)) if ids is None else np.asarray(ids)
+        self.ids = ids[valid]
+        self._tree = cKDTree(to_unit_vectors(self.lat, self.lon)) if valid.any() else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, lat, lon, k=1):
+        """
+        k plus proches points de chaque requête.
+
+        Retourne (distances_km, positions) de forme (n,) si k=1, (n, k) sinon ;
+        les positions indexent self.ids / self.lat / self.lon. Si l'index a moins
+        de k points, les voisins manquants ont une distance infinie et la
+        position len(self).
+        """
+        n = len(np.asarray(lat))
+        if self._tree is None:
+            shape = (n,) if k == 1 else (n, k)
+            return np.full(shape, np.inf), np.full(shape, 0, dtype=np.intp)
+        chord, pos = self._tree.query(to_unit_vectors(lat, lon), k=k)
+        dist = np.where(np.isinf(chord), np.inf, chord_to_km(np.where(np.isinf(chord), 0, chord)))
+        return dist, pos
+
+    def within_radius(self, lat, lon, radius_km):
+        """Positions des points à moins de radius_km de chaque requête (liste de tableaux)"""
+        if self._tree is None:
+            return [np.array([], dtype=np.intp) for _ in range(len(np.asarray(lat)))]
+        hits = self._tree.query_ball_point(to_unit_vectors(lat, lon), r=float(km_to_chord(radius_km)))
+        return [np.asarray(h, dtype=np.intp) for h in hits]
+
+    def count_within(self, lat, lon, radius_km):
+        """Nombre de points à moins de radius_km de chaque requête"""
+        if self._tree is None:
+            return np.zeros(len(np.asarray(lat)), dtype=np.intp)
+        return self._tree.query_ball_point(to_unit_vectors(lat, lon), r=float(km_to_chord(radius_km)),
+                                           return_length=True)
+
+def nearest_centres(index, communes, k=1):
+    """
+    Centre le plus proche (ou les k plus proches) de chaque commune.
+
+    communes : DataFrame avec colonnes lat, lon
+    Retourne une copie de communes + centre_proche, distance_km
+    (k > 1 : centre_proche_1.., distance_km_1..).
+    """
+    out = communes.copy()
+    dist, pos = index.nearest(out['lat'].to_numpy(), out['lon'].to_numpy(), k=k)
+    ids = np.append(index.ids, None)
+    if k == 1:
+        out['centre_proche'] = ids[pos]
+        out['distance_km'] = np.round(dist, 2)
+    else:
+        for j in range(k):
+            out[f'centre_proche_{j + 1}'] = ids[pos[:, j]]
+            out[f'distance_km_{j + 1}'] = np.round(dist[:, j], 2)
+    return out
+
+def accessibility_by_region(index, communes, radius_km=DEFAULT_RADIUS_KM):
+    """
+    Indicateur d'accessibilité par région (complément de KPI-003 / KPI-004).
+
+    Pour chaque commune : distance au centre le plus proche et nombre de
+    centres dans le rayon, en une requête KD-tree pour toutes les communes.
+    Retourne par région : communes, distance moyenne / médiane / max au
+    centre le plus proche, part des communes ayant un centre à moins de
+    radius_km et nombre moyen de centres dans ce rayon.
+    """
+    columns = ['region', 'nombre_communes', 'distance_moyenne_km', 'distance_mediane_km',
+               'distance_max_km', 'pct_communes_dans_rayon', 'centres_dans_rayon_moyen']
+    communes = communes.dropna(subset=['lat', 'lon'])
+    if communes.empty or len(index) == 0:
+        return pd.DataFrame(columns=columns)
+
+    lat = communes['lat'].to_numpy()
+    lon = communes['lon'].to_numpy()
+    dist, _ = index.nearest(lat, lon)
+    stats = pd.DataFrame({
+        'region': communes['region'].to_numpy(),
+        'distance_km': dist,
+        'dans_rayon': dist <= radius_km,
+        'centres_dans_rayon': index.count_within(lat, lon, radius_km),
+    })
+    grouped = stats.groupby('region')
+    result = pd.DataFrame({
+        'nombre_communes': grouped.size(),
+        'distance_moyenne_km': grouped['distance_km'].mean().round(2),
+        'distance_mediane_km': grouped['distance_km'].median().round(2),
+        'distance_max_km': grouped['distance_km'].max().round(2),
+        'pct_communes_dans_rayon': (grouped['dans_rayon'].mean() * 100).round(2),
+        'centres_dans_rayon_moyen': grouped['centres_dans_rayon'].mean().round(2),
+    }).reset_index()
+    return result[columns].sort_values('distance_moyenne_km', ascending=False, ignore_index=True)
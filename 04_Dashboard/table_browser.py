@@ -0,0 +1,273 @@
+"""
+Navigation Paginée des Tables RAW
+=================================
+
+Parcours page par page des tables affichées par app.py (centres, demandes,
+données socio-économiques, communes) sans jamais charger une table entière.
+
+- Pagination par curseur (keyset) sur la clé row_id : une page est
+      WHERE (colonne_de_tri, row_id) > (dernière valeur, dernier row_id)
+      ORDER BY colonne_de_tri, row_id LIMIT n
+  soit un parcours d'index borné, que la page soit la 1re ou la 100 000e
+  (OFFSET relirait toutes les lignes précédentes).
+- Tri et filtres (égalité) côté serveur, limités aux colonnes déclarées dans
+  BROWSABLE_TABLES : les noms de colonnes ne viennent jamais de l'utilisateur.
+- Nombre de lignes estimé (pg_class.reltuples, ou estimation du planificateur
+  avec filtres) au lieu d'un COUNT(*) exact.
+
+Les valeurs NULL de la colonne de tri sont parcourues après les autres
+(segment 'nulls', ordonné par row_id), dans les deux sens de tri.
+
+Le curseur est un tuple hashable (segment, valeur, row_id) : None pour la
+première page, sinon la position de la dernière ligne de la page précédente.
+Les index (colonne, row_id) sont créés par script_sql/11_raw_browse_keys.sql,
+après le chargement ; en mode incrémental les tables sont chargées à part puis
+basculées dans raw (load_clean_data_full.py) : une page n'est jamais lue sur
+une table vidée ou partiellement rechargée.
+
+Usage:
+    df = pool.run(fetch_page, 'demandes_services_public', sort='date_demande',
+                  filters={'region': 'Maritime'})
+    suivante = pool.run(fetch_page, 'demandes_services_public', sort='date_demande',
+                        filters={'region': 'Maritime'}, cursor=df.attrs['next_cursor'])
+"""
+
+import json
+
+import pandas as pd
+from psycopg2 import sql
+
+from kpi_queries import ALL_VALUES
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Clé de pagination des tables RAW (identité, cf. 02_create_tables.sql)
+KEY_COLUMN = 'row_id'
+
+# ============================================================================
+# TABLES PARCOURABLES
+# ============================================================================
+# table      : (schéma, table)
+# sortable   : colonnes de tri autorisées (la clé en premier : tri par défaut)
+# filterable : colonnes texte filtrables par égalité
+# Sur demandes_services_public chaque colonne de tri / filtre a son index
+# (colonne, row_id) ; les autres tables ne comptent que quelques milliers de lignes.
+
+BROWSABLE_TABLES = {
+    'centres_service': {
+        'table': ('raw', 'centres_service'),
+        'sortable': [KEY_COLUMN, 'nom_centre', 'region', 'prefecture', 'commune', 'type_centre',
+                     'statut_centre', 'date_ouverture'],
+        'filterable': ['region', 'prefecture', 'type_centre', 'statut_centre'],
+    },
+    'demandes_services_public': {
+        'table': ('raw', 'demandes_services_public'),
+        'sortable': [KEY_COLUMN, 'date_demande', 'region', 'statut_demande', 'type_document'],
+        'filterable': ['region', 'statut_demande', 'type_document'],
+    },
+    'donnees_socioeconomiques': {
+        'table': ('raw', 'donnees_socioeconomiques'),
+        'sortable': [KEY_COLUMN, 'region', 'prefecture', 'commune', 'population', 'densite',
+                     'revenu_moyen_fcfa'],
+        'filterable': ['region', 'prefecture'],
+    },
+    'communes': {
+        'table': ('raw', 'communes'),
+        'sortable': [KEY_COLUMN, 'commune', 'prefecture', 'region', 'superficie_km2', 'distance_capitale_km'],
+        'filterable': ['region', 'prefecture', 'type_commune'],
+    },
+}
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _spec(name):
+    if name not in BROWSABLE_TABLES:
+        raise KeyError(f"Table non parcourable: {name}")
+    return BROWSABLE_TABLES[name]
+
+def normalize_filters(name, filters=None):
+    """
+    Filtres d'égalité sous forme de tuple trié ((colonne, valeur), ...).
+
+    Accepte un dict ou des paires ; les valeurs "Toutes"/"Tous"/None sont
+    ignorées. Une colonne hors de la liste 'filterable' lève une ValueError.
+    Le tuple retourné est hashable et sert de clé de cache.
+    """
+    spec = _spec(name)
+    items = filters.items() if isinstance(filters, dict) else (filters or ())
+    normalized = {}
+    for column, value in items:
+        if column not in spec['filterable']:
+            raise ValueError(f"Filtre non autorisé sur {name}: {column}")
+        if value not in ALL_VALUES:
+            normalized[column] = str(value)
+    return tuple(sorted(normalized.items()))
+
+def _check_sort(name, sort):
+    spec = _spec(name)
+    sort = sort or KEY_COLUMN
+    if sort not in spec['sortable']:
+        raise ValueError(f"Tri non autorisé sur {name}: {sort}")
+    return sort
+
+# ============================================================================
+# REQUÊTES
+# ============================================================================
+
+def _segments(sort, cursor):
+    """Segments restant à parcourir depuis le curseur : 'values' puis 'nulls' (tri hors clé)"""
+    if sort == KEY_COLUMN:
+        return ['values']
+    if cursor is not None and cursor[0] == 'nulls':
+        return ['nulls']
+    return ['values', 'nulls']
+
+def _segment_query(name, sort, descending, filters, segment, cursor, limit):
+    """Requête d'un segment : (sql.Composed, paramètres)"""
+    spec = _spec(name)
+    table = sql.Identifier(*spec['table'])
+    key = sql.Identifier(KEY_COLUMN)
+    column = sql.Identifier(sort)
+    direction = sql.SQL('DESC' if descending else 'ASC')
+    compare = sql.SQL('<' if descending else '>')
+
+    conditions, params = [], []
+    for filter_column, value in filters:
+        conditions.append(sql.SQL("{} = %s").format(sql.Identifier(filter_column)))
+        params.append(value)
+
+    # Le curseur ne borne que le segment dans lequel il se trouve
+    position = cursor if cursor is not None and cursor[0] == segment else None
+    if sort == KEY_COLUMN:
+        order = [key]
+        if position is not None:
+            conditions.append(sql.SQL("{} {} %s").format(key, compare))
+            params.append(position[2])
+    elif segment == 'values':
+        order = [column, key]
+        conditions.append(sql.SQL("{} IS NOT NULL").format(column))
+        if position is not None:
+            conditions.append(sql.SQL("({}, {}) {} (%s, %s)").format(column, key, compare))
+            params.extend([position[1], position[2]])
+    else:
+        order = [key]
+        conditions.append(sql.SQL("{} IS NULL").format(column))
+        if position is not None:
+            conditions.append(sql.SQL("{} {} %s").format(key, compare))
+            params.append(position[2])
+
+    query = sql.SQL("SELECT * FROM {table}{where} ORDER BY {order} LIMIT %s").format(
+        table=table,
+        where=sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL(""),
+        order=sql.SQL(", ").join(sql.SQL("{} {}").format(c, direction) for c in order),
+    )
+    params.append(limit)
+    return query, params
+
+def _page_args(name, sort, filters, page_size):
+    sort = _check_sort(name, sort)
+    filters = normalize_filters(name, filters)
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    return sort, filters, page_size
+
+def fetch_page(conn, name, sort=None, descending=False, filters=None, cursor=None,
+               page_size=DEFAULT_PAGE_SIZE):
+    """
+    Une page de la table (au plus page_size lignes, colonnes de la table).
+
+    cursor : None (première page) ou df.attrs['next_cursor'] de la page précédente.
+    Le curseur de la page suivante est placé dans df.attrs['next_cursor']
+    (None en fin de table). Une ligne de plus est lue pour le savoir ; le
+    segment des NULL n'est interrogé que lorsque celui des valeurs est épuisé.
+    """
+    sort, filters, page_size = _page_args(name, sort, filters, page_size)
+    rows, columns = [], None
+    for segment in _segments(sort, cursor):
+        query, params = _segment_query(name, sort, descending, filters, segment, cursor,
+                                       page_size + 1 - len(rows))
+        with conn.cursor() as db_cursor:
+            db_cursor.execute(query, params)
+            rows.extend(db_cursor.fetchall())
+            columns = [c.name for c in db_cursor.description]
+        if len(rows) > page_size:
+            break
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        key_index, sort_index = columns.index(KEY_COLUMN), columns.index(sort)
+        last = rows[-1]
+        segment = 'nulls' if sort != KEY_COLUMN and last[sort_index] is None else 'values'
+        next_cursor = (segment, last[sort_index], last[key_index])
+
+    df = pd.DataFrame(rows, columns=columns)
+    df.attrs['next_cursor'] = next_cursor
+    return df
+
+def explain_page(conn, name, sort=None, descending=False, filters=None, cursor=None,
+                 page_size=DEFAULT_PAGE_SIZE, analyze=True):
+    """Plan JSON (EXPLAIN [ANALYZE, BUFFERS]) de la première requête de la page"""
+    sort, filters, page_size = _page_args(name, sort, filters, page_size)
+    segment = _segments(sort, cursor)[0]
+    query, params = _segment_query(name, sort, descending, filters, segment, cursor, page_size + 1)
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    with conn.cursor() as db_cursor:
+        db_cursor.execute(sql.SQL("EXPLAIN ({}) ").format(sql.SQL(options)) + query, params)
+        plan = db_cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+# ============================================================================
+# ESTIMATIONS
+# ============================================================================
+
+def estimate_count(conn, name, filters=None):
+    """
+    Nombre de lignes estimé, sans COUNT(*).
+
+    Sans filtre : pg_class.reltuples (tenu à jour par ANALYZE / autovacuum).
+    Avec filtres, ou table jamais analysée : lignes estimées par le
+    planificateur pour la requête filtrée (EXPLAIN sans exécution).
+    """
+    spec = _spec(name)
+    filters = normalize_filters(name, filters)
+    table = sql.Identifier(*spec['table'])
+    with conn.cursor() as db_cursor:
+        if not filters:
+            db_cursor.execute("SELECT reltuples::BIGINT FROM pg_class WHERE oid = %s::regclass",
+                              ('.'.join(spec['table']),))
+            row = db_cursor.fetchone()
+            if row and row[0] is not None and row[0] >= 0:
+                return int(row[0])
+        query = sql.SQL("EXPLAIN (FORMAT JSON) SELECT 1 FROM {}").format(table)
+        if filters:
+            query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(
+                sql.SQL("{} = %s").format(sql.Identifier(column)) for column, _ in filters
+            )
+        db_cursor.execute(query, [value for _, value in filters])
+        plan = db_cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def filter_values(conn, name, column):
+    """
+    Valeurs proposées pour un filtre : valeurs les plus fréquentes de pg_stats
+    (aucune lecture de la table). Liste vide si la colonne n'a pas de statistiques.
+    """
+    spec = _spec(name)
+    if column not in spec['filterable']:
+        raise ValueError(f"Filtre non autorisé sur {name}: {column}")
+    schema, table = spec['table']
+    with conn.cursor() as db_cursor:
+        db_cursor.execute("""
+            SELECT most_common_vals::TEXT::TEXT[]
+            FROM pg_stats
+            WHERE schemaname = %s AND tablename = %s AND attname = %s
+        """, (schema, table, column))
+        row = db_cursor.fetchone()
+    return sorted(v for v in (row[0] if row and row[0] else []) if v is not None)
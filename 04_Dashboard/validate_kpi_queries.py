@@ -5,15 +5,40 @@ Script de Validation des Requêtes KPI
 Teste la connectivité à PostgreSQL et valide que tous les KPI
 peuvent être exécutés correctement.
 
+Mode benchmark : chaque requête du registre kpi_queries.KPI_QUERIES (celles
+qu'exécutent les fonctions get_kpi_* du dashboard) est mesurée N fois, sur une
+ou plusieurs bases de volumétries différentes. Les résultats (latences
+froides / chaudes, EXPLAIN ANALYZE BUFFERS) sont enregistrés dans une
+baseline JSON, comparable d'une exécution à l'autre.
+
+Mode plans : EXPLAIN (FORMAT JSON) de chaque KPI (plan estimé, sans exécuter
+la requête) sur une base chargée à une volumétrie de référence, comparé à une
+baseline versionnée (kpi_plan_baseline.json) : coût estimé, types de nœuds,
+relations parcourues et mode de parcours. Code de sortie non nul si un coût
+dépasse le seuil, si un parcours séquentiel ou une boucle imbriquée
+apparaît, ou si une nouvelle relation est lue.
+
 Usage: python validate_kpi_queries.py
+       python validate_kpi_queries.py --benchmark --runs 30 \
+           --scale petit="dbname=togo_small port=5434 user=postgres password=postgres" \
+           --scale grand="dbname=togo_x100 port=5434 user=postgres password=postgres" \
+           --output baseline.json [--compare baseline_precedente.json]
+       python validate_kpi_queries.py --plans --scale ref="dbname=togo_x10 port=5434 user=postgres password=postgres"
+       python validate_kpi_queries.py --plans --update-plan-baseline --scale ref="..."
 """
 
+import argparse
+import json
+import os
 import sys
+import time
 import psycopg2
 import psycopg2.extras
 from datetime import datetime
 import traceback
 
+from kpi_queries import KPI_QUERIES as DASHBOARD_KPI_QUERIES, explain_kpi, forget_prepared, run_kpi, summarize_plan
+
 # Configuration
 DB_CONFIG = {
     'host': 'localhost',
@@ -260,6 +285,399 @@ def get_table_row_counts():
         print(f"✗ Erreur: {str(e)}")
         return False
 
+def check_communes_coordonnees():
+    """
+    Points de communes_coordonnees (index spatial / accessibilité) : un par
+    commune ayant des coordonnées dans raw.communes. Un surplus signale des
+    territoires de niveau quartier (centres) comptés comme communes.
+    """
+    print_header("ÉTAPE 5: Points Communes (Accessibilité)")
+    
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        points = len(run_kpi(conn, 'communes_coordonnees'))
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT DISTINCT region, prefecture, commune
+                FROM raw.communes
+                WHERE region IS NOT NULL AND prefecture IS NOT NULL AND commune IS NOT NULL
+                  AND latitude IS NOT NULL AND longitude IS NOT NULL
+            ) c;
+        """)
+        communes = cursor.fetchone()[0]
+        cursor.close()
+        conn.close()
+        
+        if points != communes:
+            print(f"✗ communes_coordonnees: {points} points pour {communes} communes distinctes")
+            return False
+        print(f"✓ communes_coordonnees: {points} points = {communes} communes distinctes")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Erreur: {str(e)}")
+        return False
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+DEFAULT_RUNS = 20
+DEFAULT_COLD_RUNS = 3
+# Ratio au-delà duquel une latence / un volume de blocs est une régression
+DEFAULT_THRESHOLD = 1.25
+
+# Paramètres obligatoires (sans eux la requête ne retourne rien) : valeur
+# échantillonnée dans la base mesurée. Les autres filtres restent à None,
+# soit le cas le plus coûteux (tout le territoire).
+SAMPLE_PARAMS = {
+    'region': "SELECT region FROM dw.dim_territoire WHERE region IS NOT NULL ORDER BY region LIMIT 1",
+    'nom_centre': "SELECT nom_centre FROM dw.dim_centres_service ORDER BY nom_centre LIMIT 1",
+}
+REQUIRED_PARAMS = {
+    'liste_prefectures': ['region'],
+    'centre_details': ['nom_centre'],
+}
+
+def percentile(values, pct):
+    """Percentile par interpolation linéaire (valeurs non vides)"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def latency_summary(samples_ms):
+    return {
+        'n': len(samples_ms),
+        'mean': round(sum(samples_ms) / len(samples_ms), 3),
+        'p50': round(percentile(samples_ms, 50), 3),
+        'p95': round(percentile(samples_ms, 95), 3),
+        'p99': round(percentile(samples_ms, 99), 3),
+        'max': round(max(samples_ms), 3),
+    }
+
+def benchmark_params(conn, kpi_id):
+    """Paramètres de mesure : None partout, sauf les filtres obligatoires échantillonnés"""
+    spec = DASHBOARD_KPI_QUERIES[kpi_id]
+    required = REQUIRED_PARAMS.get(kpi_id, [])
+    params = []
+    for name, _ in spec['params']:
+        value = None
+        if name in required:
+            with conn.cursor() as cursor:
+                cursor.execute(SAMPLE_PARAMS[name])
+                row = cursor.fetchone()
+            value = row[0] if row else None
+        params.append(value)
+    return tuple(params)
+
+def _connect(dsn):
+    conn = psycopg2.connect(dsn) if isinstance(dsn, str) else psycopg2.connect(**dsn)
+    conn.autocommit = True
+    return conn
+
+def benchmark_kpi(dsn, conn, kpi_id, runs, cold_runs):
+    """
+    Mesure un KPI.
+
+    froid  : nouvelle session à chaque essai (PREPARE + premier EXECUTE :
+             analyse, planification, caches de session vides) ;
+    chaud  : `runs` exécutions de la requête préparée sur une session réchauffée.
+    """
+    params = benchmark_params(conn, kpi_id)
+
+    cold = []
+    for _ in range(cold_runs):
+        fresh = _connect(dsn)
+        try:
+            start = time.perf_counter()
+            run_kpi(fresh, kpi_id, params)
+            cold.append((time.perf_counter() - start) * 1000)
+        finally:
+            forget_prepared(fresh)
+            fresh.close()
+
+    df = run_kpi(conn, kpi_id, params)  # préparation + réchauffage
+    warm = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_kpi(conn, kpi_id, params)
+        warm.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'params': [None if p is None else str(p) for p in params],
+        'rows_returned': len(df),
+        'cold_ms': latency_summary(cold) if cold else None,
+        'warm_ms': latency_summary(warm),
+        'explain': summarize_plan(explain_kpi(conn, kpi_id, params)),
+    }
+
+def benchmark_scale(name, dsn, runs, cold_runs, kpi_ids=None):
+    """Mesure tous les KPI (ou kpi_ids) sur une base"""
+    print_header(f"BENCHMARK: {name}")
+    conn = _connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW server_version")
+            server_version = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM dw.fact_demandes")
+            fact_rows = cursor.fetchone()[0]
+        print(f"  PostgreSQL {server_version}, dw.fact_demandes: {fact_rows:,} lignes")
+
+        results = {}
+        for kpi_id in kpi_ids or DASHBOARD_KPI_QUERIES:
+            try:
+                res = benchmark_kpi(dsn, conn, kpi_id, runs, cold_runs)
+                results[kpi_id] = res
+                cold_p50 = res['cold_ms']['p50'] if res['cold_ms'] else float('nan')
+                print(f"  ✓ {kpi_id:35} chaud p50 {res['warm_ms']['p50']:>9.2f} ms"
+                      f"  p95 {res['warm_ms']['p95']:>9.2f} ms  froid p50 {cold_p50:>9.2f} ms"
+                      f"  lignes lues {res['explain']['rows_scanned']:>10,}")
+            except Exception as e:
+                results[kpi_id] = {'error': str(e)}
+                print(f"  ✗ {kpi_id:35} {str(e)[:80]}")
+        return {'server_version': server_version, 'fact_rows': fact_rows, 'kpis': results}
+    finally:
+        forget_prepared(conn)
+        conn.close()
+
+def compare_baselines(previous, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare deux baselines (mêmes échelles / KPI).
+
+    Retourne la liste des régressions : latence chaude p50/p95 ou blocs lus
+    (hit + read) multipliés par plus de `threshold`.
+    """
+    regressions = []
+    print_header(f"COMPARAISON (seuil x{threshold})")
+    for scale, cur_scale in current['scales'].items():
+        prev_scale = previous.get('scales', {}).get(scale)
+        if not prev_scale:
+            print(f"  {scale}: absente de la baseline précédente")
+            continue
+        for kpi_id, cur in cur_scale['kpis'].items():
+            prev = prev_scale['kpis'].get(kpi_id)
+            if not prev or 'error' in prev or 'error' in cur:
+                continue
+            checks = {
+                'warm_p50': (prev['warm_ms']['p50'], cur['warm_ms']['p50']),
+                'warm_p95': (prev['warm_ms']['p95'], cur['warm_ms']['p95']),
+                'blocks': (prev['explain']['shared_hit_blocks'] + prev['explain']['shared_read_blocks'],
+                           cur['explain']['shared_hit_blocks'] + cur['explain']['shared_read_blocks']),
+            }
+            flags = []
+            for metric, (before, after) in checks.items():
+                if before and after / before > threshold:
+                    flags.append(f"{metric} {before:.2f} -> {after:.2f} (x{after / before:.2f})")
+            if flags:
+                regressions.append({'scale': scale, 'kpi': kpi_id, 'details': flags})
+                print(f"  ✗ [{scale}] {kpi_id}: {'; '.join(flags)}")
+    if not regressions:
+        print("  ✓ Aucune régression")
+    return regressions
+
+# ============================================================================
+# MODE PLANS (régressions de plans d'exécution)
+# ============================================================================
+
+DEFAULT_PLAN_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kpi_plan_baseline.json')
+# Écart de volumétrie (dw.fact_demandes) toléré avec la base de la baseline :
+# au-delà, les coûts estimés ne sont plus comparables
+PLAN_SCALE_TOLERANCE = 0.05
+
+def plan_signature(explain):
+    """
+    Empreinte d'un plan estimé (EXPLAIN FORMAT JSON) : coût total, lignes
+    estimées, nombre de nœuds par type et types de parcours par relation.
+    """
+    node_types = {}
+    relations = {}
+    stack = [explain['Plan']]
+    while stack:
+        node = stack.pop()
+        node_type = node.get('Node Type')
+        node_types[node_type] = node_types.get(node_type, 0) + 1
+        if node.get('Relation Name'):
+            relations.setdefault(node['Relation Name'], set()).add(node_type)
+        stack.extend(node.get('Plans', []))
+    top = explain['Plan']
+    return {
+        'total_cost': top.get('Total Cost'),
+        'plan_rows': top.get('Plan Rows'),
+        'node_types': dict(sorted(node_types.items())),
+        'relations': {name: sorted(types) for name, types in sorted(relations.items())},
+    }
+
+def collect_plans(name, dsn, kpi_ids=None):
+    """Signatures des plans estimés de tous les KPI (ou kpi_ids) sur une base"""
+    print_header(f"PLANS: {name}")
+    conn = _connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM dw.fact_demandes")
+            fact_rows = cursor.fetchone()[0]
+        print(f"  dw.fact_demandes: {fact_rows:,} lignes")
+
+        plans = {}
+        for kpi_id in kpi_ids or DASHBOARD_KPI_QUERIES:
+            try:
+                params = benchmark_params(conn, kpi_id)
+                signature = plan_signature(explain_kpi(conn, kpi_id, params, analyze=False))
+                signature['params'] = [None if p is None else str(p) for p in params]
+                plans[kpi_id] = signature
+                print(f"  ✓ {kpi_id:35} coût {signature['total_cost']:>12.2f}"
+                      f"  relations {', '.join(signature['relations']) or '-'}")
+            except Exception as e:
+                plans[kpi_id] = {'error': str(e)}
+                print(f"  ✗ {kpi_id:35} {str(e)[:80]}")
+        return {'fact_rows': fact_rows, 'kpis': plans}
+    finally:
+        forget_prepared(conn)
+        conn.close()
+
+def compare_plan_signatures(prev, cur, threshold=DEFAULT_THRESHOLD):
+    """Écarts d'un plan par rapport à la baseline (liste de messages, vide si conforme)"""
+    flags = []
+    before, after = prev['total_cost'], cur['total_cost']
+    if before and after / before > threshold:
+        flags.append(f"coût estimé {before:.2f} -> {after:.2f} (x{after / before:.2f})")
+    for relation, types in cur['relations'].items():
+        previous_types = prev['relations'].get(relation)
+        if previous_types is None:
+            flags.append(f"nouvelle relation lue: {relation} ({', '.join(types)})")
+        elif 'Seq Scan' in types and 'Seq Scan' not in previous_types:
+            flags.append(f"parcours séquentiel de {relation} (avant: {', '.join(previous_types)})")
+    loops_before = prev['node_types'].get('Nested Loop', 0)
+    loops_after = cur['node_types'].get('Nested Loop', 0)
+    if loops_after > loops_before:
+        flags.append(f"boucles imbriquées {loops_before} -> {loops_after}")
+    return flags
+
+def compare_plans(previous, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare les plans mesurés à la baseline (mêmes échelles).
+
+    Retourne la liste des régressions : écart de volumétrie, KPI en erreur,
+    coût estimé multiplié par plus de `threshold`, nouveau parcours
+    séquentiel, nouvelle relation lue ou boucles imbriquées supplémentaires.
+    """
+    regressions = []
+    print_header(f"COMPARAISON DES PLANS (seuil x{threshold})")
+    for scale, cur_scale in current['scales'].items():
+        prev_scale = previous.get('scales', {}).get(scale)
+        if not prev_scale:
+            regressions.append({'scale': scale, 'kpi': None, 'details': ["échelle absente de la baseline"]})
+            print(f"  ✗ {scale}: absente de la baseline")
+            continue
+        expected, measured = prev_scale['fact_rows'], cur_scale['fact_rows']
+        if expected and abs(measured - expected) / expected > PLAN_SCALE_TOLERANCE:
+            detail = (f"volumétrie différente de la baseline: {measured:,} lignes"
+                      f" au lieu de {expected:,} (coûts non comparables)")
+            regressions.append({'scale': scale, 'kpi': None, 'details': [detail]})
+            print(f"  ✗ [{scale}] {detail}")
+            continue
+        for kpi_id, cur in cur_scale['kpis'].items():
+            prev = prev_scale['kpis'].get(kpi_id)
+            if 'error' in cur:
+                flags = [f"erreur: {cur['error']}"]
+            elif not prev or 'error' in prev:
+                print(f"  ? [{scale}] {kpi_id}: absent de la baseline")
+                continue
+            else:
+                flags = compare_plan_signatures(prev, cur, threshold)
+            if flags:
+                regressions.append({'scale': scale, 'kpi': kpi_id, 'details': flags})
+                print(f"  ✗ [{scale}] {kpi_id}: {'; '.join(flags)}")
+    if not regressions:
+        print("  ✓ Aucune régression de plan")
+    return regressions
+
+def run_plan_check(args):
+    """Mode --plans : compare à la baseline, ou la réécrit avec --update-plan-baseline"""
+    scales = {}
+    for item in args.scale or []:
+        name, _, dsn = item.partition('=')
+        scales[name] = dsn
+    if not scales:
+        scales['defaut'] = DB_CONFIG
+
+    current = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'scales': {name: collect_plans(name, dsn, args.kpi) for name, dsn in scales.items()},
+    }
+
+    if args.update_plan_baseline:
+        errors = [kpi_id for scale in current['scales'].values()
+                  for kpi_id, plan in scale['kpis'].items() if 'error' in plan]
+        if errors:
+            print(f"\n✗ Baseline non écrite, KPI en erreur: {', '.join(errors)}")
+            return False
+        with open(args.plan_baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline des plans enregistrée: {args.plan_baseline}")
+        return True
+
+    if not os.path.exists(args.plan_baseline):
+        print(f"\n✗ Baseline des plans introuvable: {args.plan_baseline}")
+        print("  Créez-la sur la base de référence avec --plans --update-plan-baseline, puis versionnez-la.")
+        return False
+    with open(args.plan_baseline, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    return not compare_plans(previous, current, args.threshold)
+
+def run_benchmark(args):
+    scales = {}
+    for item in args.scale or []:
+        name, _, dsn = item.partition('=')
+        scales[name] = dsn
+    if not scales:
+        scales['defaut'] = DB_CONFIG
+
+    baseline = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'runs': args.runs,
+        'cold_runs': args.cold_runs,
+        'scales': {
+            name: benchmark_scale(name, dsn, args.runs, args.cold_runs, args.kpi)
+            for name, dsn in scales.items()
+        },
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+    print(f"\nBaseline enregistrée: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        return not compare_baselines(previous, baseline, args.threshold)
+    return True
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validation et benchmark des requêtes KPI")
+    parser.add_argument('--benchmark', action='store_true', help="Mesurer les KPI au lieu de les valider")
+    parser.add_argument('--plans', action='store_true',
+                        help="Comparer les plans estimés des KPI à la baseline des plans")
+    parser.add_argument('--plan-baseline', default=DEFAULT_PLAN_BASELINE,
+                        help="Baseline des plans (défaut: kpi_plan_baseline.json)")
+    parser.add_argument('--update-plan-baseline', action='store_true',
+                        help="Avec --plans : réécrire la baseline au lieu de comparer")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help="Exécutions chaudes par KPI")
+    parser.add_argument('--cold-runs', type=int, default=DEFAULT_COLD_RUNS,
+                        help="Exécutions froides (nouvelle session) par KPI")
+    parser.add_argument('--scale', action='append', metavar='NOM=DSN',
+                        help="Base à mesurer (répétable), ex. grand=\"dbname=togo_x100 port=5434\"")
+    parser.add_argument('--kpi', action='append', help="Limiter à ce KPI (répétable)")
+    parser.add_argument('--output', default='kpi_benchmark_baseline.json', help="Fichier JSON produit")
+    parser.add_argument('--compare', help="Baseline précédente à comparer")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Ratio de dégradation toléré (défaut: 1.25)")
+    return parser.parse_args(argv)
+
 def main():
     """Main validation function"""
     print("\n")
@@ -291,6 +709,10 @@ def main():
         print("\n✗ ERREUR: Certaines requêtes KPI ont échoué")
         all_ok = False
     
+    if not check_communes_coordonnees():
+        print("\n✗ ERREUR: Points communes de l'indicateur d'accessibilité incohérents")
+        all_ok = False
+    
     # Summary
     print_header("RÉSUMÉ FINAL")
     if all_ok:
@@ -304,5 +726,9 @@ def main():
         return False
 
 if __name__ == "__main__":
-    success = main()
+    args = parse_args()
+    if args.plans:
+        success = run_plan_check(args)
+    else:
+        success = run_benchmark(args) if args.benchmark else main()
     sys.exit(0 if success else 1)
@@ -3,13 +3,25 @@
 Dashboard pour visualiser et analyser la base de données PostgreSQL service_public_db
 """
 
+import json
+import sys
+from pathlib import Path
+
 import streamlit as st
-import psycopg2
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 
+# Modules partagés avec le dashboard KPI (pool de connexions, ...)
+sys.path.insert(0, str(Path(__file__).parent / "04_Dashboard"))
+from db_pool import ConnectionPool
+from kpi_queries import explain_kpi, run_kpi
+from query_monitor import DEFAULT_LOG_PATH, QueryMonitor
+from result_cache import ResultCache, fetch_load_version
+from table_browser import (BROWSABLE_TABLES, KEY_COLUMN, estimate_count, explain_page, fetch_page,
+                           filter_values, normalize_filters)
+
 # Configuration de la page
 st.set_page_config(
     page_title="Service Public Dashboard",
@@ -32,29 +44,157 @@ DB_CONFIG = {
 }
 
 @st.cache_resource
-def get_connection():
-    """Créer une connexion à PostgreSQL"""
+def get_pool():
+    """Pool de connexions PostgreSQL partagé entre les sessions"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return ConnectionPool(minconn=1, maxconn=5, checkout_timeout=10.0, **DB_CONFIG)
     except Exception as e:
         st.error(f"❌ Erreur de connexion: {str(e)}")
         st.info("💡 Assurez-vous que PostgreSQL Docker est en cours d'exécution")
         return None
 
-@st.cache_data
+@st.cache_resource
+def get_result_cache():
+    """Cache de résultats borné (128 Mo), invalidé à chaque chargement ETL"""
+    return ResultCache(
+        max_bytes=128 * 1024 * 1024,
+        version_fn=lambda: get_pool().run(fetch_load_version)
+    )
+
+@st.cache_resource
+def get_query_monitor():
+    """Mesures des requêtes, même journal que le dashboard KPI (page Performance)"""
+    return QueryMonitor(DEFAULT_LOG_PATH, source='app')
+
+def _read_sql(conn, query):
+    with conn.cursor() as cursor:
+        cursor.execute(query)
+        columns = [c.name for c in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+def _explain_sql(conn, query):
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+        plan = cursor.fetchone()[0]
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
 def load_data(query):
-    """Charger les données depuis PostgreSQL"""
+    """Charger les données depuis PostgreSQL (requête mesurée, cf. query_monitor)"""
     try:
-        conn = get_connection()
-        if conn:
-            df = pd.read_sql(query, conn)
-            return df
+        pool = get_pool()
+        if pool:
+            # Identifiant lisible sur la page Performance (requête sur une ligne, tronquée)
+            query_id = 'sql:' + ' '.join(query.split())[:80]
+            return get_query_monitor().execute(
+                query_id, (query,), lambda: pool.run(_read_sql, query),
+                cache=get_result_cache(), explain=lambda: pool.run(_explain_sql, query)
+            )
         return None
     except Exception as e:
         st.error(f"Erreur lors du chargement des données: {e}")
         return None
 
+def load_snapshot():
+    """Statistiques rapides de l'accueil en une seule requête (cf. kpi_queries.snapshot_accueil)"""
+    try:
+        pool = get_pool()
+        if pool:
+            df = get_query_monitor().execute(
+                'snapshot_accueil', (), lambda: pool.run(run_kpi, 'snapshot_accueil'),
+                cache=get_result_cache(), explain=lambda: pool.run(explain_kpi, 'snapshot_accueil')
+            )
+            return df.iloc[0].to_dict() if not df.empty else None
+        return None
+    except Exception as e:
+        st.warning(f"⚠️ Impossible de charger les statistiques: {e}")
+        return None
+
+def load_page(table, sort, descending, filters, cursor, page_size):
+    """Une page d'une table RAW, triée / filtrée côté serveur (cf. table_browser.fetch_page)"""
+    pool = get_pool()
+    if not pool:
+        return None
+    params = (sort, descending, filters, cursor, page_size)
+    return get_query_monitor().execute(
+        f'browse:{table}', params, lambda: pool.run(fetch_page, table, *params),
+        cache=get_result_cache(), explain=lambda: pool.run(explain_page, table, *params)
+    )
+
+def estimate_rows(table, filters=()):
+    """Nombre de lignes estimé (pg_class / planificateur), jamais de COUNT(*)"""
+    pool = get_pool()
+    if not pool:
+        return None
+    df = get_query_monitor().execute(
+        f'browse_count:{table}', (filters,),
+        lambda: pd.DataFrame({'lignes': [pool.run(estimate_count, table, filters)]}),
+        cache=get_result_cache()
+    )
+    return int(df['lignes'].iloc[0])
+
+def load_filter_values(table, column):
+    """Valeurs proposées pour un filtre (valeurs fréquentes de pg_stats)"""
+    pool = get_pool()
+    if not pool:
+        return []
+    df = get_query_monitor().execute(
+        f'browse_values:{table}.{column}', (),
+        lambda: pd.DataFrame({'valeur': pool.run(filter_values, table, column)}),
+        cache=get_result_cache()
+    )
+    return df['valeur'].tolist()
+
+def format_count(n):
+    return f"{n:,}".replace(',', ' ')
+
+def browse_table(table):
+    """
+    Tableau paginé d'une table RAW : tri, filtres et pages côté serveur.
+
+    Chaque page est une requête indexée de quelques lignes (pagination par
+    curseur) ; les curseurs des pages déjà vues sont gardés en session pour
+    revenir en arrière. Un changement de tri ou de filtre ramène en page 1.
+    """
+    spec = BROWSABLE_TABLES[table]
+    state_key = f"browse_{table}"
+
+    col_sort, col_order, col_size = st.columns(3)
+    sort = col_sort.selectbox("Trier par", spec['sortable'], key=f"{state_key}_sort",
+                              format_func=lambda c: "ordre de chargement" if c == KEY_COLUMN else c)
+    descending = col_order.radio("Ordre", ["Croissant", "Décroissant"], horizontal=True,
+                                 key=f"{state_key}_order") == "Décroissant"
+    page_size = col_size.selectbox("Lignes par page", [50, 100, 500], index=1, key=f"{state_key}_size")
+
+    filters = {}
+    for col, column in zip(st.columns(len(spec['filterable'])), spec['filterable']):
+        filters[column] = col.selectbox(column, ["Toutes"] + load_filter_values(table, column),
+                                        key=f"{state_key}_filter_{column}")
+    filters = normalize_filters(table, filters)
+
+    view = (sort, descending, filters, page_size)
+    state = st.session_state.get(state_key)
+    if state is None or state['view'] != view:
+        state = st.session_state[state_key] = {'view': view, 'cursors': [None]}
+
+    df = load_page(table, sort, descending, filters, state['cursors'][-1], page_size)
+    if df is None:
+        return None
+    next_cursor = df.attrs.get('next_cursor')
+    page = len(state['cursors'])
+    matching = estimate_rows(table, filters) if filters else None
+    caption = f"Page {page}"
+    if matching is not None:
+        caption += f" · ≈ {format_count(matching)} lignes pour ces filtres (estimation)"
+    st.caption(caption)
+    st.dataframe(df.drop(columns=[KEY_COLUMN], errors='ignore'), use_container_width=True)
+
+    col_prev, col_next = st.columns(2)
+    col_prev.button("◀ Page précédente", key=f"{state_key}_prev", disabled=page == 1,
+                    on_click=state['cursors'].pop)
+    col_next.button("Page suivante ▶", key=f"{state_key}_next", disabled=next_cursor is None,
+                    on_click=state['cursors'].append, args=(next_cursor,))
+    return df
+
 # Sidebar - Navigation
 with st.sidebar:
     st.title("🎯 Navigation")
@@ -90,58 +230,35 @@ if page == "📈 Accueil":
     
     col1, col2, col3, col4 = st.columns(4)
     
-    try:
-        conn = get_connection()
-        if conn:
-            cursor = conn.cursor()
-            
-            # Nombre de centres
-            cursor.execute("SELECT COUNT(*) FROM centres_service")
-            nb_centres = cursor.fetchone()[0]
-            col1.metric("🏢 Centres", nb_centres)
-            
-            # Nombre de demandes
-            cursor.execute("SELECT COUNT(*) FROM demandes_services_public")
-            nb_demandes = cursor.fetchone()[0]
-            col2.metric("📋 Demandes", nb_demandes)
-            
-            # Communes
-            cursor.execute("SELECT COUNT(*) FROM communes")
-            nb_communes = cursor.fetchone()[0]
-            col3.metric("🏘️ Communes", nb_communes)
-            
-            # Régions
-            cursor.execute("SELECT COUNT(DISTINCT region) FROM communes")
-            nb_regions = cursor.fetchone()[0]
-            col4.metric("🗺️ Régions", nb_regions)
-            
-            conn.close()
-    except Exception as e:
-        st.warning(f"⚠️ Impossible de charger les statistiques: {e}")
+    snapshot = load_snapshot()
+    if snapshot:
+        col1.metric("🏢 Centres", snapshot['nb_centres'])
+        col2.metric("📋 Demandes", snapshot['total_demandes'])
+        col3.metric("🏘️ Communes", snapshot['nb_communes'])
+        col4.metric("🗺️ Régions", snapshot['nb_regions'])
 
 # PAGE 2: Centres de Service
 elif page == "🏢 Centres Service":
     st.header("🏢 Centres de Services Publics")
     
     try:
-        # Charger les données
-        df_centres = load_data("SELECT * FROM centres_service LIMIT 100")
+        total = estimate_rows('centres_service')
         
-        if df_centres is not None and len(df_centres) > 0:
-            st.subheader(f"📊 Total: {len(df_centres)} centres")
+        if total:
+            st.subheader(f"📊 Total: ≈ {format_count(total)} centres")
             
             # Onglets
             tab1, tab2, tab3 = st.tabs(["Tableau", "Statistiques", "Carte"])
             
             with tab1:
-                st.dataframe(df_centres, use_container_width=True)
+                browse_table('centres_service')
             
             with tab2:
                 col1, col2 = st.columns(2)
                 with col1:
                     st.subheader("Centres par Région")
                     try:
-                        query = "SELECT region, COUNT(*) as count FROM centres_service GROUP BY region"
+                        query = "SELECT region, COUNT(*) as count FROM raw.centres_service GROUP BY region"
                         df_region = load_data(query)
                         if df_region is not None:
                             fig = px.bar(df_region, x='region', y='count', title="Répartition par Région")
@@ -152,7 +269,7 @@ elif page == "🏢 Centres Service":
                 with col2:
                     st.subheader("Statut des Centres")
                     try:
-                        query = "SELECT statut_centre, COUNT(*) as count FROM centres_service GROUP BY statut_centre"
+                        query = "SELECT statut_centre, COUNT(*) as count FROM raw.centres_service GROUP BY statut_centre"
                         df_status = load_data(query)
                         if df_status is not None:
                             fig = px.pie(df_status, values='count', names='statut_centre', title="Statut")
@@ -172,11 +289,11 @@ elif page == "📋 Demandes":
     st.header("📋 Demandes de Services")
     
     try:
-        df_demandes = load_data("SELECT * FROM demandes_services_public LIMIT 100")
+        total = estimate_rows('demandes_services_public')
         
-        if df_demandes is not None and len(df_demandes) > 0:
-            st.subheader(f"📊 Total: {len(df_demandes)} demandes")
-            st.dataframe(df_demandes, use_container_width=True)
+        if total:
+            st.subheader(f"📊 Total: ≈ {format_count(total)} demandes")
+            browse_table('demandes_services_public')
         else:
             st.warning("❌ Aucune donnée disponible.")
     except Exception as e:
@@ -187,11 +304,11 @@ elif page == "👥 Données Socio-éco":
     st.header("👥 Données Socio-économiques")
     
     try:
-        df_socio = load_data("SELECT * FROM donnees_socioeconomiques LIMIT 100")
+        total = estimate_rows('donnees_socioeconomiques')
         
-        if df_socio is not None and len(df_socio) > 0:
-            st.subheader(f"📊 Total: {len(df_socio)} enregistrements")
-            st.dataframe(df_socio, use_container_width=True)
+        if total:
+            st.subheader(f"📊 Total: ≈ {format_count(total)} enregistrements")
+            browse_table('donnees_socioeconomiques')
         else:
             st.warning("❌ Aucune donnée disponible.")
     except Exception as e:
@@ -202,11 +319,11 @@ elif page == "🗺️ Territoires":
     st.header("🗺️ Territoires (Régions & Communes)")
     
     try:
-        df_communes = load_data("SELECT * FROM communes LIMIT 100")
+        total = estimate_rows('communes')
         
-        if df_communes is not None and len(df_communes) > 0:
-            st.subheader(f"📊 Total: {len(df_communes)} communes")
-            st.dataframe(df_communes, use_container_width=True)
+        if total:
+            st.subheader(f"📊 Total: ≈ {format_count(total)} communes")
+            browse_table('communes')
         else:
             st.warning("❌ Aucune donnée disponible.")
     except Exception as e:
@@ -226,14 +343,14 @@ User:     {DB_CONFIG['user']}
     
     if st.button("🔍 Tester la connexion"):
         try:
-            conn = get_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT version();")
-                version = cursor.fetchone()[0]
+            pool = get_pool()
+            if pool:
+                with pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT version();")
+                    version = cursor.fetchone()[0]
                 st.success("✅ Connexion réussie!")
                 st.info(f"PostgreSQL: {version[:50]}...")
-                conn.close()
             else:
                 st.error("❌ Connexion échouée")
         except Exception as e:
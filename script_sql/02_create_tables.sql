@@ -34,9 +34,13 @@ CREATE INDEX idx_dim_territoire_commune ON dw.dim_territoire(commune);
 -- ========================================
 -- TABLES RAW (chargement des CSV bruts)
 -- ========================================
+-- row_id : clé de pagination par curseur des pages de app.py
+-- (cf. 04_Dashboard/table_browser.py) ; son index unique et les index de tri
+-- sont créés après le chargement par 11_raw_browse_keys.sql (COPY sans index)
 
 -- RAW: Communes
 CREATE TABLE raw.communes (
+    row_id BIGINT GENERATED ALWAYS AS IDENTITY,
     commune_id VARCHAR(50),
     commune VARCHAR(100),
     prefecture VARCHAR(100),
@@ -55,6 +59,7 @@ CREATE TABLE raw.communes (
 
 -- RAW: Centres de Service
 CREATE TABLE raw.centres_service (
+    row_id BIGINT GENERATED ALWAYS AS IDENTITY,
     centre_id VARCHAR(50),
     nom_centre VARCHAR(200),
     type_centre VARCHAR(100),
@@ -78,6 +83,7 @@ CREATE TABLE raw.centres_service (
 
 -- RAW: Demandes de Services Publics
 CREATE TABLE raw.demandes_services_public (
+    row_id BIGINT GENERATED ALWAYS AS IDENTITY,
     demande_id VARCHAR(50),
     region VARCHAR(100),
     prefecture VARCHAR(100),
@@ -102,6 +108,7 @@ CREATE TABLE raw.demandes_services_public (
 
 -- RAW: Données Socio-économiques
 CREATE TABLE raw.donnees_socioeconomiques (
+    row_id BIGINT GENERATED ALWAYS AS IDENTITY,
     region VARCHAR(100),
     prefecture VARCHAR(100),
     commune VARCHAR(100),
@@ -116,6 +123,25 @@ CREATE TABLE raw.donnees_socioeconomiques (
     loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- RAW: Journaux d'activité des centres
+CREATE TABLE raw.logs_activite (
+    log_id VARCHAR(50),
+    centre_id VARCHAR(50),
+    date_operation DATE,
+    type_operation VARCHAR(50),
+    type_document VARCHAR(100),
+    nombre_traite INT,
+    delai_effectif INT,
+    nombre_rejete INT,
+    raison_rejet VARCHAR(100),
+    personnel_present INT,
+    temps_attente_moyen_minutes INT,
+    incident_technique VARCHAR(10),
+    heure_debut VARCHAR(10),
+    heure_fin VARCHAR(10),
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 \echo 'Tables RAW créées';
 
 -- ========================================
@@ -197,6 +223,25 @@ CREATE TABLE dw.fact_demandes (
     FOREIGN KEY (id_type_document) REFERENCES dw.dim_type_document(id_type_document)
 );
 
+-- DW: Table de Faits - Activité des centres (grain: centre x journal d'activité)
+CREATE TABLE dw.fact_activite_centre (
+    id_activite SERIAL PRIMARY KEY,
+    id_centre INT NOT NULL,
+    log_code VARCHAR(50) NOT NULL,
+    date_operation DATE NOT NULL,
+    type_operation VARCHAR(50),
+    type_document VARCHAR(100),
+    nombre_traite INT NOT NULL DEFAULT 0,
+    delai_effectif INT,
+    nombre_rejete INT NOT NULL DEFAULT 0,
+    raison_rejet VARCHAR(100),
+    personnel_present INT,
+    temps_attente_moyen_minutes INT,
+    incident_technique BOOLEAN,
+    CONSTRAINT uq_fact_activite_log UNIQUE (log_code),
+    FOREIGN KEY (id_centre) REFERENCES dw.dim_centres_service(id_centre)
+);
+
 \echo 'Tables DW créées';
 
 -- ========================================
@@ -207,9 +252,35 @@ CREATE INDEX idx_fact_demandes_date ON dw.fact_demandes(date_demande);
 CREATE INDEX idx_fact_demandes_type ON dw.fact_demandes(id_type_document);
 CREATE INDEX idx_dim_centres_territoire ON dw.dim_centres_service(id_territoire);
 CREATE INDEX idx_dim_communes_territoire ON dw.dim_communes(id_territoire);
+CREATE INDEX idx_fact_demandes_code ON dw.fact_demandes(demande_code);
+-- Activité : accès par centre et période (KPI-006 / KPI-008)
+CREATE INDEX idx_fact_activite_centre_date ON dw.fact_activite_centre(id_centre, date_operation);
+CREATE INDEX idx_fact_activite_date ON dw.fact_activite_centre(date_operation);
 
 \echo 'Index créés pour les performances';
 
+-- ========================================
+-- SUIVI ETL: HIGH-WATER MARK PAR TABLE
+-- ========================================
+CREATE TABLE dw.etl_watermark (
+    table_name VARCHAR(100) PRIMARY KEY,
+    last_date_demande DATE,
+    last_demande_code VARCHAR(50),
+    lookback_jours INT NOT NULL DEFAULT 7,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Version de chargement lue par les dashboards (cache de résultats) :
+-- mise à jour par load_clean_data_full.py à la fin de chaque chargement.
+-- Valeur horodatée (ms) pour rester croissante même après un DROP SCHEMA.
+CREATE TABLE dw.etl_load_version (
+    id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+\echo 'Table de suivi ETL créée';
+
 -- ========================================
 -- CONFIRMATION
 -- ========================================
@@ -161,6 +161,60 @@ WHERE d.demande_id IS NOT NULL;
 
 \echo '✅ Table de Faits DEMANDES remplie';
 
+-- ========================================
+-- ÉTAPE 7: Remplir la Table de Faits Activité des Centres
+-- ========================================
+-- Rattachement par code centre (pas par territoire) : une ligne par journal.
+-- Le nettoyage remplace les valeurs manquantes par 'Non_Renseigné' / 'nan'.
+
+INSERT INTO dw.fact_activite_centre (
+    id_centre,
+    log_code,
+    date_operation,
+    type_operation,
+    type_document,
+    nombre_traite,
+    delai_effectif,
+    nombre_rejete,
+    raison_rejet,
+    personnel_present,
+    temps_attente_moyen_minutes,
+    incident_technique
+)
+SELECT DISTINCT ON (l.log_id)
+    cs.id_centre,
+    l.log_id,
+    l.date_operation,
+    l.type_operation,
+    NULLIF(l.type_document, 'Non_Renseigné'),
+    COALESCE(l.nombre_traite, 0),
+    l.delai_effectif,
+    COALESCE(l.nombre_rejete, 0),
+    NULLIF(l.raison_rejet, 'nan'),
+    l.personnel_present,
+    l.temps_attente_moyen_minutes,
+    l.incident_technique = 'Oui'
+FROM raw.logs_activite l
+JOIN dw.dim_centres_service cs ON cs.centre_code = l.centre_id
+WHERE l.log_id IS NOT NULL AND l.date_operation IS NOT NULL
+ORDER BY l.log_id, cs.id_centre;
+
+\echo '✅ Table de Faits ACTIVITE_CENTRE remplie';
+
+-- Initialiser le high-water mark pour les synchronisations incrémentales
+INSERT INTO dw.etl_watermark (table_name, last_date_demande, last_demande_code, updated_at)
+SELECT 'fact_demandes', date_demande, demande_code, CURRENT_TIMESTAMP
+FROM dw.fact_demandes
+WHERE date_demande IS NOT NULL
+ORDER BY date_demande DESC, demande_code DESC
+LIMIT 1
+ON CONFLICT (table_name) DO UPDATE
+SET last_date_demande = EXCLUDED.last_date_demande,
+    last_demande_code = EXCLUDED.last_demande_code,
+    updated_at = EXCLUDED.updated_at;
+
+\echo '✅ High-water mark initialisé';
+
 -- ========================================
 -- AFFICHER LES STATISTIQUES
 -- ========================================
@@ -178,6 +232,8 @@ SELECT 'Centres Service', COUNT(*) FROM dw.dim_centres_service
 UNION ALL
 SELECT 'Socioeconomique', COUNT(*) FROM dw.dim_socioeconomique
 UNION ALL
-SELECT 'Faits Demandes', COUNT(*) FROM dw.fact_demandes;
+SELECT 'Faits Demandes', COUNT(*) FROM dw.fact_demandes
+UNION ALL
+SELECT 'Faits Activité Centre', COUNT(*) FROM dw.fact_activite_centre;
 
 \echo '✅ Transformation DATA WAREHOUSE terminée!';
\ No newline at end of file
@@ -26,6 +26,16 @@ TRUNCATE TABLE raw.donnees_socioeconomiques CASCADE;
 
 \echo '✅ Tables RAW vidées';
 
+-- ========================================
+-- PROCÉDURE 1b: Purge / rétention par mois (table de faits partitionnée)
+-- ========================================
+-- Avec 10_partition_fact_demandes.sql, un mois se vide ou s'archive sans
+-- toucher aux autres (cf. partitions.py --truncate / --detach / --retention) :
+--   TRUNCATE TABLE dw.fact_demandes_y2023m01;
+--   ALTER TABLE dw.fact_demandes DETACH PARTITION dw.fact_demandes_y2023m01;
+--   ALTER TABLE dw.fact_demandes ATTACH PARTITION dw.fact_demandes_y2023m01
+--       FOR VALUES FROM ('2023-01-01') TO ('2023-02-01');
+
 -- ========================================
 -- PROCÉDURE 2: Vérifier l'intégrité
 -- ========================================
@@ -124,6 +134,20 @@ VACUUM ANALYZE dw.fact_demandes;
 
 \echo '✅ Analyse terminée';
 
+-- ========================================
+-- PROCÉDURE 5b: Rafraîchir les agrégats KPI
+-- ========================================
+
+\echo '';
+\echo '🔄 Rafraîchissement des agrégats KPI (sans bloquer le dashboard)...';
+
+REFRESH MATERIALIZED VIEW CONCURRENTLY dw.mv_kpi_demandes_mensuel;
+VACUUM ANALYZE dw.mv_kpi_demandes_mensuel;
+REFRESH MATERIALIZED VIEW CONCURRENTLY dw.mv_territoire_capacite;
+VACUUM ANALYZE dw.mv_territoire_capacite;
+
+\echo '✅ Agrégats KPI rafraîchis';
+
 -- ========================================
 -- PROCÉDURE 6: Rapport final
 -- ========================================
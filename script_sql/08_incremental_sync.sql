@@ -0,0 +1,384 @@
+-- Script 8: Synchronisation incrémentale RAW → DW (high-water mark)
+-- =====================================================
+-- Alternative à DROP SCHEMA + 04_transform_to_dw.sql : seules les lignes
+-- nouvelles ou modifiées sont insérées/mises à jour. Le script est exécuté
+-- dans une seule transaction par load_clean_data_full.py --mode incremental,
+-- le DW reste donc lisible (et cohérent) pendant toute la synchronisation.
+\c service_public_db;
+
+\echo '🔄 Synchronisation incrémentale RAW → DW...';
+
+-- ========================================
+-- PRÉREQUIS (idempotents)
+-- ========================================
+CREATE TABLE IF NOT EXISTS dw.etl_watermark (
+    table_name VARCHAR(100) PRIMARY KEY,
+    last_date_demande DATE,
+    last_demande_code VARCHAR(50),
+    lookback_jours INT NOT NULL DEFAULT 7,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_fact_demandes_code ON dw.fact_demandes(demande_code);
+CREATE INDEX IF NOT EXISTS idx_dim_centres_code ON dw.dim_centres_service(centre_code);
+CREATE INDEX IF NOT EXISTS idx_dim_communes_code ON dw.dim_communes(commune_code);
+
+-- ========================================
+-- ÉTAPE 1: Dimension TERRITOIRE (nouveaux territoires uniquement)
+-- ========================================
+INSERT INTO dw.dim_territoire (region, prefecture, commune, quartier, latitude, longitude, code_postal)
+SELECT DISTINCT ON (src.region, src.prefecture, src.commune, COALESCE(src.quartier, ''))
+    src.region, src.prefecture, src.commune, src.quartier, src.latitude, src.longitude, src.code_postal
+FROM (
+    SELECT region, prefecture, commune, quartier, latitude, longitude, NULL::VARCHAR AS code_postal FROM raw.centres_service
+    UNION
+    SELECT region, prefecture, commune, quartier, NULL::DECIMAL, NULL::DECIMAL, NULL::VARCHAR FROM raw.demandes_services_public
+    UNION
+    SELECT region, prefecture, commune, NULL::VARCHAR, latitude, longitude, code_postal FROM raw.communes
+    UNION
+    SELECT region, prefecture, commune, NULL::VARCHAR, NULL::DECIMAL, NULL::DECIMAL, NULL::VARCHAR FROM raw.donnees_socioeconomiques
+) src
+WHERE src.region IS NOT NULL AND src.prefecture IS NOT NULL AND src.commune IS NOT NULL
+  AND NOT EXISTS (
+      SELECT 1 FROM dw.dim_territoire t
+      WHERE t.region = src.region
+        AND t.prefecture = src.prefecture
+        AND t.commune = src.commune
+        AND COALESCE(t.quartier, '') = COALESCE(src.quartier, '')
+  )
+ORDER BY src.region, src.prefecture, src.commune, COALESCE(src.quartier, ''), src.latitude NULLS LAST;
+
+\echo '✅ Dimension TERRITOIRE synchronisée';
+
+-- ========================================
+-- ÉTAPE 2: Dimension TYPE DOCUMENT
+-- ========================================
+INSERT INTO dw.dim_type_document (type_document, categorie_document)
+SELECT DISTINCT d.type_document, d.categorie_document
+FROM raw.demandes_services_public d
+WHERE d.type_document IS NOT NULL
+  AND NOT EXISTS (
+      SELECT 1 FROM dw.dim_type_document td
+      WHERE td.type_document = d.type_document
+        AND COALESCE(td.categorie_document, '') = COALESCE(d.categorie_document, '')
+  );
+
+\echo '✅ Dimension TYPE_DOCUMENT synchronisée';
+
+-- ========================================
+-- ÉTAPE 3: Dimension COMMUNES (upsert sur commune_code)
+-- ========================================
+UPDATE dw.dim_communes dc
+SET id_territoire = s.id_territoire,
+    type_commune = s.type_commune,
+    altitude_m = s.altitude_m,
+    superficie_km2 = s.superficie_km2,
+    population_densite = s.population_densite,
+    distance_capitale_km = s.distance_capitale_km,
+    zone_climatique = s.zone_climatique
+FROM (
+    SELECT DISTINCT ON (c.commune_id)
+        c.commune_id, t.id_territoire, c.type_commune, c.altitude_m, c.superficie_km2,
+        c.population_densite, c.distance_capitale_km, c.zone_climatique
+    FROM raw.communes c
+    JOIN dw.dim_territoire t ON c.region = t.region
+                             AND c.prefecture = t.prefecture
+                             AND c.commune = t.commune
+    WHERE c.commune_id IS NOT NULL
+    ORDER BY c.commune_id, t.id_territoire
+) s
+WHERE dc.commune_code = s.commune_id
+  AND (dc.id_territoire, dc.type_commune, dc.altitude_m, dc.superficie_km2,
+       dc.population_densite, dc.distance_capitale_km, dc.zone_climatique)
+      IS DISTINCT FROM
+      (s.id_territoire, s.type_commune, s.altitude_m, s.superficie_km2,
+       s.population_densite, s.distance_capitale_km, s.zone_climatique);
+
+INSERT INTO dw.dim_communes (id_territoire, commune_code, type_commune, altitude_m, superficie_km2, population_densite, distance_capitale_km, zone_climatique)
+SELECT DISTINCT ON (c.commune_id)
+    t.id_territoire, c.commune_id, c.type_commune, c.altitude_m, c.superficie_km2,
+    c.population_densite, c.distance_capitale_km, c.zone_climatique
+FROM raw.communes c
+JOIN dw.dim_territoire t ON c.region = t.region
+                         AND c.prefecture = t.prefecture
+                         AND c.commune = t.commune
+WHERE c.commune_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM dw.dim_communes dc WHERE dc.commune_code = c.commune_id)
+ORDER BY c.commune_id, t.id_territoire;
+
+\echo '✅ Dimension COMMUNES synchronisée';
+
+-- ========================================
+-- ÉTAPE 4: Dimension CENTRES DE SERVICE (upsert sur centre_code)
+-- ========================================
+UPDATE dw.dim_centres_service cs
+SET id_territoire = s.id_territoire,
+    nom_centre = s.nom_centre,
+    type_centre = s.type_centre,
+    personnel_capacite_jour = s.personnel_capacite_jour,
+    nombre_guichets = s.nombre_guichets,
+    heures_ouverture = s.heures_ouverture,
+    horaire_nuit = s.horaire_nuit,
+    equipement_numerique = s.equipement_numerique,
+    date_ouverture = s.date_ouverture,
+    statut_centre = s.statut_centre
+FROM (
+    SELECT DISTINCT ON (c.centre_id)
+        c.centre_id, t.id_territoire, c.nom_centre, c.type_centre, c.personnel_capacite_jour,
+        c.nombre_guichets, c.heures_ouverture, c.horaire_nuit, c.equipement_numerique,
+        c.date_ouverture, c.statut_centre
+    FROM raw.centres_service c
+    JOIN dw.dim_territoire t ON c.region = t.region
+                             AND c.prefecture = t.prefecture
+                             AND c.commune = t.commune
+                             AND COALESCE(c.quartier, '') = COALESCE(t.quartier, '')
+    WHERE c.centre_id IS NOT NULL
+    ORDER BY c.centre_id, t.id_territoire
+) s
+WHERE cs.centre_code = s.centre_id
+  AND (cs.id_territoire, cs.nom_centre, cs.type_centre, cs.personnel_capacite_jour,
+       cs.nombre_guichets, cs.heures_ouverture, cs.horaire_nuit, cs.equipement_numerique,
+       cs.date_ouverture, cs.statut_centre)
+      IS DISTINCT FROM
+      (s.id_territoire, s.nom_centre, s.type_centre, s.personnel_capacite_jour,
+       s.nombre_guichets, s.heures_ouverture, s.horaire_nuit, s.equipement_numerique,
+       s.date_ouverture, s.statut_centre);
+
+INSERT INTO dw.dim_centres_service (centre_code, id_territoire, nom_centre, type_centre, personnel_capacite_jour, nombre_guichets, heures_ouverture, horaire_nuit, equipement_numerique, date_ouverture, statut_centre)
+SELECT DISTINCT ON (c.centre_id)
+    c.centre_id, t.id_territoire, c.nom_centre, c.type_centre, c.personnel_capacite_jour,
+    c.nombre_guichets, c.heures_ouverture, c.horaire_nuit, c.equipement_numerique,
+    c.date_ouverture, c.statut_centre
+FROM raw.centres_service c
+JOIN dw.dim_territoire t ON c.region = t.region
+                         AND c.prefecture = t.prefecture
+                         AND c.commune = t.commune
+                         AND COALESCE(c.quartier, '') = COALESCE(t.quartier, '')
+WHERE c.centre_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM dw.dim_centres_service cs WHERE cs.centre_code = c.centre_id)
+ORDER BY c.centre_id, t.id_territoire;
+
+\echo '✅ Dimension CENTRES_SERVICE synchronisée';
+
+-- ========================================
+-- ÉTAPE 5: Dimension SOCIO-ÉCONOMIQUE (upsert sur id_territoire)
+-- ========================================
+UPDATE dw.dim_socioeconomique ds
+SET population = s.population,
+    densite = s.densite,
+    taux_urbanisation = s.taux_urbanisation,
+    taux_alphabetisation = s.taux_alphabetisation,
+    age_median = s.age_median,
+    nombre_menages = s.nombre_menages,
+    revenu_moyen_fcfa = s.revenu_moyen_fcfa
+FROM (
+    SELECT DISTINCT ON (t.id_territoire)
+        t.id_territoire, r.population, r.densite, r.taux_urbanisation, r.taux_alphabetisation,
+        r.age_median, r.nombre_menages, r.revenu_moyen_fcfa
+    FROM raw.donnees_socioeconomiques r
+    JOIN dw.dim_territoire t ON r.region = t.region
+                             AND r.prefecture = t.prefecture
+                             AND r.commune = t.commune
+    WHERE r.commune IS NOT NULL
+    ORDER BY t.id_territoire
+) s
+WHERE ds.id_territoire = s.id_territoire
+  AND (ds.population, ds.densite, ds.taux_urbanisation, ds.taux_alphabetisation,
+       ds.age_median, ds.nombre_menages, ds.revenu_moyen_fcfa)
+      IS DISTINCT FROM
+      (s.population, s.densite, s.taux_urbanisation, s.taux_alphabetisation,
+       s.age_median, s.nombre_menages, s.revenu_moyen_fcfa);
+
+INSERT INTO dw.dim_socioeconomique (id_territoire, population, densite, taux_urbanisation, taux_alphabetisation, age_median, nombre_menages, revenu_moyen_fcfa)
+SELECT DISTINCT ON (t.id_territoire)
+    t.id_territoire, r.population, r.densite, r.taux_urbanisation, r.taux_alphabetisation,
+    r.age_median, r.nombre_menages, r.revenu_moyen_fcfa
+FROM raw.donnees_socioeconomiques r
+JOIN dw.dim_territoire t ON r.region = t.region
+                         AND r.prefecture = t.prefecture
+                         AND r.commune = t.commune
+WHERE r.commune IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM dw.dim_socioeconomique ds WHERE ds.id_territoire = t.id_territoire)
+ORDER BY t.id_territoire;
+
+\echo '✅ Dimension SOCIOECONOMIQUE synchronisée';
+
+-- ========================================
+-- ÉTAPE 6: Faits DEMANDES au-delà du high-water mark
+-- ========================================
+-- Candidats: lignes après (last_date_demande, last_demande_code), plus une
+-- fenêtre de lookback_jours pour capter les mises à jour tardives de statut.
+CREATE TEMP TABLE tmp_demandes_sync ON COMMIT DROP AS
+SELECT
+    t.id_territoire,
+    td.id_type_document,
+    d.demande_id AS demande_code,
+    d.nombre_demandes,
+    d.delai_traitement_jours,
+    d.taux_rejet,
+    d.date_demande,
+    d.motif_demande,
+    d.statut_demande,
+    d.canal_demande,
+    d.age_demandeur,
+    d.sexe_demandeur,
+    d.annee_demande,
+    d.mois_demande,
+    d.jour_semaine_demande
+FROM raw.demandes_services_public d
+JOIN dw.dim_territoire t ON d.region = t.region
+                         AND d.prefecture = t.prefecture
+                         AND d.commune = t.commune
+                         AND COALESCE(d.quartier, '') = COALESCE(t.quartier, '')
+JOIN dw.dim_type_document td ON d.type_document = td.type_document
+                             AND COALESCE(d.categorie_document, '') = COALESCE(td.categorie_document, '')
+LEFT JOIN dw.etl_watermark wm ON wm.table_name = 'fact_demandes'
+WHERE d.demande_id IS NOT NULL
+  AND (
+      wm.last_date_demande IS NULL
+      OR (d.date_demande, d.demande_id) > (wm.last_date_demande, wm.last_demande_code)
+      OR d.date_demande >= wm.last_date_demande - wm.lookback_jours
+  );
+
+CREATE INDEX ON tmp_demandes_sync (demande_code);
+ANALYZE tmp_demandes_sync;
+
+UPDATE dw.fact_demandes f
+SET id_territoire = s.id_territoire,
+    id_type_document = s.id_type_document,
+    nombre_demandes = s.nombre_demandes,
+    delai_traitement_jours = s.delai_traitement_jours,
+    taux_rejet = s.taux_rejet,
+    date_demande = s.date_demande,
+    motif_demande = s.motif_demande,
+    statut_demande = s.statut_demande,
+    canal_demande = s.canal_demande,
+    age_demandeur = s.age_demandeur,
+    sexe_demandeur = s.sexe_demandeur,
+    annee_demande = s.annee_demande,
+    mois_demande = s.mois_demande,
+    jour_semaine_demande = s.jour_semaine_demande
+FROM tmp_demandes_sync s
+WHERE f.demande_code = s.demande_code
+  AND (f.id_territoire, f.id_type_document, f.nombre_demandes, f.delai_traitement_jours,
+       f.taux_rejet, f.date_demande, f.motif_demande, f.statut_demande, f.canal_demande,
+       f.age_demandeur, f.sexe_demandeur)
+      IS DISTINCT FROM
+      (s.id_territoire, s.id_type_document, s.nombre_demandes, s.delai_traitement_jours,
+       s.taux_rejet, s.date_demande, s.motif_demande, s.statut_demande, s.canal_demande,
+       s.age_demandeur, s.sexe_demandeur);
+
+INSERT INTO dw.fact_demandes (
+    id_territoire,
+    id_type_document,
+    demande_code,
+    nombre_demandes,
+    delai_traitement_jours,
+    taux_rejet,
+    date_demande,
+    motif_demande,
+    statut_demande,
+    canal_demande,
+    age_demandeur,
+    sexe_demandeur,
+    annee_demande,
+    mois_demande,
+    jour_semaine_demande
+)
+SELECT
+    s.id_territoire,
+    s.id_type_document,
+    s.demande_code,
+    s.nombre_demandes,
+    s.delai_traitement_jours,
+    s.taux_rejet,
+    s.date_demande,
+    s.motif_demande,
+    s.statut_demande,
+    s.canal_demande,
+    s.age_demandeur,
+    s.sexe_demandeur,
+    s.annee_demande,
+    s.mois_demande,
+    s.jour_semaine_demande
+FROM tmp_demandes_sync s
+WHERE NOT EXISTS (SELECT 1 FROM dw.fact_demandes f WHERE f.demande_code = s.demande_code);
+
+\echo '✅ Table de Faits DEMANDES synchronisée';
+
+-- ========================================
+-- ÉTAPE 6b: Faits ACTIVITÉ DES CENTRES (upsert sur log_code)
+-- ========================================
+-- Volume faible (un journal par centre et par opération) : tout le RAW est
+-- rapproché, seules les lignes nouvelles ou modifiées sont écrites.
+INSERT INTO dw.fact_activite_centre (
+    id_centre,
+    log_code,
+    date_operation,
+    type_operation,
+    type_document,
+    nombre_traite,
+    delai_effectif,
+    nombre_rejete,
+    raison_rejet,
+    personnel_present,
+    temps_attente_moyen_minutes,
+    incident_technique
+)
+SELECT DISTINCT ON (l.log_id)
+    cs.id_centre,
+    l.log_id,
+    l.date_operation,
+    l.type_operation,
+    NULLIF(l.type_document, 'Non_Renseigné'),
+    COALESCE(l.nombre_traite, 0),
+    l.delai_effectif,
+    COALESCE(l.nombre_rejete, 0),
+    NULLIF(l.raison_rejet, 'nan'),
+    l.personnel_present,
+    l.temps_attente_moyen_minutes,
+    l.incident_technique = 'Oui'
+FROM raw.logs_activite l
+JOIN dw.dim_centres_service cs ON cs.centre_code = l.centre_id
+WHERE l.log_id IS NOT NULL AND l.date_operation IS NOT NULL
+ORDER BY l.log_id, cs.id_centre
+ON CONFLICT (log_code) DO UPDATE
+SET id_centre = EXCLUDED.id_centre,
+    date_operation = EXCLUDED.date_operation,
+    type_operation = EXCLUDED.type_operation,
+    type_document = EXCLUDED.type_document,
+    nombre_traite = EXCLUDED.nombre_traite,
+    delai_effectif = EXCLUDED.delai_effectif,
+    nombre_rejete = EXCLUDED.nombre_rejete,
+    raison_rejet = EXCLUDED.raison_rejet,
+    personnel_present = EXCLUDED.personnel_present,
+    temps_attente_moyen_minutes = EXCLUDED.temps_attente_moyen_minutes,
+    incident_technique = EXCLUDED.incident_technique
+WHERE (dw.fact_activite_centre.id_centre, dw.fact_activite_centre.date_operation,
+       dw.fact_activite_centre.type_operation, dw.fact_activite_centre.type_document,
+       dw.fact_activite_centre.nombre_traite, dw.fact_activite_centre.delai_effectif,
+       dw.fact_activite_centre.nombre_rejete, dw.fact_activite_centre.raison_rejet,
+       dw.fact_activite_centre.personnel_present, dw.fact_activite_centre.temps_attente_moyen_minutes,
+       dw.fact_activite_centre.incident_technique)
+      IS DISTINCT FROM
+      (EXCLUDED.id_centre, EXCLUDED.date_operation, EXCLUDED.type_operation, EXCLUDED.type_document,
+       EXCLUDED.nombre_traite, EXCLUDED.delai_effectif, EXCLUDED.nombre_rejete, EXCLUDED.raison_rejet,
+       EXCLUDED.personnel_present, EXCLUDED.temps_attente_moyen_minutes, EXCLUDED.incident_technique);
+
+\echo '✅ Table de Faits ACTIVITE_CENTRE synchronisée';
+
+-- ========================================
+-- ÉTAPE 7: Avancer le high-water mark
+-- ========================================
+INSERT INTO dw.etl_watermark (table_name, last_date_demande, last_demande_code, updated_at)
+SELECT 'fact_demandes', date_demande, demande_code, CURRENT_TIMESTAMP
+FROM dw.fact_demandes
+WHERE date_demande IS NOT NULL
+ORDER BY date_demande DESC, demande_code DESC
+LIMIT 1
+ON CONFLICT (table_name) DO UPDATE
+SET last_date_demande = EXCLUDED.last_date_demande,
+    last_demande_code = EXCLUDED.last_demande_code,
+    updated_at = EXCLUDED.updated_at;
+
+\echo '✅ Synchronisation incrémentale terminée!';
@@ -0,0 +1,98 @@
+-- Script 9: Agrégats KPI matérialisés pour le tableau de bord
+-- =====================================================
+-- Les KPI du dashboard lisent ces vues matérialisées au lieu de re-scanner
+-- dw.fact_demandes à chaque affichage. Elles sont rafraîchies (CONCURRENTLY)
+-- à la fin de chaque chargement par load_clean_data_full.py.
+--
+-- Les moyennes sont stockées sous forme (somme, effectif) pour pouvoir être
+-- ré-agrégées à n'importe quel niveau (région, préfecture, type, mois).
+\c service_public_db;
+
+\echo '📊 Création des agrégats KPI matérialisés...';
+
+-- ========================================
+-- AGRÉGAT 1: Demandes par région / préfecture / type / année / mois
+-- ========================================
+CREATE MATERIALIZED VIEW IF NOT EXISTS dw.mv_kpi_demandes_mensuel AS
+SELECT
+    t.region,
+    t.prefecture,
+    td.type_document,
+    COALESCE(f.annee_demande, 0) AS annee,
+    COALESCE(f.mois_demande, 0) AS mois,
+    COUNT(*)::BIGINT AS nb_demandes,
+    COUNT(*) FILTER (WHERE f.statut_demande IN ('Validée', 'Rejetée'))::BIGINT AS nb_traitees,
+    COUNT(*) FILTER (WHERE f.statut_demande = 'Validée')::BIGINT AS nb_validees,
+    COUNT(*) FILTER (WHERE f.statut_demande = 'Rejetée')::BIGINT AS nb_rejetees,
+    COUNT(*) FILTER (WHERE f.statut_demande = 'En Attente')::BIGINT AS nb_en_attente,
+    COUNT(f.delai_traitement_jours)::BIGINT AS nb_avec_delai,
+    COALESCE(SUM(f.delai_traitement_jours), 0)::BIGINT AS somme_delai,
+    MIN(f.date_demande) AS premiere_date
+FROM dw.fact_demandes f
+JOIN dw.dim_territoire t ON f.id_territoire = t.id_territoire
+JOIN dw.dim_type_document td ON f.id_type_document = td.id_type_document
+GROUP BY t.region, t.prefecture, td.type_document, COALESCE(f.annee_demande, 0), COALESCE(f.mois_demande, 0)
+WITH DATA;
+
+-- Index unique requis par REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_kpi_demandes_mensuel
+    ON dw.mv_kpi_demandes_mensuel (region, prefecture, type_document, annee, mois);
+CREATE INDEX IF NOT EXISTS idx_mv_kpi_demandes_mensuel_type
+    ON dw.mv_kpi_demandes_mensuel (type_document);
+CREATE INDEX IF NOT EXISTS idx_mv_kpi_demandes_mensuel_periode
+    ON dw.mv_kpi_demandes_mensuel (annee, mois);
+
+\echo '✅ Agrégat KPI mensuel créé';
+
+-- ========================================
+-- AGRÉGAT 2: Pont territorial (une ligne par commune)
+-- ========================================
+-- Capacité, guichets, nombre de centres et population par commune, calculés
+-- une fois par chargement. Les KPI 003 / 004 / 008 et les zones prioritaires
+-- y joignent 1:1 au lieu de multiplier les lignes par les centres d'un même
+-- territoire puis de dédoublonner par SUM(DISTINCT) (qui écartait aussi les
+-- capacités ou populations égales).
+--
+-- dim_socioeconomique est rattachée à chaque territoire (quartier) de la
+-- commune : la population est prise une fois par enregistrement distinct.
+CREATE MATERIALIZED VIEW IF NOT EXISTS dw.mv_territoire_capacite AS
+WITH communes AS (
+    SELECT DISTINCT region, prefecture, commune
+    FROM dw.dim_territoire
+),
+centres AS (
+    SELECT t.region, t.prefecture, t.commune,
+        COUNT(cs.id_centre) AS nb_centres,
+        COALESCE(SUM(cs.personnel_capacite_jour), 0) AS capacite_jour,
+        COALESCE(SUM(cs.nombre_guichets), 0) AS nb_guichets
+    FROM dw.dim_centres_service cs
+    JOIN dw.dim_territoire t ON t.id_territoire = cs.id_territoire
+    GROUP BY t.region, t.prefecture, t.commune
+),
+population AS (
+    SELECT region, prefecture, commune, SUM(population) AS population
+    FROM (
+        SELECT DISTINCT t.region, t.prefecture, t.commune, s.population, s.densite,
+            s.taux_urbanisation, s.taux_alphabetisation, s.age_median, s.nombre_menages, s.revenu_moyen_fcfa
+        FROM dw.dim_socioeconomique s
+        JOIN dw.dim_territoire t ON t.id_territoire = s.id_territoire
+    ) socio
+    GROUP BY region, prefecture, commune
+)
+SELECT
+    c.region,
+    c.prefecture,
+    c.commune,
+    COALESCE(ce.nb_centres, 0)::INT AS nb_centres,
+    COALESCE(ce.capacite_jour, 0)::BIGINT AS capacite_jour,
+    COALESCE(ce.nb_guichets, 0)::BIGINT AS nb_guichets,
+    p.population::BIGINT AS population
+FROM communes c
+LEFT JOIN centres ce ON ce.region = c.region AND ce.prefecture = c.prefecture AND ce.commune = c.commune
+LEFT JOIN population p ON p.region = c.region AND p.prefecture = c.prefecture AND p.commune = c.commune
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_territoire_capacite
+    ON dw.mv_territoire_capacite (region, prefecture, commune);
+
+\echo '✅ Pont territorial (capacité / population par commune) créé';
@@ -0,0 +1,52 @@
+-- Script 10: Variante partitionnée de la table de faits (par mois de date_demande)
+-- =====================================================
+-- Remplace dw.fact_demandes (table unique) par une table partitionnée
+-- RANGE (date_demande), une partition par mois. À exécuter juste après
+-- 02_create_tables.sql, table de faits encore vide :
+--     python load_clean_data_full.py --partitioned
+--
+-- Les partitions mensuelles sont créées automatiquement avant chaque
+-- chargement par partitions.py (ensure_monthly_partitions), d'après les mois
+-- présents dans raw.demandes_services_public. Les demandes sans date vont
+-- dans la partition DEFAULT.
+--
+-- Une clé primaire d'une table partitionnée doit contenir la clé de partition,
+-- or date_demande peut être NULL : id_fact n'est donc qu'indexé.
+\c service_public_db;
+
+\echo '🗂️  Création de la table de faits partitionnée...';
+
+DROP TABLE IF EXISTS dw.fact_demandes CASCADE;
+
+CREATE TABLE dw.fact_demandes (
+    id_fact SERIAL NOT NULL,
+    id_territoire INT NOT NULL,
+    id_type_document INT NOT NULL,
+    demande_code VARCHAR(50),
+    nombre_demandes INT,
+    delai_traitement_jours INT,
+    taux_rejet DECIMAL(5, 2),
+    date_demande DATE,
+    motif_demande VARCHAR(100),
+    statut_demande VARCHAR(50),
+    canal_demande VARCHAR(100),
+    age_demandeur INT,
+    sexe_demandeur VARCHAR(10),
+    annee_demande INT,
+    mois_demande INT,
+    jour_semaine_demande VARCHAR(20),
+    FOREIGN KEY (id_territoire) REFERENCES dw.dim_territoire(id_territoire),
+    FOREIGN KEY (id_type_document) REFERENCES dw.dim_type_document(id_type_document)
+) PARTITION BY RANGE (date_demande);
+
+-- Demandes sans date (ou hors des mois déjà créés)
+CREATE TABLE dw.fact_demandes_default PARTITION OF dw.fact_demandes DEFAULT;
+
+-- Index déclarés sur la table mère : propagés à chaque partition
+CREATE INDEX idx_fact_demandes_id ON dw.fact_demandes(id_fact);
+CREATE INDEX idx_fact_demandes_territoire ON dw.fact_demandes(id_territoire);
+CREATE INDEX idx_fact_demandes_date ON dw.fact_demandes(date_demande);
+CREATE INDEX idx_fact_demandes_type ON dw.fact_demandes(id_type_document);
+CREATE INDEX idx_fact_demandes_code ON dw.fact_demandes(demande_code);
+
+\echo '✅ Table de faits partitionnée créée (partitions mensuelles via partitions.py)';
@@ -0,0 +1,56 @@
+-- Script 11: Clés de pagination des tables RAW parcourues par app.py
+-- =====================================================
+-- Les pages Centres, Demandes, Socio-éco et Territoires de app.py lisent les
+-- tables RAW page par page (pagination par curseur, cf.
+-- 04_Dashboard/table_browser.py) : chaque page est
+--     WHERE (colonne_de_tri, row_id) > (dernière valeur, dernier row_id)
+--     ORDER BY colonne_de_tri, row_id LIMIT n
+-- soit un parcours d'index borné, quelle que soit la profondeur de la page.
+--
+-- Exécuté par load_clean_data_full.py APRÈS le COPY (les tables sont chargées
+-- sans index), sur le schéma désigné par search_path :
+-- - raw      en reconstruction complète ;
+-- - raw_next en mode incrémental : tables fantômes chargées puis basculées
+--   dans raw, les pages ne voient jamais une table vide ou partielle.
+-- Exécution manuelle : PGOPTIONS='-c search_path=raw' psql -f 11_raw_browse_keys.sql
+--
+-- Idempotent :
+-- - row_id (identité) pour les tables créées avant son ajout dans
+--   02_create_tables.sql, et son index unique (clé du curseur) ;
+-- - index (colonne, row_id) pour les tris / filtres proposés sur
+--   demandes_services_public (les autres tables sont petites) ;
+-- - ANALYZE : le nombre de lignes affiché est l'estimation pg_class.reltuples.
+\c service_public_db;
+
+\echo '🔑 Clés de pagination des tables RAW...';
+
+ALTER TABLE communes
+    ADD COLUMN IF NOT EXISTS row_id BIGINT GENERATED ALWAYS AS IDENTITY;
+ALTER TABLE centres_service
+    ADD COLUMN IF NOT EXISTS row_id BIGINT GENERATED ALWAYS AS IDENTITY;
+ALTER TABLE demandes_services_public
+    ADD COLUMN IF NOT EXISTS row_id BIGINT GENERATED ALWAYS AS IDENTITY;
+ALTER TABLE donnees_socioeconomiques
+    ADD COLUMN IF NOT EXISTS row_id BIGINT GENERATED ALWAYS AS IDENTITY;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_communes_row_id ON communes (row_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_centres_row_id ON centres_service (row_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_demandes_row_id ON demandes_services_public (row_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_raw_socio_row_id ON donnees_socioeconomiques (row_id);
+
+-- Tris / filtres de la page Demandes (BROWSABLE_TABLES dans table_browser.py)
+CREATE INDEX IF NOT EXISTS idx_raw_demandes_date_row
+    ON demandes_services_public (date_demande, row_id);
+CREATE INDEX IF NOT EXISTS idx_raw_demandes_region_row
+    ON demandes_services_public (region, row_id);
+CREATE INDEX IF NOT EXISTS idx_raw_demandes_statut_row
+    ON demandes_services_public (statut_demande, row_id);
+CREATE INDEX IF NOT EXISTS idx_raw_demandes_type_row
+    ON demandes_services_public (type_document, row_id);
+
+ANALYZE communes;
+ANALYZE centres_service;
+ANALYZE demandes_services_public;
+ANALYZE donnees_socioeconomiques;
+
+\echo '✅ Clés de pagination prêtes';
@@ -0,0 +1,193 @@
+"""
+Chargement en masse via COPY FROM STDIN
+Diffuse les CSV nettoyés (ou leur cache Parquet) vers PostgreSQL par blocs,
+sans matérialiser de DataFrame
+"""
+
+import csv
+import io
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "02_Nettoyage_et_Preparation_des_Donnees"))
+import columnar_cache
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Valeurs interprétées comme NULL (alignées sur les défauts de pd.read_csv)
+NULL_TOKENS = {'', 'nan', 'NaN', 'NA', 'N/A', 'null', 'NULL', 'None', 'NaT'}
+
+INTEGER_TYPES = {'integer', 'bigint', 'smallint'}
+_FLOAT_INT_RE = re.compile(r'^-?\d+\.0+$')
+
+
+def normalize_column_name(name):
+    """Même normalisation que le chargement pandas (é -> e, espaces -> _)"""
+    return name.replace('é', 'e').replace(' ', '_').lower()
+
+
+def get_table_columns(cursor, schema, table):
+    """Retourne {colonne: type} pour une table cible, dans l'ordre physique"""
+    cursor.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s
+        ORDER BY ordinal_position
+    """, (schema, table))
+    return dict(cursor.fetchall())
+
+
+def _clean_value(value, is_integer):
+    if value in NULL_TOKENS:
+        return ''
+    if is_integer and _FLOAT_INT_RE.match(value):
+        # pandas écrit les entiers nullables en float ("2016.0")
+        return value.split('.', 1)[0]
+    return value
+
+
+def iter_csv_chunks(csv_path, table_columns, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Lit le CSV ligne à ligne et produit des blocs prêts pour COPY.
+
+    Retourne (colonnes_copiees, colonnes_ignorees, generateur de (buffer, nb_lignes)).
+    Les colonnes du CSV absentes de la table cible sont ignorées.
+    """
+    f = open(csv_path, 'r', encoding='utf-8', newline='')
+    reader = csv.reader(f)
+    header = [normalize_column_name(c) for c in next(reader)]
+
+    keep_idx = [i for i, c in enumerate(header) if c in table_columns]
+    columns = [header[i] for i in keep_idx]
+    skipped = [c for c in header if c not in table_columns]
+    int_flags = [table_columns[c] in INTEGER_TYPES for c in columns]
+
+    def chunks():
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            n = 0
+            for row in reader:
+                writer.writerow([_clean_value(row[i], is_int) for i, is_int in zip(keep_idx, int_flags)])
+                n += 1
+                if n >= chunk_rows:
+                    buffer.seek(0)
+                    yield buffer, n
+                    buffer = io.StringIO()
+                    writer = csv.writer(buffer, lineterminator='\n')
+                    n = 0
+            if n:
+                buffer.seek(0)
+                yield buffer, n
+        finally:
+            f.close()
+
+    return columns, skipped, chunks()
+
+
+def _arrow_batch_to_csv(batch, table_columns):
+    """Convertit un lot Arrow en CSV COPY (types alignés sur la table cible)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+
+    arrays = []
+    for name, col in zip(batch.schema.names, batch.columns):
+        target = table_columns[normalize_column_name(name)]
+        if target in INTEGER_TYPES and pa.types.is_floating(col.type):
+            # Entiers nullables écrits en float par pandas
+            col = pc.cast(col, pa.int64())
+        elif target == 'date' and pa.types.is_timestamp(col.type):
+            col = pc.cast(col, pa.date32())
+        arrays.append(col)
+    batch = pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+    sink = io.BytesIO()
+    pa_csv.write_csv(batch, sink, write_options=pa_csv.WriteOptions(include_header=False))
+    return io.StringIO(sink.getvalue().decode('utf-8'))
+
+
+def copy_parquet_to_table(raw_conn, csv_path, schema, table, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Variante de copy_csv_to_table lisant le Parquet associé au CSV.
+
+    Seules les colonnes présentes dans la table cible sont lues (projection).
+    Même contrat de retour que copy_csv_to_table.
+    """
+    start = time.perf_counter()
+    total = 0
+
+    cursor = raw_conn.cursor()
+    try:
+        table_columns = get_table_columns(cursor, schema, table)
+        if not table_columns:
+            raise ValueError(f"Table {schema}.{table} introuvable")
+
+        source_columns = columnar_cache.parquet_columns(csv_path)
+        read_columns = [c for c in source_columns if normalize_column_name(c) in table_columns]
+        skipped = [normalize_column_name(c) for c in source_columns if c not in read_columns]
+        copy_sql = (
+            f"COPY {schema}.{table} ({', '.join(normalize_column_name(c) for c in read_columns)}) "
+            f"FROM STDIN WITH (FORMAT csv)"
+        )
+        for batch in columnar_cache.iter_parquet_batches(csv_path, read_columns, chunk_rows):
+            cursor.copy_expert(copy_sql, _arrow_batch_to_csv(batch, table_columns))
+            total += batch.num_rows
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': total,
+        'seconds': seconds,
+        'rows_per_sec': total / seconds if seconds > 0 else 0.0,
+        'skipped_columns': skipped,
+    }
+
+
+def copy_csv_to_table(raw_conn, csv_path, schema, table, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Charge un CSV dans schema.table avec COPY FROM STDIN, bloc par bloc.
+
+    raw_conn est une connexion DBAPI psycopg2 (engine.raw_connection()).
+    Tous les blocs sont chargés dans une seule transaction.
+    Retourne un dict {rows, seconds, rows_per_sec, skipped_columns}.
+    """
+    csv_path = Path(csv_path)
+    start = time.perf_counter()
+    total = 0
+
+    cursor = raw_conn.cursor()
+    try:
+        table_columns = get_table_columns(cursor, schema, table)
+        if not table_columns:
+            raise ValueError(f"Table {schema}.{table} introuvable")
+
+        columns, skipped, chunks = iter_csv_chunks(csv_path, table_columns, chunk_rows)
+        copy_sql = (
+            f"COPY {schema}.{table} ({', '.join(columns)}) "
+            f"FROM STDIN WITH (FORMAT csv)"
+        )
+        for buffer, n in chunks:
+            cursor.copy_expert(copy_sql, buffer)
+            total += n
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': total,
+        'seconds': seconds,
+        'rows_per_sec': total / seconds if seconds > 0 else 0.0,
+        'skipped_columns': skipped,
+    }
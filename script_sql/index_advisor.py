@@ -0,0 +1,653 @@
+"""
+Conseiller d'index piloté par la charge réelle (schéma dw)
+=========================================================
+
+Charge analysée :
+- les requêtes KPI du dashboard (04_Dashboard/kpi_queries.py), avec leurs
+  filtres désactivés (vue par défaut) puis renseignés par une valeur
+  fréquente de la base ;
+- la définition des vues matérialisées du schéma (coût des REFRESH) ;
+- pg_stat_statements s'il est installé : nombre d'appels de chaque KPI
+  (poids) et requêtes SELECT les plus coûteuses sur dw.
+
+Candidats extraits des plans EXPLAIN (VERBOSE) de cette charge, par relation :
+colonnes filtrées (égalité d'abord), clés de jointure, clés de GROUP BY / tri,
+index composites, couvrants (INCLUDE des colonnes lues) et partiels pour les
+prédicats constants (ex. WHERE statut_demande = 'En Attente').
+
+Évaluation par coût estimé du planificateur : index hypothétiques (extension
+hypopg) si elle est créée dans la base (--install-hypopg pour la créer ; un
+rapport ne modifie jamais la base), sinon constructions d'essai (--trial-builds) dans une
+transaction annulée à la fin. Sélection gloutonne : à chaque tour, l'index
+qui réduit le plus le coût pondéré de la charge est retenu, tant que le gain
+dépasse --min-gain sur les requêtes concernées.
+
+Usage:
+    python index_advisor.py                                 # rapport
+    python index_advisor.py --write-sql 11_advised_indexes.sql
+    python index_advisor.py --apply                         # CREATE INDEX CONCURRENTLY
+    python index_advisor.py --trial-builds                  # sans hypopg
+    python index_advisor.py --install-hypopg                # crée l'extension si absente
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "04_Dashboard"))
+from kpi_queries import KPI_QUERIES
+
+DSN = "host=127.0.0.1 port=5434 dbname=service_public_db user=postgres password=postgres"
+SCHEMA = 'dw'
+
+# Valeur fréquente de chaque filtre des KPI (variante "filtrée" de la charge)
+SAMPLE_VALUES = {
+    'region': "SELECT region FROM dw.dim_territoire WHERE region IS NOT NULL GROUP BY region ORDER BY COUNT(*) DESC LIMIT 1",
+    'prefecture': "SELECT prefecture FROM dw.dim_territoire WHERE prefecture IS NOT NULL GROUP BY prefecture ORDER BY COUNT(*) DESC LIMIT 1",
+    'type_document': "SELECT type_document FROM dw.dim_type_document ORDER BY id_type_document LIMIT 1",
+    'annee': "SELECT MAX(annee) FROM dw.mv_kpi_demandes_mensuel",
+    'nom_centre': "SELECT nom_centre FROM dw.dim_centres_service WHERE nom_centre IS NOT NULL ORDER BY nom_centre LIMIT 1",
+}
+
+# Requêtes de pg_stat_statements ajoutées à la charge (les plus coûteuses)
+PGSS_TOP_QUERIES = 20
+# Gain minimal (part du coût des requêtes concernées) pour retenir un index
+DEFAULT_MIN_GAIN = 0.05
+DEFAULT_MAX_INDEXES = 5
+# Colonnes maximum d'une clé d'index candidate et d'une clause INCLUDE
+MAX_KEY_COLUMNS = 3
+MAX_INCLUDE_COLUMNS = 4
+
+_COL_RE = re.compile(r'\b(\w+)\.(\w+)\b')
+_CAST = r'\)?(?:::[\w ]+)?'
+_EQ_PARAM_RE = re.compile(r'\(?(\w+)\.(\w+)' + _CAST + r'\s*=\s*\$\d+')
+_EQ_CONST_RE = re.compile(r'\(?(\w+)\.(\w+)' + _CAST + r"\s*=\s*'((?:[^']|'')*)'")
+
+# ============================================================================
+# CHARGE
+# ============================================================================
+
+def sample_value(cursor, name):
+    cursor.execute(SAMPLE_VALUES[name])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def kpi_workload(cursor, weights=None):
+    """
+    Entrées de charge des KPI : {id, kpi_id, params, weight}.
+
+    Une entrée filtres désactivés (vue par défaut) et, si le KPI a des
+    filtres, une entrée avec chaque filtre renseigné. Les KPI à filtre
+    obligatoire n'ont que la seconde.
+    """
+    weights = weights or {}
+    samples = {}
+    workload = []
+    for kpi_id, spec in KPI_QUERIES.items():
+        names = [name for name, _ in spec['params']]
+        weight = max(1, weights.get(kpi_id, 1))
+        if kpi_id not in ('liste_prefectures', 'centre_details'):
+            workload.append({'id': kpi_id, 'kpi_id': kpi_id, 'params': (None,) * len(names), 'weight': weight})
+        if names:
+            for name in names:
+                if name not in samples:
+                    samples[name] = sample_value(cursor, name)
+            workload.append({'id': f"{kpi_id} (filtré)", 'kpi_id': kpi_id,
+                             'params': tuple(samples[name] for name in names), 'weight': weight})
+    return workload
+
+def matview_workload(cursor, schema=SCHEMA):
+    """Requêtes de définition des vues matérialisées (exécutées à chaque REFRESH)"""
+    cursor.execute("SELECT matviewname, definition FROM pg_matviews WHERE schemaname = %s ORDER BY matviewname",
+                   (schema,))
+    return [{'id': f"REFRESH {schema}.{name}", 'sql': definition.strip().rstrip(';'), 'weight': 1}
+            for name, definition in cursor.fetchall()]
+
+def pg_stat_statements_workload(cursor, schema=SCHEMA, limit=PGSS_TOP_QUERIES):
+    """
+    Statistiques de pg_stat_statements : ({kpi_id: appels}, entrées de charge).
+
+    Les KPI sont exécutés via PREPARE : leur texte commence par « PREPARE kpi_id ».
+    Les autres SELECT sur le schéma sont ajoutés (texte normalisé, $n éventuels).
+    Retourne ({}, []) si la vue est inaccessible (extension absente, non
+    préchargée, ou colonnes antérieures à PostgreSQL 13 : total_time) :
+    chaque KPI garde alors le poids 1.
+    """
+    try:
+        cursor.execute("""
+            SELECT query, calls, total_exec_time
+            FROM pg_stat_statements
+            WHERE query ILIKE %s
+            ORDER BY total_exec_time DESC
+        """, (f"%{schema}.%",))
+        rows = cursor.fetchall()
+    except psycopg2.Error:
+        if not cursor.connection.autocommit:
+            cursor.connection.rollback()
+        return {}, []
+
+    weights, extra = {}, []
+    for query, calls, _ in rows:
+        match = re.match(r'\s*PREPARE\s+(\w+)', query, re.IGNORECASE)
+        if match and match.group(1) in KPI_QUERIES:
+            weights[match.group(1)] = weights.get(match.group(1), 0) + int(calls)
+        elif re.match(r'\s*(SELECT|WITH)\b', query, re.IGNORECASE) and len(extra) < limit:
+            extra.append({'id': f"pg_stat_statements #{len(extra) + 1}", 'sql': query.strip().rstrip(';'),
+                          'weight': int(calls)})
+    return weights, extra
+
+# ============================================================================
+# PLANS
+# ============================================================================
+
+def explain(cursor, entry, verbose=False, generic=False):
+    """
+    Plan estimé (EXPLAIN FORMAT JSON) d'une entrée de charge.
+
+    Les KPI sont préparés sous un nom propre à l'appel puis désalloués : aucun
+    plan en cache ne masque un index créé depuis. generic=True : plan
+    générique ($n non remplacés) pour les requêtes normalisées.
+    """
+    options = 'FORMAT JSON' + (', VERBOSE' if verbose else '') + (', GENERIC_PLAN' if generic else '')
+    if 'kpi_id' in entry:
+        spec = KPI_QUERIES[entry['kpi_id']]
+        name = f"advisor_{entry['kpi_id']}"
+        types = f" ({', '.join(t for _, t in spec['params'])})" if spec['params'] else ''
+        cursor.execute(f"PREPARE {name}{types} AS {spec['sql'].strip().rstrip(';')}")
+        try:
+            args = f" ({', '.join(['%s'] * len(entry['params']))})" if entry['params'] else ''
+            cursor.execute(f"EXPLAIN ({options}) EXECUTE {name}{args}", entry['params'])
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute(f"DEALLOCATE {name}")
+    else:
+        cursor.execute(f"EXPLAIN ({options}) {entry['sql']}")
+        plan = cursor.fetchone()[0]
+    return plan[0]
+
+def plan_cost(cursor, entry):
+    return float(explain(cursor, entry, generic=entry.get('generic', False))['Plan']['Total Cost'])
+
+def _walk(plan):
+    stack = [plan['Plan']]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.get('Plans', []))
+
+def relations_in_plan(plan):
+    """{alias: (schéma, relation)} des parcours de tables du plan VERBOSE"""
+    aliases = {}
+    for node in _walk(plan):
+        if node.get('Relation Name'):
+            aliases[node.get('Alias', node['Relation Name'])] = (node.get('Schema', SCHEMA), node['Relation Name'])
+    return aliases
+
+def _columns(expressions, alias):
+    if isinstance(expressions, str):
+        expressions = [expressions]
+    found = []
+    for expression in expressions or []:
+        for owner, column in _COL_RE.findall(expression):
+            if owner == alias and column not in found:
+                found.append(column)
+    return found
+
+def access_patterns(plan):
+    """
+    Colonnes utilisées par relation dans un plan VERBOSE :
+    {(schéma, relation): {eq, other, join, group, output, constants}}.
+    """
+    aliases = relations_in_plan(plan)
+    patterns = {}
+
+    def pattern(alias):
+        return patterns.setdefault(aliases[alias], {'eq': [], 'other': [], 'join': [], 'group': [],
+                                                    'output': [], 'constants': []})
+
+    def add(target, columns):
+        target.extend(c for c in columns if c not in target)
+
+    for node in _walk(plan):
+        alias = node.get('Alias')
+        if node.get('Relation Name') and alias in aliases:
+            p = pattern(alias)
+            conditions = [node[k] for k in ('Filter', 'Index Cond', 'Recheck Cond') if node.get(k)]
+            for condition in conditions:
+                add(p['eq'], [c for a, c in _EQ_PARAM_RE.findall(condition) if a == alias])
+                for a, column, value in _EQ_CONST_RE.findall(condition):
+                    if a == alias:
+                        add(p['eq'], [column])
+                        if (column, value) not in p['constants']:
+                            p['constants'].append((column, value))
+                add(p['other'], [c for c in _columns(condition, alias) if c not in p['eq']])
+            add(p['output'], _columns(node.get('Output'), alias))
+        for key in ('Hash Cond', 'Merge Cond', 'Join Filter'):
+            for a in aliases:
+                columns = _columns(node.get(key), a)
+                if columns:
+                    add(pattern(a)['join'], columns)
+        for key in ('Group Key', 'Sort Key'):
+            for a in aliases:
+                columns = _columns(node.get(key), a)
+                if columns:
+                    add(pattern(a)['group'], columns)
+    return patterns
+
+# ============================================================================
+# CANDIDATS
+# ============================================================================
+
+def index_name(candidate):
+    """
+    Nom déterministe (63 caractères max) : idx_<table>_<colonnes>[_incl][_part<empreinte>],
+    l'empreinte du prédicat distinguant deux index partiels sur les mêmes colonnes.
+    """
+    suffix = '_incl' if candidate['include'] else ''
+    if candidate['where']:
+        suffix += '_part' + hashlib.md5(candidate['where'].encode()).hexdigest()[:6]
+    base = f"idx_{candidate['table']}_{'_'.join(candidate['columns'])}"
+    return base[:63 - len(suffix)] + suffix
+
+def index_ddl(candidate, name=None, concurrently=False, if_not_exists=False):
+    """CREATE INDEX d'un candidat (schema, table, columns, include, where)"""
+    parts = ["CREATE INDEX"]
+    if concurrently:
+        parts.append("CONCURRENTLY")
+    if if_not_exists:
+        parts.append("IF NOT EXISTS")
+    if name:
+        parts.append(name)
+    parts.append(f"ON {candidate['schema']}.{candidate['table']} ({', '.join(candidate['columns'])})")
+    if candidate['include']:
+        parts.append(f"INCLUDE ({', '.join(candidate['include'])})")
+    if candidate['where']:
+        parts.append(f"WHERE {candidate['where']}")
+    return ' '.join(parts)
+
+def _literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+def candidates_for(schema, table, p):
+    """Index candidats d'une relation à partir de ses colonnes utilisées"""
+    keys = []
+
+    def key(columns, include=(), where=None):
+        columns = tuple(dict.fromkeys(columns))[:MAX_KEY_COLUMNS]
+        include = tuple(c for c in dict.fromkeys(include) if c not in columns)
+        if columns and len(include) <= MAX_INCLUDE_COLUMNS:
+            keys.append((columns, include, where))
+
+    for column in p['eq'] + p['join'] + p['other']:
+        key([column])
+    if len(p['eq']) > 1 or (p['eq'] and p['other']):
+        key(p['eq'] + p['other'][:1])
+    if p['eq'] and p['group']:
+        key(p['eq'] + p['group'])
+    for column in p['join']:
+        if p['eq']:
+            key([column] + p['eq'])
+    # Couvrants : parcours d'index seul sur les colonnes lues
+    for columns in (p['eq'] + p['group'], p['join'][:1], p['group']):
+        if columns:
+            key(columns, include=p['output'])
+    # Partiels : le prédicat constant sort de la clé
+    for column, value in p['constants']:
+        where = f"{column} = {_literal(value.replace(chr(39) * 2, chr(39)))}"
+        rest = [c for c in p['eq'] if c != column]
+        for columns in (p['join'][:1], p['group'], rest):
+            if columns:
+                key(columns, where=where)
+                key(columns, include=[c for c in p['output'] if c != column], where=where)
+
+    return [{'schema': schema, 'table': table, 'columns': list(c), 'include': list(i), 'where': w}
+            for c, i, w in dict.fromkeys(keys)]
+
+def existing_indexes(cursor, schema=SCHEMA):
+    """{(schéma, table): [(colonnes clé, colonnes INCLUDE, prédicat)]} des index existants"""
+    cursor.execute("""
+        SELECT n.nspname, t.relname, i.indnkeyatts,
+               ARRAY(SELECT a.attname FROM unnest(i.indkey) WITH ORDINALITY k(attnum, pos)
+                     JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+                     ORDER BY k.pos)::text[],
+               pg_get_expr(i.indpred, i.indrelid)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = %s
+    """, (schema,))
+    indexes = {}
+    for nsp, table, nkey, columns, predicate in cursor.fetchall():
+        indexes.setdefault((nsp, table), []).append((list(columns[:nkey]), list(columns[nkey:]), predicate))
+    return indexes
+
+def is_redundant(candidate, indexes):
+    """
+    Vrai si un index complet existant commence par la clé du candidat et
+    contient ses colonnes INCLUDE. Les candidats partiels sont laissés à
+    l'évaluation (un index équivalent existant annule leur gain).
+    """
+    if candidate['where']:
+        return False
+    n = len(candidate['columns'])
+    for columns, include, predicate in indexes.get((candidate['schema'], candidate['table']), []):
+        if not predicate and columns[:n] == candidate['columns'] \
+                and set(candidate['include']) <= set(columns) | set(include):
+            return True
+    return False
+
+def generate_candidates(cursor, workload, schema=SCHEMA):
+    """
+    Candidats de toute la charge (dédoublonnés, hors index existants).
+
+    Renseigne aussi entry['relations'] : relations lues par chaque requête.
+    """
+    indexes = existing_indexes(cursor, schema)
+    seen, candidates = set(), []
+    for entry in workload:
+        plan = explain(cursor, entry, verbose=True, generic=entry.get('generic', False))
+        entry['relations'] = sorted({rel for rel in relations_in_plan(plan).values()})
+        for (nsp, table), p in access_patterns(plan).items():
+            if nsp != schema:
+                continue
+            for candidate in candidates_for(nsp, table, p):
+                signature = index_ddl(candidate)
+                if signature not in seen and not is_redundant(candidate, indexes):
+                    seen.add(signature)
+                    candidates.append(candidate)
+    return candidates
+
+# ============================================================================
+# ÉVALUATION
+# ============================================================================
+
+class HypotheticalIndexes:
+    """Index hypothétiques (hypopg) : aucun index réel n'est construit"""
+
+    name = 'hypopg'
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def create(self, candidate):
+        """Identifiant de l'index hypothétique, None si hypopg le refuse"""
+        try:
+            self.cursor.execute("SELECT indexrelid FROM hypopg_create_index(%s)", (index_ddl(candidate),))
+        except psycopg2.Error:
+            return None
+        return self.cursor.fetchone()[0]
+
+    def drop(self, handle):
+        self.cursor.execute("SELECT hypopg_drop_index(%s)", (handle,))
+
+    def size(self, handle):
+        self.cursor.execute("SELECT hypopg_relation_size(%s)", (handle,))
+        return int(self.cursor.fetchone()[0])
+
+    def close(self):
+        self.cursor.execute("SELECT hypopg_reset()")
+
+class TrialIndexes:
+    """
+    Constructions d'essai dans la transaction courante, annulées à la fin.
+
+    Chaque index est construit après un SAVEPOINT (bloque les écritures sur la
+    table pendant la construction) ; drop revient au SAVEPOINT.
+    """
+
+    name = 'constructions d\'essai'
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self._count = 0
+        self._schemas = {}
+
+    def create(self, candidate):
+        """Nom de l'index construit, None si la construction échoue"""
+        self._count += 1
+        handle = f"advisor_trial_{self._count}"
+        self.cursor.execute(f"SAVEPOINT {handle}")
+        try:
+            self.cursor.execute(index_ddl(candidate, name=handle))
+        except psycopg2.Error:
+            self.cursor.execute(f"ROLLBACK TO SAVEPOINT {handle}")
+            return None
+        self._schemas[handle] = candidate['schema']
+        return handle
+
+    def drop(self, handle):
+        self.cursor.execute(f"ROLLBACK TO SAVEPOINT {handle}")
+
+    def size(self, handle):
+        self.cursor.execute("SELECT pg_relation_size(%s::regclass)", (f"{self._schemas[handle]}.{handle}",))
+        return int(self.cursor.fetchone()[0])
+
+    def close(self):
+        self.cursor.connection.rollback()
+
+def isolated_plan_cost(cursor, entry):
+    """
+    plan_cost dans un SAVEPOINT hors autocommit (constructions d'essai) : une
+    erreur d'EXPLAIN est propagée sans interrompre la transaction, où restent
+    les index d'essai déjà retenus.
+    """
+    if cursor.connection.autocommit:
+        return plan_cost(cursor, entry)
+    cursor.execute("SAVEPOINT advisor_cost")
+    try:
+        cost = plan_cost(cursor, entry)
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT advisor_cost")
+        # PREPARE n'est pas annulé par le retour au SAVEPOINT ; la connexion
+        # de l'outil ne porte que ses requêtes advisor_* éphémères
+        cursor.execute("DEALLOCATE ALL")
+        raise
+    cursor.execute("RELEASE SAVEPOINT advisor_cost")
+    return cost
+
+def workload_costs(cursor, workload, entries=None):
+    """{id: coût estimé} des entrées (toutes par défaut)"""
+    return {entry['id']: isolated_plan_cost(cursor, entry) for entry in (entries or workload)}
+
+def advise(cursor, workload, candidates, backend, max_indexes=DEFAULT_MAX_INDEXES, min_gain=DEFAULT_MIN_GAIN):
+    """
+    Sélection gloutonne des index.
+
+    Retourne (coûts initiaux, [{candidate, size, gain, costs}]) : costs = coûts
+    des requêtes concernées après ajout de l'index (les précédents restant
+    en place).
+    """
+    weights = {entry['id']: entry['weight'] for entry in workload}
+    baseline = workload_costs(cursor, workload)
+    current = dict(baseline)
+    remaining = list(candidates)
+    selected = []
+
+    while remaining and len(selected) < max_indexes:
+        best, failed = None, []
+        for candidate in remaining:
+            affected = [e for e in workload if (candidate['schema'], candidate['table']) in
+                        {tuple(r) for r in e['relations']}]
+            if not affected:
+                continue
+            handle = backend.create(candidate)
+            if handle is None:
+                continue
+            try:
+                costs = workload_costs(cursor, workload, affected)
+            except psycopg2.Error as e:
+                print(f"   {index_name(candidate)} écarté (coût non évaluable): {str(e).strip()[:120]}")
+                failed.append(candidate)
+                continue
+            else:
+                before = sum(weights[e['id']] * current[e['id']] for e in affected)
+                gain = before - sum(weights[i] * c for i, c in costs.items())
+                if before > 0 and gain / before >= min_gain and (best is None or gain > best['gain']):
+                    # Taille mesurée tant que l'index existe
+                    best = {'candidate': candidate, 'gain': gain, 'ratio': gain / before, 'costs': costs,
+                            'size': backend.size(handle)}
+            finally:
+                backend.drop(handle)
+        for candidate in failed:
+            remaining.remove(candidate)
+        if best is None:
+            break
+        # L'index retenu est recréé et reste en place pour les tours suivants ;
+        # si la reconstruction échoue, il est écarté et le tour est rejoué
+        remaining.remove(best['candidate'])
+        if backend.create(best['candidate']) is None:
+            print(f"   {index_name(best['candidate'])} écarté (reconstruction impossible)")
+            continue
+        current.update(best['costs'])
+        selected.append(best)
+    return baseline, selected
+
+def has_hypopg(cursor):
+    """Vrai si l'extension hypopg est créée dans la base (détection seule, rien n'est modifié)"""
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'hypopg'")
+    return cursor.fetchone() is not None
+
+def hypopg_available(cursor):
+    """Vrai si hypopg est installée sur le serveur (CREATE EXTENSION possible)"""
+    cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg'")
+    return cursor.fetchone() is not None
+
+def install_hypopg(cursor):
+    """CREATE EXTENSION hypopg (--install-hypopg) ; False si le serveur le refuse"""
+    try:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+        return True
+    except psycopg2.Error as e:
+        if not cursor.connection.autocommit:
+            cursor.connection.rollback()
+        print(f"CREATE EXTENSION hypopg impossible: {str(e).strip()}")
+        return False
+
+# ============================================================================
+# RAPPORT / APPLICATION
+# ============================================================================
+
+def print_report(workload, baseline, selected, backend_name):
+    weights = {entry['id']: entry['weight'] for entry in workload}
+    total = sum(weights[i] * c for i, c in baseline.items())
+    print(f"\nÉvaluation: {backend_name} - {len(workload)} requêtes, coût pondéré initial {total:,.0f}")
+    if not selected:
+        print("Aucun index ne réduit sensiblement le coût de la charge.")
+        return
+    for rank, choice in enumerate(selected, 1):
+        candidate = choice['candidate']
+        print(f"\n{rank}. {index_ddl(candidate, name=index_name(candidate))}")
+        print(f"   gain {choice['gain']:,.0f} ({choice['ratio']:.0%} des requêtes concernées),"
+              f" taille estimée {choice['size'] / 1024 / 1024:.1f} Mo")
+        for entry_id, cost in sorted(choice['costs'].items()):
+            if cost < baseline[entry_id]:
+                print(f"   - {entry_id:45} {baseline[entry_id]:>12,.2f} -> {cost:>12,.2f}")
+    final = dict(baseline)
+    for choice in selected:
+        final.update(choice['costs'])
+    after = sum(weights[i] * c for i, c in final.items())
+    print(f"\nCoût pondéré final {after:,.0f} ({(total - after) / total:.0%} de moins)")
+
+def write_sql(path, selected):
+    lines = ["-- Index recommandés par index_advisor.py (coût estimé de la charge KPI)", ""]
+    for choice in selected:
+        candidate = choice['candidate']
+        lines.append(f"-- gain estimé {choice['ratio']:.0%} sur les requêtes concernées")
+        lines.append(index_ddl(candidate, name=index_name(candidate), if_not_exists=True) + ";")
+        lines.append("")
+    Path(path).write_text("\n".join(lines), encoding='utf-8')
+    print(f"\nScript écrit: {path}")
+
+def apply_indexes(dsn, selected):
+    """Construit les index retenus (CONCURRENTLY : lectures et écritures non bloquées)"""
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for choice in selected:
+                candidate = choice['candidate']
+                ddl = index_ddl(candidate, name=index_name(candidate), concurrently=True, if_not_exists=True)
+                print(f"  {ddl}")
+                cursor.execute(ddl)
+            tables = sorted({f"{c['candidate']['schema']}.{c['candidate']['table']}" for c in selected})
+            cursor.execute(f"ANALYZE {', '.join(tables)}")
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conseiller d'index du schéma dw (charge KPI + pg_stat_statements)")
+    parser.add_argument('--dsn', default=DSN, help="Connexion PostgreSQL")
+    parser.add_argument('--max-indexes', type=int, default=DEFAULT_MAX_INDEXES, help="Nombre maximal d'index retenus")
+    parser.add_argument('--min-gain', type=float, default=DEFAULT_MIN_GAIN,
+                        help="Gain minimal (part du coût des requêtes concernées, défaut 0.05)")
+    parser.add_argument('--trial-builds', action='store_true',
+                        help="Sans hypopg : construire les candidats dans une transaction annulée")
+    parser.add_argument('--install-hypopg', action='store_true',
+                        help="Créer l'extension hypopg dans la base si elle est absente (modification durable)")
+    parser.add_argument('--no-matviews', action='store_true', help="Ignorer les définitions des vues matérialisées")
+    parser.add_argument('--write-sql', metavar='FICHIER', help="Écrire les CREATE INDEX retenus dans un script")
+    parser.add_argument('--apply', action='store_true', help="Créer les index retenus (CONCURRENTLY)")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(args.dsn)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW server_version_num")
+            generic_plans = int(cursor.fetchone()[0]) >= 160000
+
+            weights, extra = pg_stat_statements_workload(cursor)
+            if weights or extra:
+                print(f"pg_stat_statements: {len(weights)} KPI appelés, {len(extra)} autres requêtes")
+            else:
+                print("pg_stat_statements indisponible : poids 1 par requête KPI")
+            workload = kpi_workload(cursor, weights)
+            if not args.no_matviews:
+                workload += matview_workload(cursor)
+            for entry in extra:
+                # Texte normalisé ($n) : plan générique (PostgreSQL 16+) ou ignoré
+                if re.search(r'\$\d+', entry['sql']):
+                    if not generic_plans:
+                        continue
+                    entry['generic'] = True
+                workload.append(entry)
+
+            use_hypopg = has_hypopg(cursor)
+            if not use_hypopg and args.install_hypopg:
+                use_hypopg = install_hypopg(cursor)
+            if not use_hypopg and not args.trial_builds:
+                hint = ("relancez avec --install-hypopg (CREATE EXTENSION dans la base)"
+                        if hypopg_available(cursor) else "installez hypopg sur le serveur")
+                print(f"Extension hypopg absente : {hint}, ou utilisez --trial-builds"
+                      " (constructions réelles dans une transaction annulée, écritures bloquées pendant l'essai).")
+                return 1
+
+            candidates = generate_candidates(cursor, workload)
+            print(f"{len(candidates)} index candidats sur {len(workload)} requêtes")
+
+            if not use_hypopg:
+                conn.autocommit = False
+            backend = HypotheticalIndexes(cursor) if use_hypopg else TrialIndexes(cursor)
+            try:
+                baseline, selected = advise(cursor, workload, candidates, backend,
+                                            max_indexes=args.max_indexes, min_gain=args.min_gain)
+            finally:
+                backend.close()
+                conn.autocommit = True
+    finally:
+        conn.close()
+
+    print_report(workload, baseline, selected, backend.name)
+    if selected and args.write_sql:
+        write_sql(args.write_sql, selected)
+    if selected and args.apply:
+        print("\nCréation des index:")
+        apply_indexes(args.dsn, selected)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,8 +7,12 @@ import pandas as pd
 import sqlalchemy as sa
 from sqlalchemy import create_engine, text
 import os
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "02_Nettoyage_et_Preparation_des_Donnees"))
+from columnar_cache import has_fresh_parquet, read_cleaned
+
 class Colors:
     HEADER = '\033[95m'
     BLUE = '\033[94m'
@@ -61,7 +65,7 @@ def get_db_engine():
         return None
 
 def load_cleaned_data():
-    """Charge les fichiers CSV nettoyés"""
+    """Charge les fichiers nettoyés (cache Parquet si à jour, sinon CSV)"""
     print_step(2, "Chargement des fichiers CSV nettoyés...")
     
     data_dir = Path(__file__).parent.parent / "02_Nettoyage_et_Preparation_des_Donnees" / "data_cleaned"
@@ -80,9 +84,11 @@ def load_cleaned_data():
         filepath = data_dir / filename
         if filepath.exists():
             try:
-                df = pd.read_csv(filepath)
+                # Parquet typé si disponible (dates et catégories conservées), sinon CSV
+                source = 'parquet' if has_fresh_parquet(filepath) else 'csv'
+                df = read_cleaned(filepath)
                 data[key] = df
-                print_success(f"Chargé: {filename} ({len(df)} lignes)")
+                print_success(f"Chargé: {filename} ({len(df)} lignes, {source})")
             except Exception as e:
                 print_error(f"Erreur chargement {filename}: {str(e)[:100]}")
         else:
@@ -90,6 +96,46 @@ def load_cleaned_data():
     
     return data
 
+TERRITOIRE_KEY = ['region', 'prefecture', 'commune']
+
+def fetch_territoires(engine):
+    """Lit une seule fois la clé naturelle -> territoire_id de DIM_TERRITOIRE"""
+    with engine.connect() as conn:
+        territoires = pd.read_sql(
+            text("SELECT territoire_id, region, prefecture, commune FROM dw.dim_territoire"),
+            conn
+        )
+    # Même règle que l'ancien dictionnaire de lookup : la dernière occurrence l'emporte
+    return territoires.drop_duplicates(subset=TERRITOIRE_KEY, keep='last')
+
+def resolve_territoire_ids(df, territoires, label=""):
+    """
+    Résout territoire_id pour chaque ligne de df par jointure vectorisée.
+
+    Retourne une Series (Int64, index de df) ; NA si la clé (region, prefecture,
+    commune) est incomplète ou absente de DIM_TERRITOIRE. Les clés non résolues
+    sont signalées.
+    """
+    if not all(c in df.columns for c in TERRITOIRE_KEY):
+        print_info(f"{label}: colonnes de territoire manquantes, aucune ligne résolue")
+        return pd.Series(pd.NA, index=df.index, dtype='Int64')
+
+    # Catégories -> objets pour une jointure homogène avec la dimension
+    keys = df[TERRITOIRE_KEY].astype(object)
+    complete = keys.notna().all(axis=1).to_numpy()
+
+    merged = keys.merge(territoires, on=TERRITOIRE_KEY, how='left', sort=False)
+    ids = pd.Series(merged['territoire_id'].to_numpy(), index=df.index).astype('Int64')
+    ids[~complete] = pd.NA
+
+    unmatched = keys[ids.isna().to_numpy()].drop_duplicates()
+    if len(unmatched):
+        n_rows = int(ids.isna().sum())
+        print_info(f"{label}: {n_rows} lignes / {len(unmatched)} clés de territoire non résolues")
+        for key in unmatched.head(5).itertuples(index=False):
+            print(f"    - {tuple(key)}")
+    return ids
+
 def load_dim_territoire(engine, data):
     """Charge la dimension TERRITOIRE"""
     print_step(3, "Chargement de DIM_TERRITOIRE...")
@@ -226,7 +272,7 @@ def load_dim_territoire(engine, data):
         print_error(f"Erreur chargement DIM_TERRITOIRE: {str(e)}")
         return False
 
-def load_dim_centre(engine, data):
+def load_dim_centre(engine, data, territoires=None):
     """Charge la dimension CENTRE avec tous les attributs"""
     print_step(4, "Chargement de DIM_CENTRE...")
     
@@ -237,26 +283,9 @@ def load_dim_centre(engine, data):
         
         df_centres = data['centres'].copy()
         
-        # Créer un mapping région+préfecture+commune -> territoire_id
-        with engine.connect() as conn:
-            query = text("""
-                SELECT territoire_id, region, prefecture, commune 
-                FROM dw.dim_territoire
-            """)
-            territoire_data = conn.execute(query).fetchall()
-            
-            # Créer un dictionnaire de lookup
-            territoire_map = {}
-            for tid, region, prefecture, commune in territoire_data:
-                key = (region, prefecture, commune)
-                territoire_map[key] = tid
-        
-        # Mapper les centres aux territoires
-        def get_territoire_id(row):
-            key = (row.get('region'), row.get('prefecture'), row.get('commune'))
-            return territoire_map.get(key)
-        
-        df_centres['id_territoire'] = df_centres.apply(get_territoire_id, axis=1)
+        if territoires is None:
+            territoires = fetch_territoires(engine)
+        df_centres['id_territoire'] = resolve_territoire_ids(df_centres, territoires, "Centres")
         
         # Filtrer les centres avec territoire_id valide
         df_centres_valid = df_centres[df_centres['id_territoire'].notna()].copy()
@@ -331,7 +360,7 @@ def load_fact_demandes(engine, data):
         print_error(f"Erreur chargement FACT_DEMANDES: {str(e)}")
         return False
 
-def load_dim_demande(engine, data):
+def load_dim_demande(engine, data, territoires=None):
     """Charge DIM_DEMANDE avec FK à territoire"""
     print_step(5, "Chargement de DIM_DEMANDE...")
     try:
@@ -340,11 +369,9 @@ def load_dim_demande(engine, data):
         df = data['demandes'].copy()
         
         # Mapper territoires
-        with engine.connect() as conn:
-            territoire_data = conn.execute(text("SELECT territoire_id, region, prefecture, commune FROM dw.dim_territoire")).fetchall()
-            territoire_map = {(t[1], t[2], t[3]): t[0] for t in territoire_data}
-        
-        df['id_territoire'] = df.apply(lambda r: territoire_map.get((r.get('region'), r.get('prefecture'), r.get('commune'))), axis=1)
+        if territoires is None:
+            territoires = fetch_territoires(engine)
+        df['id_territoire'] = resolve_territoire_ids(df, territoires, "Demandes")
         df_valid = df[df['id_territoire'].notna()]
         
         df_valid.to_sql("dim_demande", engine, schema="dw", if_exists="replace", index=False)
@@ -354,7 +381,7 @@ def load_dim_demande(engine, data):
         print_error(f"Erreur DIM_DEMANDE: {str(e)}")
         return False
 
-def load_dim_document(engine, data):
+def load_dim_document(engine, data, territoires=None):
     """Charge DIM_DOCUMENT avec FK à territoire"""
     print_step(6, "Chargement de DIM_DOCUMENT...")
     try:
@@ -363,11 +390,9 @@ def load_dim_document(engine, data):
         df = data['documents'].copy()
         
         # Mapper territoires
-        with engine.connect() as conn:
-            territoire_data = conn.execute(text("SELECT territoire_id, region, prefecture, commune FROM dw.dim_territoire")).fetchall()
-            territoire_map = {(t[1], t[2], t[3]): t[0] for t in territoire_data}
-        
-        df['id_territoire'] = df.apply(lambda r: territoire_map.get((r.get('region'), r.get('prefecture'), r.get('commune'))), axis=1)
+        if territoires is None:
+            territoires = fetch_territoires(engine)
+        df['id_territoire'] = resolve_territoire_ids(df, territoires, "Documents")
         df_valid = df[df['id_territoire'].notna()]
         
         df_valid.to_sql("dim_document", engine, schema="dw", if_exists="replace", index=False)
@@ -377,7 +402,7 @@ def load_dim_document(engine, data):
         print_error(f"Erreur DIM_DOCUMENT: {str(e)}")
         return False
 
-def load_dim_socioeconomique(engine, data):
+def load_dim_socioeconomique(engine, data, territoires=None):
     """Charge DIM_SOCIOECONOMIQUE avec FK à territoire"""
     print_step(7, "Chargement de DIM_SOCIOECONOMIQUE...")
     try:
@@ -386,11 +411,9 @@ def load_dim_socioeconomique(engine, data):
         df = data['socioeco'].copy()
         
         # Mapper territoires
-        with engine.connect() as conn:
-            territoire_data = conn.execute(text("SELECT territoire_id, region, prefecture, commune FROM dw.dim_territoire")).fetchall()
-            territoire_map = {(t[1], t[2], t[3]): t[0] for t in territoire_data}
-        
-        df['id_territoire'] = df.apply(lambda r: territoire_map.get((r.get('region'), r.get('prefecture'), r.get('commune'))), axis=1)
+        if territoires is None:
+            territoires = fetch_territoires(engine)
+        df['id_territoire'] = resolve_territoire_ids(df, territoires, "Socioéconomiques")
         df_valid = df[df['id_territoire'].notna()]
         
         df_valid.to_sql("dim_socioeconomique", engine, schema="dw", if_exists="replace", index=False)
@@ -444,10 +467,12 @@ def main():
     # Charger les dimensions et faits
     success = True
     success = success and load_dim_territoire(engine, data)
-    success = success and load_dim_centre(engine, data)
-    success = success and load_dim_demande(engine, data)
-    success = success and load_dim_document(engine, data)
-    success = success and load_dim_socioeconomique(engine, data)
+    # DIM_TERRITOIRE lue une seule fois pour toutes les résolutions de clés
+    territoires = fetch_territoires(engine) if success else None
+    success = success and load_dim_centre(engine, data, territoires)
+    success = success and load_dim_demande(engine, data, territoires)
+    success = success and load_dim_document(engine, data, territoires)
+    success = success and load_dim_socioeconomique(engine, data, territoires)
     success = success and load_fact_demandes(engine, data)
     
     # Vérifier